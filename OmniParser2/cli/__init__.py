@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/19 23:10
+import asyncio
+import json
+import re
+from pathlib import Path
+from typing import Iterator
+
+from loguru import logger
+
+from util.cos import download_file
+from util.image import ImageSource
+
+IMAGE_SUFFIXES = {'.png', '.jpg', '.jpeg', '.webp', '.bmp'}
+# page_eyes 报告内嵌的步骤数据中的原始截图地址，image_url 为标注图，不能用于解析
+REPORT_IMAGE_URL = re.compile(r'"screenshot_url"\s*:\s*"(https?://[^"]+)"')
+
+
+def is_url(source: str) -> bool:
+    return source.startswith(('http://', 'https://'))
+
+
+def iter_sources(inputs: list[str]) -> Iterator[str]:
+    """
+    展开输入为图片路径或 URL，按出现顺序去重
+
+    支持：图片文件或 URL；目录(递归查找图片与 page_eyes 报告)；
+    .txt 清单(每行一个路径或 URL)；.jsonl 清单(image_url/url/image/path 字段)；page_eyes 报告 .html
+    """
+    seen = set()
+
+    def expand(source: str) -> Iterator[str]:
+        if is_url(source):
+            yield source
+            return
+        path = Path(source)
+        if path.is_dir():
+            for child in sorted(path.rglob('*')):
+                if child.suffix.lower() in IMAGE_SUFFIXES | {'.html'}:
+                    yield from expand(str(child))
+        elif path.suffix.lower() in IMAGE_SUFFIXES:
+            yield str(path)
+        elif path.suffix.lower() == '.html':
+            yield from REPORT_IMAGE_URL.findall(path.read_text(encoding='utf-8'))
+        elif path.suffix.lower() == '.jsonl':
+            for line in path.read_text(encoding='utf-8').splitlines():
+                if line.strip():
+                    record = json.loads(line)
+                    item = next((record[k] for k in ('image_url', 'url', 'image', 'path') if record.get(k)), None)
+                    if item:
+                        yield item if is_url(item) else str(path.parent / item)
+        elif path.suffix.lower() == '.txt':
+            for line in path.read_text(encoding='utf-8').splitlines():
+                if line.strip():
+                    yield line.strip()
+        else:
+            logger.warning(f'unsupported input: {source}')
+
+    for source in inputs:
+        for item in expand(source):
+            if item not in seen:
+                seen.add(item)
+                yield item
+
+
+async def load_source(source: str) -> ImageSource:
+    """读取本地图片或下载 URL 图片并解码"""
+    if is_url(source):
+        raw, name = await download_file(source), source.rsplit('/', 1)[-1]
+    else:
+        raw, name = await asyncio.to_thread(Path(source).read_bytes), Path(source).name
+    return await asyncio.to_thread(ImageSource.decode, raw, name)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/19 23:40
+"""
+离线批量解析：不启动 Web 服务、不上传对象存储，直接调用解析器，结果流式写入 JSONL 或 Parquet
+
+    python -m cli.batch_parse screenshots/ -o labels.jsonl --processes 8 --batch-size 16
+    python -m cli.batch_parse manifest.txt -o labels_parquet/ --format parquet
+
+中断后使用相同参数重新执行，从检查点继续，已成功的图片不再解析；失败的图片重新解析，
+输出中会同时保留之前的失败记录(error 字段非空)，读取时以同一 source 的最后一条为准
+"""
+import argparse
+import asyncio
+import gc
+import itertools
+import multiprocessing as mp
+import os
+import time
+import traceback
+from pathlib import Path
+
+import orjson
+import torch
+from loguru import logger
+
+from cli import iter_sources, load_source
+from config import settings
+from core.batch import BatchParser, ParserModels
+from routers.omni.deps import RequestParams
+from util.context import Context, context_var
+
+# 主进程加载后 fork，解析进程以写时复制方式共享模型权重
+models: ParserModels | None = None
+params: RequestParams | None = None
+
+
+def init_worker(torch_threads: int):
+    gc.enable()
+    torch.set_num_threads(torch_threads)
+
+
+def parse_batch(sources: tuple[str, ...]) -> list[dict]:
+    """解析一批图片，返回可序列化的记录，单张图片读取失败或整批解析失败时记录错误"""
+    context_var.set(Context())
+    loaded = asyncio.run(_load_all(sources))
+    records = {source: {'source': source, 'error': repr(result)}
+               for source, result in zip(sources, loaded) if isinstance(result, Exception)}
+    items = [(source, image) for source, image in zip(sources, loaded) if not isinstance(image, Exception)]
+    try:
+        results = BatchParser([models.create_parser(image, params) for _, image in items]).parse()
+        for (source, image), parsed_result in zip(items, results):
+            w, h = image.size
+            records[source] = {
+                'source': source,
+                'width': w,
+                'height': h,
+                'is_loading': parsed_result.is_loading,
+                'elements': [element.model_dump() for element in parsed_result.elements],
+            }
+    except Exception:
+        error = traceback.format_exc()
+        logger.error(f'batch parse failed: {error}')
+        for source, _ in items:
+            records[source] = {'source': source, 'error': error}
+    return [records[source] for source in sources]
+
+
+async def _load_all(sources: tuple[str, ...]) -> list:
+    return await asyncio.gather(*(load_source(source) for source in sources), return_exceptions=True)
+
+
+class JsonlWriter:
+    def __init__(self, output: Path):
+        output.parent.mkdir(parents=True, exist_ok=True)
+        self._file = output.open('ab')
+
+    def write(self, records: list[dict]):
+        self._file.write(b''.join(orjson.dumps(record) + b'\n' for record in records))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    """每批写入一个分片文件，续跑时继续编号，不改写已有分片"""
+
+    def __init__(self, output: Path):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise RuntimeError('parquet output requires pyarrow: pip install pyarrow')
+        output.mkdir(parents=True, exist_ok=True)
+        self.output = output
+        self._part = len(list(output.glob('part-*.parquet')))
+
+    def write(self, records: list[dict]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.table({
+            'source': [record['source'] for record in records],
+            'width': pa.array([record.get('width') for record in records], pa.int32()),
+            'height': pa.array([record.get('height') for record in records], pa.int32()),
+            'is_loading': pa.array([record.get('is_loading') for record in records], pa.bool_()),
+            # 元素结构随版本变化，以 JSON 字符串存储，读取时 json.loads
+            'elements': [orjson.dumps(record['elements']).decode() if 'elements' in record else None
+                         for record in records],
+            'error': [record.get('error') for record in records],
+        })
+        pq.write_table(table, self.output / f'part-{self._part:05d}.parquet', compression='zstd')
+        self._part += 1
+
+    def close(self):
+        pass
+
+
+class Checkpoint:
+    """已成功解析的图片列表，每批写入结果后追加，续跑时跳过；解析失败的图片不记录，续跑时重试"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.done = set(path.read_text(encoding='utf-8').splitlines()) if path.exists() else set()
+        self._file = path.open('a', encoding='utf-8')
+
+    def add(self, sources: list[str]):
+        self._file.write(''.join(f'{source}\n' for source in sources))
+        self._file.flush()
+        self.done.update(sources)
+
+    def close(self):
+        self._file.close()
+
+
+def main(args: argparse.Namespace):
+    global models, params
+    params = RequestParams(preset=args.preset, spatial_relations=not args.no_relations)
+    params.icon_caption.mode = 'eager'
+
+    output = Path(args.output)
+    writer = ParquetWriter(output) if args.format == 'parquet' else JsonlWriter(output)
+    checkpoint = Checkpoint(Path(args.checkpoint) if args.checkpoint else output.with_name(output.name + '.checkpoint'))
+    sources = [source for source in iter_sources(args.inputs) if source not in checkpoint.done]
+    logger.info(f'{len(sources)} images to parse, {len(checkpoint.done)} already done')
+    batches = list(itertools.batched(sources, args.batch_size))
+
+    cpu_count = os.cpu_count() or 1
+    processes = args.processes or max(1, cpu_count // 4)
+    if settings.device != 'cpu' and processes > 1:
+        logger.warning('CUDA cannot be forked, parse in a single process')
+        processes = 1
+    torch_threads = args.torch_threads or max(1, cpu_count // processes)
+
+    models = ParserModels.load()
+    st, parsed, failed = time.perf_counter(), 0, 0
+    if processes == 1:
+        torch.set_num_threads(torch_threads)
+        pool, results = None, map(parse_batch, batches)
+    else:
+        # 冻结已有对象，避免子进程 GC 改写对象头导致共享内存页被复制
+        gc.disable()
+        gc.freeze()
+        pool = mp.get_context('fork').Pool(processes, initializer=init_worker, initargs=(torch_threads,))
+        gc.enable()
+        # 有序返回，结果与检查点按输入顺序写入
+        results = pool.imap(parse_batch, batches)
+    logger.info(f'parse with {processes} processes, {torch_threads} torch threads per process')
+    try:
+        for records in results:
+            writer.write(records)
+            checkpoint.add([record['source'] for record in records if 'error' not in record])
+            failed += sum('error' in record for record in records)
+            parsed += len(records)
+            elapsed = time.perf_counter() - st
+            logger.info(f'{parsed}/{len(sources)} images, {failed} failed, {parsed / elapsed:.2f} images/s')
+    finally:
+        if pool is not None:
+            pool.terminate()
+        writer.close()
+        checkpoint.close()
+    elapsed = time.perf_counter() - st
+    logger.info(f'done: {parsed} images in {elapsed:.1f}s, {parsed / max(elapsed, 1e-9):.2f} images/s')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='离线批量解析截图，结果写入 JSONL/Parquet')
+    parser.add_argument('inputs', nargs='+', help='图片文件/URL、目录、.txt/.jsonl 清单或 page_eyes 报告 .html')
+    parser.add_argument('-o', '--output', required=True, help='输出 JSONL 文件，或 Parquet 分片目录')
+    parser.add_argument('--format', default='jsonl', choices=['jsonl', 'parquet'], help='输出格式')
+    parser.add_argument('--checkpoint', default=None, help='检查点文件，默认为输出路径加 .checkpoint')
+    parser.add_argument('--preset', default='balanced', choices=['fast', 'balanced', 'accurate'], help='解析预设')
+    parser.add_argument('--no-relations', action='store_true', help='不计算元素空间关系')
+    parser.add_argument('--batch-size', type=int, default=16, help='每批解析的图片数')
+    parser.add_argument('--processes', type=int, default=0, help='解析进程数，0 表示 CPU 核数 / 4，CUDA 下固定为 1')
+    parser.add_argument('--torch-threads', type=int, default=0, help='每个进程的 torch 线程数，0 表示按 CPU 核数平分')
+    main(parser.parse_args())
@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/20 04:00
+"""
+BoxesHandler 几何计算的规模基准：合成版面上不同元素数量的耗时与复杂度曲线
+
+    python -m cli.bench_geometry --save-baseline                       # 记录基线
+    python -m cli.bench_geometry --routines remove_overlap sort        # 与基线比较，退化超过阈值时退出码为 1
+
+版面(坐标为归一化坐标，标注画布为 1080x2400)：
+- grid：图标宫格，每个图标下方一行文本
+- list：列表行，每行图标、标题、副标题与带文字的按钮
+- overlap：重复检测的图标对，文本落在图标内，覆盖去重与图标内容拼接的分支
+
+复杂度为 log(耗时) 对 log(元素数) 的斜率(n >= 100)，约 1 为线性、约 2 为平方
+"""
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import supervision as sv
+from loguru import logger
+from PIL import Image
+
+# 未配置 COS/MinIO 时也能加载配置，本基准不上传文件
+os.environ.setdefault('LOCAL_STORAGE_DIR', tempfile.gettempdir())
+
+from config import settings
+from core.columns import ElementColumns, SOURCE_OCR, SOURCE_YOLO
+from core.handler import BoxesHandler
+from util.benchmark import compare_baseline, environment, load_json, save_json, summarize
+from util.label_annotator import CustomLabelAnnotator
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_BASELINE = ROOT / 'benchmarks' / 'geometry_baseline.json'
+DEFAULT_SIZES = [10, 50, 100, 500, 1000, 2000, 5000]
+CANVAS_SIZE = (1080, 2400)
+
+
+def grid_cells(count: int) -> tuple[np.ndarray, np.ndarray, float, float]:
+    """count 个单元格铺满画布，单元格在像素空间中近似正方形，返回 (左上 x, 左上 y, 宽, 高)"""
+    cols = max(1, math.ceil(math.sqrt(count * CANVAS_SIZE[0] / CANVAS_SIZE[1])))
+    rows = math.ceil(count / cols)
+    index = np.arange(count)
+    w, h = 1 / cols, 1 / rows
+    return index % cols * w, index // cols * h, w, h
+
+
+def boxes(x1, y1, x2, y2) -> np.ndarray:
+    return np.clip(np.stack(np.broadcast_arrays(x1, y1, x2, y2), axis=1), 0, 1)
+
+
+def grid_layout(n: int, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    x, y, w, h = grid_cells(max(1, n // 2))
+    icon = boxes(x + 0.2 * w, y + 0.1 * h, x + 0.8 * w, y + 0.65 * h)
+    ocr = boxes(x + 0.1 * w, y + 0.72 * h, x + 0.9 * w, y + 0.9 * h)
+    jitter = rng.normal(0, 0.02, icon.shape) * [w, h, w, h]
+    return np.clip(icon + jitter, 0, 1), ocr
+
+
+def list_layout(n: int, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    rows = max(1, n // 5)
+    h = 1 / rows
+    y = np.arange(rows) * h
+    title_end = rng.uniform(0.35, 0.65, rows)
+    icon = np.concatenate([
+        boxes(0.04, y + 0.15 * h, 0.14, y + 0.85 * h),
+        boxes(0.8, y + 0.3 * h, 0.96, y + 0.7 * h),  # 按钮
+    ])
+    ocr = np.concatenate([
+        boxes(0.17, y + 0.15 * h, title_end, y + 0.45 * h),
+        boxes(0.17, y + 0.55 * h, title_end + 0.1, y + 0.85 * h),
+        boxes(0.83, y + 0.38 * h, 0.93, y + 0.62 * h),  # 按钮文字
+    ])
+    return icon, ocr
+
+
+def overlap_layout(n: int, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    x, y, w, h = grid_cells(max(1, n // 3))
+    icon = boxes(x + 0.1 * w, y + 0.1 * h, x + 0.9 * w, y + 0.9 * h)
+    # 同一目标的重复检测，IoU 约 0.85
+    duplicate = icon + rng.uniform(0.02, 0.04, (len(icon), 1)) * [w, h, w, h]
+    ocr = boxes(x + 0.25 * w, y + 0.35 * h, x + 0.75 * w, y + 0.65 * h)
+    return np.concatenate([icon, np.clip(duplicate, 0, 1)]), ocr
+
+
+LAYOUTS: dict[str, Callable[[int, np.random.Generator], tuple[np.ndarray, np.ndarray]]] = {
+    'grid': grid_layout,
+    'list': list_layout,
+    'overlap': overlap_layout,
+}
+
+
+def make_columns(layout: str, n: int, seed: int = 0) -> tuple[ElementColumns, ElementColumns]:
+    """生成版面的 (图标元素, OCR 元素)，总数约为 n"""
+    rng = np.random.default_rng(seed)
+    icon, ocr = LAYOUTS[layout](n, rng)
+    return (
+        ElementColumns.create(icon, rng.uniform(0.3, 1, len(icon)), SOURCE_YOLO),
+        ElementColumns.create(ocr, rng.uniform(0.5, 1, len(ocr)), SOURCE_OCR, [f'text {i}' for i in range(len(ocr))]),
+    )
+
+
+def label_annotator_routine(elements: ElementColumns) -> Callable[[], object]:
+    """与 BoxesHandler.annotate 相同参数的标签布局与绘制，不含检测框绘制"""
+    w, h = CANVAS_SIZE
+    scene = np.full((h, w, 3), 255, dtype=np.uint8)
+    detections = sv.Detections(xyxy=elements.bbox * [w, h, w, h], class_id=elements.source.astype(int),
+                               confidence=elements.score)
+    ratio = max(CANVAS_SIZE) / 3200
+    annotator = CustomLabelAnnotator(
+        color_lookup=sv.ColorLookup.INDEX,
+        smart_position=True,
+        text_scale=0.8 * ratio,
+        text_thickness=max(int(2 * ratio), 1),
+        text_padding=max(int(3 * ratio), 1)
+    )
+    labels = [str(i) for i in range(len(detections))]
+    return lambda: annotator.annotate(scene=scene, detections=detections, labels=labels)
+
+
+def routines(icon: ElementColumns, ocr: ElementColumns) -> dict[str, Callable[[], object]]:
+    """各被测函数，输入与解析流程中的调用一致"""
+    filtered_icon, filtered_ocr = BoxesHandler.remove_overlap(icon, ocr, iou_threshold=settings.overlap_iou_threshold)
+    merged = ElementColumns.concat(filtered_icon, filtered_ocr)
+    elements = BoxesHandler.sort_elements_spatially(merged)
+    canvas = Image.new('RGB', CANVAS_SIZE, 'white')
+    return {
+        'remove_overlap': lambda: BoxesHandler.remove_overlap(icon, ocr, iou_threshold=settings.overlap_iou_threshold),
+        'sort': lambda: BoxesHandler.sort_elements_spatially(merged),
+        'sort_without_relations': lambda: BoxesHandler.sort_elements_spatially(merged, relations=False),
+        'annotate': lambda: BoxesHandler.annotate(image=canvas, elements=elements),
+        'label_annotator': label_annotator_routine(elements),
+    }
+
+
+def measure(func: Callable[[], object], repeat: int, budget: float) -> list[float]:
+    """预热一次后至多重复 repeat 次，累计超过 budget 秒时提前结束，至少计时一次"""
+    func()
+    samples = []
+    st = time.perf_counter()
+    while len(samples) < repeat and (not samples or time.perf_counter() - st < budget):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def exponent(sizes: dict[str, dict]) -> float | None:
+    """log(p50) 对 log(n) 的最小二乘斜率，小规模下固定开销占主导，只取 n >= 100"""
+    points = [(int(n), stats['p50']) for n, stats in sizes.items() if int(n) >= 100 and stats['p50'] > 0]
+    if len(points) < 2:
+        return None
+    n, p50 = np.log(np.asarray(points, dtype=np.float64)).T
+    return round(float(np.polyfit(n, p50, 1)[0]), 2)
+
+
+def main(args: argparse.Namespace):
+    results = {'meta': {**environment(), 'sizes': args.sizes, 'repeat': args.repeat}, 'routines': {}}
+    for layout in args.layouts:
+        for n in args.sizes:
+            icon, ocr = make_columns(layout, n, seed=args.seed)
+            for name, func in routines(icon, ocr).items():
+                if args.routines and name not in args.routines:
+                    continue
+                stats = summarize(measure(func, args.repeat, args.budget))
+                results['routines'].setdefault(name, {}).setdefault(layout, {'sizes': {}})['sizes'][str(n)] = stats
+                logger.debug(f'{name} {layout} n={len(icon) + len(ocr)}: {stats}')
+
+    for name, layouts in results['routines'].items():
+        for layout, data in layouts.items():
+            data['exponent'] = exponent(data['sizes'])
+            curve = ', '.join(f'{n}: {stats["p50"]}ms' for n, stats in data['sizes'].items())
+            logger.info(f'{name:<24}{layout:<8}O(n^{data["exponent"]})  {curve}')
+
+    if args.output:
+        save_json(Path(args.output), results)
+        logger.info(f'results saved to {args.output}')
+
+    baseline = Path(args.baseline)
+    if args.save_baseline:
+        save_json(baseline, results)
+        logger.info(f'baseline saved to {baseline}')
+    elif baseline.exists():
+        regressions = compare_baseline(results, load_json(baseline), args.threshold, sections=('routines',),
+                                       min_delta=args.min_delta)
+        for regression in regressions:
+            logger.error(f'regression: {regression}')
+        if regressions:
+            sys.exit(1)
+        logger.info(f'no regression beyond {args.threshold}% against {baseline}')
+    else:
+        logger.warning(f'baseline not found: {baseline}, run with --save-baseline to record one')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='BoxesHandler 几何计算的规模基准，与基线比较')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='元素数量')
+    parser.add_argument('--layouts', nargs='+', default=list(LAYOUTS), choices=list(LAYOUTS), help='版面')
+    parser.add_argument('--routines', nargs='+', default=None,
+                        choices=['remove_overlap', 'sort', 'sort_without_relations', 'annotate', 'label_annotator'],
+                        help='被测函数，默认全部')
+    parser.add_argument('--repeat', type=int, default=7, help='每个规模的最多计时次数')
+    parser.add_argument('--budget', type=float, default=1, help='每个规模的计时时长上限(秒)')
+    parser.add_argument('--seed', type=int, default=0, help='版面随机种子')
+    parser.add_argument('-o', '--output', default=None, help='结果 JSON 文件')
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='基线 JSON 文件')
+    parser.add_argument('--save-baseline', action='store_true', help='将本次结果记录为基线，不做比较')
+    parser.add_argument('--threshold', type=float, default=25, help='允许的退化百分比')
+    parser.add_argument('--min-delta', type=float, default=0.05, help='忽略小于该值的绝对增量(毫秒)，避免抖动误报')
+    main(parser.parse_args())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/20 05:00
+"""
+图标识别引擎对比：CLIP 嵌入分类(clip)、Florence-2(florence)与二者结合(hybrid)的准确率与耗时
+
+    python -m cli.bench_icons --dataset data/test.json --min-accuracy 0.8       # 有标注集时统计准确率
+    python -m cli.bench_icons tests/pics/coins.png --min-agreement 0.5          # 无标注时统计 clip 与 florence 一致率
+
+- 标注集格式同 Florence-2 微调数据集(json 列表或 jsonl，每条包含 image、caption)
+- 无标注集时对输入截图做图标检测，使用检测出的图标裁剪图
+- hybrid 为置信度低于 ICON_CLASSIFIER_THRESHOLD 的图标回退到 florence，耗时按回退比例估算
+- 指定 --min-accuracy/--min-agreement 时低于该值退出码为 1
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+from loguru import logger
+from PIL import Image
+
+from config import settings
+from model.icon_captioner import IconCaptioner
+from model.icon_classifier import IconClassifier
+from model.icon_detector import IconDetector
+from util.benchmark import environment, save_json
+from util.image import ImageUtil
+
+DEFAULT_INPUTS = [str(settings.root_path / 'tests' / 'pics' / 'coins.png')]
+
+
+def detect_icons(inputs: list[str]) -> list[Image.Image]:
+    """对截图做图标检测，返回全部图标裁剪图"""
+    detector = IconDetector()
+    images = []
+    for path in inputs:
+        image = Image.open(path).convert('RGB')
+        boxes, _ = detector.predict(image)
+        w, h = image.size
+        images.extend(ImageUtil.crop_images(image, (boxes / torch.tensor([w, h, w, h])).tolist()))
+    return images
+
+
+def match_rate(predictions: list[str], expected: list[str]) -> float:
+    return round(float(np.mean([p == e for p, e in zip(predictions, expected)])), 4)
+
+
+def main(args: argparse.Namespace):
+    if args.dataset:
+        images, labels = map(list, zip(*IconClassifier.load_dataset(Path(args.dataset))))
+    else:
+        images, labels = detect_icons(args.inputs or DEFAULT_INPUTS), None
+    if not images:
+        sys.exit('no icons to recognize')
+
+    captioner, classifier = IconCaptioner(), IconClassifier()
+    st = time.perf_counter()
+    florence_captions = captioner.predict(images, batch_size=settings.caption_config.batch_size)
+    florence_cost = time.perf_counter() - st
+
+    st = time.perf_counter()
+    clip_labels, clip_scores = classifier.predict(images)
+    clip_cost = time.perf_counter() - st
+
+    uncertain = [score < settings.icon_classifier_config.threshold for score in clip_scores]
+    hybrid_labels = [caption if fallback else label
+                     for label, caption, fallback in zip(clip_labels, florence_captions, uncertain)]
+    fallback_ratio = sum(uncertain) / len(images)
+
+    results = {
+        'meta': {**environment(), 'device': settings.device, 'icons': len(images), 'labelled': labels is not None},
+        'fallback_ratio': round(fallback_ratio, 4),
+        'cost': {
+            'florence': round(florence_cost, 3),
+            'clip': round(clip_cost, 3),
+            'hybrid': round(clip_cost + florence_cost * fallback_ratio, 3),
+        },
+        'agreement': match_rate(clip_labels, florence_captions),
+    }
+    if labels is not None:
+        results['accuracy'] = {
+            'florence': match_rate(florence_captions, labels),
+            'clip': match_rate(clip_labels, labels),
+            'hybrid': match_rate(hybrid_labels, labels),
+        }
+    logger.info(f'{len(images)} icons, hybrid falls back to florence for {fallback_ratio:.2%}')
+    logger.info(f'cost(s): {results["cost"]}, clip/florence agreement: {results["agreement"]:.2%}')
+    if 'accuracy' in results:
+        logger.info(f'accuracy: {results["accuracy"]}')
+    if args.output:
+        save_json(Path(args.output), results)
+        logger.info(f'results saved to {args.output}')
+
+    failures = []
+    if args.min_agreement is not None and results['agreement'] < args.min_agreement:
+        failures.append(f'agreement {results["agreement"]} < {args.min_agreement}')
+    if args.min_accuracy is not None:
+        if 'accuracy' not in results:
+            failures.append('--min-accuracy requires --dataset')
+        elif results['accuracy'][args.engine] < args.min_accuracy:
+            failures.append(f'{args.engine} accuracy {results["accuracy"][args.engine]} < {args.min_accuracy}')
+    for failure in failures:
+        logger.error(failure)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='图标识别引擎的准确率与耗时对比')
+    parser.add_argument('inputs', nargs='*', help='无标注集时做图标检测的截图，默认为 tests/pics/coins.png')
+    parser.add_argument('--dataset', default=None, help='标注集文件(json/jsonl)，格式同 Florence-2 微调数据集')
+    parser.add_argument('--engine', default='hybrid', choices=['florence', 'clip', 'hybrid'],
+                        help='--min-accuracy 检查的引擎')
+    parser.add_argument('--min-accuracy', type=float, default=None, help='准确率下限(0-1)')
+    parser.add_argument('--min-agreement', type=float, default=None, help='clip 与 florence 一致率下限(0-1)')
+    parser.add_argument('-o', '--output', default=None, help='结果 JSON 文件')
+    main(parser.parse_args())
@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/20 03:10
+"""
+解析流水线基准测试：tests/images、tests/pics 与合成的密集截图
+
+    python -m cli.benchmark --save-baseline                # 记录基线
+    python -m cli.benchmark -o bench.json --threshold 15   # 与基线比较，退化超过 15% 时退出码为 1
+
+- 各阶段耗时(OCR、YOLO、图标识别、去重、排序、标注)：并发 1 下统计，逐张取各阶段耗时
+- 端到端耗时(解析 + 标注 + 上传标注图)与进程峰值 RSS：并发 1/2/4/8 下分别解析全部截图
+- 标注图写入本地临时目录，不查询也不写入向量数据库缓存，可离线运行
+- 解析与接口使用相同的分发(dispatch_parse)：默认按配置选择解析进程池(WORKER_PROCESSES>0 且 CPU 推理)、
+  分阶段流水线(PIPELINE_ENABLE)或顺序解析，可用 --mode 指定
+
+基线与机器、设备(CPU/CUDA)及解析方式相关，不随仓库提交：在目标机器上先执行 --save-baseline 记录到
+benchmarks/pipeline_baseline.json(或 --baseline 指定的路径)，改动后在同一环境下不带该参数运行进行比较
+"""
+import argparse
+import asyncio
+import functools
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from io import BytesIO
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable
+
+from loguru import logger
+from memory_profiler import memory_usage
+from PIL import Image, ImageDraw, ImageFont
+
+# 未配置 COS/MinIO 时也能加载配置，标注图实际写入 --storage-dir
+os.environ.setdefault('LOCAL_STORAGE_DIR', tempfile.gettempdir())
+
+from cli import iter_sources, load_source
+from config import settings
+from core.batch import ParserModels, dispatch_parse
+from core.handler import BoxesHandler
+from core.parse import ParsedResult
+from core.pipeline import PipelineScheduler
+from core.worker import ParseWorkerPool
+from routers.omni.deps import RequestParams, create_pipeline
+from util.benchmark import compare_baseline, environment, load_json, save_json, summarize
+from util.context import Context, context_var
+from util.image import ImageSource
+from util.storage import LocalStrategy, StorageClient
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_INPUTS = [str(ROOT / 'tests' / 'images'), str(ROOT / 'tests' / 'pics')]
+DEFAULT_BASELINE = ROOT / 'benchmarks' / 'pipeline_baseline.json'
+
+# 解析器计时记录 -> 阶段名
+STAGES = {
+    'ocr识别': 'ocr',
+    'icon 目标检测': 'yolo',
+    '弹窗/加载中检测': 'overlay',
+    '移除重叠元素': 'overlap',
+    '裁剪出icon元素': 'crop',
+    'icon元素识别': 'caption',
+    '元素空间排序': 'sort',
+    '标注图片': 'annotate',
+}
+
+WORDS = ['Home', 'Search', 'Music', 'Video', 'Settings', 'Profile', 'Messages', 'Wallet', 'Photos', 'Camera',
+         'Weather', 'Calendar', 'Notes', 'Maps', 'Store', 'Games', 'News', 'Mail', 'Files', 'Clock', 'Download',
+         'Share', 'Follow', 'Playlist', 'Album', 'Artist', 'Radio', 'Podcast', 'Library', 'Recent', 'Favorites']
+
+
+def synthetic_screen(seed: int, width: int = 1080, height: int = 2400) -> Image.Image:
+    """合成密集的移动端页面：标题栏、图标宫格与带图标和按钮的列表，元素数量远多于常见截图"""
+    rng = random.Random(seed)
+    image = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(image)
+    font, small = ImageFont.load_default(size=34), ImageFont.load_default(size=26)
+
+    def color() -> tuple[int, int, int]:
+        return rng.randrange(40, 220), rng.randrange(40, 220), rng.randrange(40, 220)
+
+    draw.rectangle((0, 0, width, 140), fill=(245, 245, 245))
+    draw.text((48, 70), rng.choice(WORDS), font=font, fill='black', anchor='lm')
+    draw.ellipse((width - 112, 38, width - 48, 102), outline=(60, 60, 60), width=5)
+
+    y, columns = 180, 5
+    cell = width // columns
+    for _ in range(4):
+        for col in range(columns):
+            x = col * cell + (cell - 100) // 2
+            draw.rounded_rectangle((x, y, x + 100, y + 100), radius=24, fill=color())
+            draw.ellipse((x + 30, y + 30, x + 70, y + 70), outline='white', width=6)
+            draw.text((col * cell + cell // 2, y + 135), rng.choice(WORDS), font=small, fill='black', anchor='mm')
+        y += 185
+
+    while y + 150 < height:
+        draw.rounded_rectangle((48, y + 25, 148, y + 125), radius=18, fill=color())
+        draw.text((180, y + 55), ' '.join(rng.sample(WORDS, 3)), font=font, fill='black', anchor='lm')
+        draw.text((180, y + 105), ' '.join(rng.sample(WORDS, 5)), font=small, fill=(120, 120, 120), anchor='lm')
+        draw.rounded_rectangle((width - 210, y + 50, width - 48, y + 104), radius=27, outline=(30, 144, 255), width=3)
+        draw.text((width - 129, y + 77), rng.choice(WORDS), font=small, fill=(30, 144, 255), anchor='mm')
+        draw.line((48, y + 149, width - 48, y + 149), fill=(230, 230, 230), width=2)
+        y += 150
+    return image
+
+
+async def load_sources(inputs: list[str], synthetic: int) -> list[ImageSource]:
+    sources = [await load_source(source) for source in iter_sources(inputs)]
+    for i in range(synthetic):
+        buffer = BytesIO()
+        synthetic_screen(seed=i).save(buffer, 'png')
+        sources.append(await asyncio.to_thread(ImageSource.decode, buffer.getvalue(), f'synthetic_{i}.png'))
+    return sources
+
+
+Dispatch = Callable[[ImageSource, RequestParams], Awaitable[ParsedResult]]
+
+
+def default_mode() -> str:
+    """与接口启动时的选择一致"""
+    if settings.worker_config.processes > 0 and settings.device == 'cpu':
+        return 'workers'
+    return 'pipeline' if settings.pipeline_config.enable else 'sequential'
+
+
+def warmup_worker(models: ParserModels, source: ImageSource, params: RequestParams):
+    """解析进程预热：完整解析一张截图"""
+    context_var.set(Context(source=source))
+    models.create_parser(source, params).parse()
+
+
+@asynccontextmanager
+async def parse_backend(models: ParserModels, mode: str, warmup_source: ImageSource,
+                        params: RequestParams) -> AsyncIterator[tuple[Dispatch, PipelineScheduler | None]]:
+    """
+    按解析方式创建解析进程池或流水线调度，二者都绑定到当前事件循环，每个并发级别单独创建
+
+    Returns:
+        (解析分发, 流水线调度)
+    """
+    worker_pool, scheduler = None, None
+    if mode == 'workers':
+        # 主进程不做推理，模型加载后直接 fork
+        worker_pool = ParseWorkerPool(settings.worker_config.processes, models.create_parser,
+                                      settings.worker_config.torch_threads,
+                                      warmup=functools.partial(warmup_worker, models, warmup_source, params),
+                                      max_failures=settings.worker_config.max_failures)
+        worker_pool.start()
+        await worker_pool.wait_ready()
+    elif mode == 'pipeline':
+        scheduler = create_pipeline()
+    try:
+        yield functools.partial(dispatch_parse, parser_factory=models.create_parser, worker_pool=worker_pool,
+                                scheduler=scheduler, job_timeout=settings.worker_config.job_timeout), scheduler
+    finally:
+        if worker_pool:
+            worker_pool.close()
+        if scheduler is not None:
+            scheduler.close()
+
+
+def annotate(source: ImageSource, parsed_result: ParsedResult) -> Image.Image:
+    with context_var.get().timer_recorder.timer('标注图片'):
+        return BoxesHandler.annotate(image=source.image, elements=parsed_result.columns)
+
+
+async def parse_once(
+        dispatch: Dispatch,
+        scheduler: PipelineScheduler | None,
+        source: ImageSource,
+        params: RequestParams
+) -> tuple[float, dict]:
+    """
+    解析一张截图并上传标注图，与接口未命中缓存时的处理一致
+
+    Returns:
+        (端到端耗时, 各阶段耗时)，单位为秒
+    """
+    context = Context(source=source)
+    context_var.set(context)
+    st = time.perf_counter()
+    parsed_result = await dispatch(source, params)
+    if scheduler is not None:
+        annotated_image = await scheduler.submit('annotate', annotate, source, parsed_result)
+    else:
+        annotated_image = await asyncio.to_thread(annotate, source, parsed_result)
+    await settings.storage_client.async_upload_file(annotated_image, prefix=settings.storage_prefix)
+    elapsed = time.perf_counter() - st
+
+    stages = defaultdict(float)
+    for record in context.timer_recorder.records:
+        if record.message in STAGES:
+            stages[STAGES[record.message]] += record.elapsed
+    return elapsed, dict(stages)
+
+
+async def run_level(
+        models: ParserModels,
+        mode: str,
+        sources: list[ImageSource],
+        params: RequestParams,
+        concurrency: int,
+        rounds: int,
+        warmup: bool = False
+) -> tuple[float, list[tuple[float, dict]]]:
+    """
+    以指定并发解析全部截图 rounds 轮，返回 (总耗时, 每次解析的耗时)
+
+    Args:
+        warmup: 计时前先完整解析一遍，首次推理包含模型初始化与内存分配
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    async with parse_backend(models, mode, sources[0], params) as (dispatch, scheduler):
+        async def worker(source: ImageSource) -> tuple[float, dict]:
+            async with semaphore:
+                return await parse_once(dispatch, scheduler, source, params)
+
+        if warmup:
+            for source in sources:
+                await parse_once(dispatch, scheduler, source, params)
+        st = time.perf_counter()
+        samples = await asyncio.gather(*(worker(source) for _ in range(rounds) for source in sources))
+        return time.perf_counter() - st, samples
+
+
+def main(args: argparse.Namespace):
+    # 标注图写入本地目录，不依赖对象存储
+    storage_dir = Path(args.storage_dir or tempfile.mkdtemp(prefix='omni-bench-'))
+    settings.storage_client = StorageClient(LocalStrategy(storage_dir))
+
+    sources = asyncio.run(load_sources(args.inputs or DEFAULT_INPUTS, args.synthetic))
+    if not sources:
+        sys.exit('no images to benchmark')
+    params = RequestParams(preset=args.preset)
+    params.icon_caption.mode = 'eager'
+    mode = args.mode or default_mode()
+    if mode == 'workers' and (settings.worker_config.processes <= 0 or settings.device != 'cpu'):
+        sys.exit('workers mode requires WORKER_PROCESSES > 0 and cpu inference')
+    models = ParserModels.load()
+    logger.info(f'benchmark {len(sources)} images on {settings.device} ({mode}), annotated images in {storage_dir}')
+
+    results = {
+        'meta': {**environment(), 'device': settings.device, 'mode': mode, 'preset': args.preset,
+                 'images': len(sources), 'rounds': args.rounds},
+        'stages': {},
+        'concurrency': {},
+    }
+    for i, concurrency in enumerate(args.concurrency):
+        # 首个并发级别计时前先完整解析一遍，解析进程池每次新建时各进程另行预热
+        peak_rss, (wall, samples) = memory_usage(
+            (asyncio.run, (run_level(models, mode, sources, params, concurrency, args.rounds, warmup=i == 0),)),
+            interval=0.05, max_usage=True, retval=True, include_children=True, max_iterations=1)
+        results['concurrency'][str(concurrency)] = {
+            **summarize([elapsed for elapsed, _ in samples]),
+            'throughput': round(len(samples) / wall, 3),
+            'peak_rss_mb': round(peak_rss, 1),
+        }
+        if not results['stages']:
+            # 各阶段耗时取第一个并发级别(默认为 1)，更高并发下包含资源争用
+            stages = defaultdict(list)
+            for _, stage_elapsed in samples:
+                for name, elapsed in stage_elapsed.items():
+                    stages[name].append(elapsed)
+            results['stages'] = {name: summarize(stages[name]) for name in STAGES.values() if name in stages}
+        logger.info(f'concurrency {concurrency}: {results["concurrency"][str(concurrency)]}')
+
+    for name, stats in results['stages'].items():
+        logger.info(f'stage {name}: {stats}')
+    if args.output:
+        save_json(Path(args.output), results)
+        logger.info(f'results saved to {args.output}')
+
+    baseline = Path(args.baseline)
+    if args.save_baseline:
+        save_json(baseline, results)
+        logger.info(f'baseline saved to {baseline}')
+    elif baseline.exists():
+        regressions = compare_baseline(results, load_json(baseline), args.threshold, metrics=('p50', 'peak_rss_mb'),
+                                       sections=('stages', 'concurrency'), min_delta=args.min_delta)
+        for regression in regressions:
+            logger.error(f'regression: {regression}')
+        if regressions:
+            sys.exit(1)
+        logger.info(f'no regression beyond {args.threshold}% against {baseline}')
+    else:
+        logger.warning(f'baseline not found: {baseline}, run with --save-baseline to record one')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='解析流水线基准测试，与基线比较各阶段耗时')
+    parser.add_argument('inputs', nargs='*', help='图片文件/目录/清单，默认为 tests/images 与 tests/pics')
+    parser.add_argument('--synthetic', type=int, default=4, help='合成的密集截图数量')
+    parser.add_argument('--rounds', type=int, default=1, help='每个并发级别重复解析全部截图的轮数')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8], help='并发级别')
+    parser.add_argument('--preset', default='balanced', choices=['fast', 'balanced', 'accurate'], help='解析预设')
+    parser.add_argument('--mode', default=None, choices=['workers', 'pipeline', 'sequential'],
+                        help='解析方式，默认与接口一致按配置选择')
+    parser.add_argument('-o', '--output', default=None, help='结果 JSON 文件')
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='基线 JSON 文件')
+    parser.add_argument('--save-baseline', action='store_true', help='将本次结果记录为基线，不做比较')
+    parser.add_argument('--threshold', type=float, default=20, help='允许的退化百分比')
+    parser.add_argument('--min-delta', type=float, default=2, help='忽略小于该值的绝对增量(毫秒/MB)，避免抖动误报')
+    parser.add_argument('--storage-dir', default=None, help='标注图写入目录，默认为临时目录')
+    main(parser.parse_args())
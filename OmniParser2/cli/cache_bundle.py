@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/20 00:30
+"""
+截图缓存离线包的导出与导入
+
+    # 从向量数据库导出最近 7 天的缓存，CI 下载后设置 CACHE_BUNDLE_PATH 启动服务
+    python -m cli.cache_bundle export -o cache.opcb --days 7
+    # 导入到另一个向量数据库，沿用离线包中的向量，不重新计算
+    python -m cli.cache_bundle import cache.opcb
+"""
+import argparse
+import asyncio
+import io
+import itertools
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from PIL import Image
+from loguru import logger
+from pymilvus import MilvusClient
+
+from config import settings
+from util.cache_bundle import BundleRecord, CacheBundle, write_bundle
+from util.cos import download_file
+from util.image_vector_storage import AsyncImageVectorStorage, PAYLOAD_MAX_LENGTH, decode_elements, \
+    encode_elements
+from util.perceptual_hash import thumbnail, to_signed, to_unsigned
+
+OUTPUT_FIELDS = ['payload', 'labeled_url', 'image_url', 'vector', 'timestamp', 'key', 'preset', 'dhash']
+
+
+def query_rows(days: int, preset: str | None) -> list[dict]:
+    config = settings.milvus_config
+    client = MilvusClient(uri=f'http://{config.host}:{config.port}')
+    since = int((datetime.now() - timedelta(days=days)).timestamp())
+    filter_expr = f'timestamp >= {since}' + (f' and preset == "{preset}"' if preset else '')
+    try:
+        client.load_collection(config.collection_name)
+        iterator = client.query_iterator(config.collection_name, batch_size=1000, filter=filter_expr,
+                                         output_fields=OUTPUT_FIELDS)
+        rows = []
+        try:
+            while batch := iterator.next():
+                rows.extend(batch)
+        finally:
+            iterator.close()
+        return rows
+    finally:
+        client.close()
+
+
+async def export_bundle(output: str, days: int, preset: str | None, concurrency: int):
+    st = time.perf_counter()
+    rows = await asyncio.to_thread(query_rows, days, preset)
+    logger.info(f'{len(rows)} cache records to export')
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def to_record(row: dict) -> BundleRecord | None:
+        # 离线包按缩略图确认命中，需要原图计算缩略图，原图不可用的记录不导出
+        if not row.get('image_url'):
+            return None
+        try:
+            async with semaphore:
+                content = await download_file(row['image_url'])
+            thumb = await asyncio.to_thread(lambda: thumbnail(Image.open(io.BytesIO(content))))
+        except Exception as e:
+            logger.warning(f'skip {row["image_url"]}: {e!r}')
+            return None
+        return BundleRecord(
+            dhash=to_unsigned(row['dhash']),
+            thumb=thumb,
+            vector=np.asarray(row['vector'], dtype=np.float32),
+            preset=row['preset'],
+            timestamp=row['timestamp'],
+            elements=decode_elements(row['payload']),
+            labeled_url=row['labeled_url'],
+            image_url=row['image_url'],
+            key=row.get('key', ''),
+        )
+
+    records = [record for record in await asyncio.gather(*map(to_record, rows)) if record is not None]
+    count = await asyncio.to_thread(write_bundle, output, records)
+    logger.info(f'exported {count}/{len(rows)} records to {output} in {time.perf_counter() - st:.1f}s')
+
+
+async def import_bundle(path: str, batch_size: int):
+    bundle = CacheBundle(path)
+    storage = await AsyncImageVectorStorage.create_instance(
+        host=settings.milvus_config.host,
+        port=settings.milvus_config.port,
+        collection_name=settings.milvus_config.collection_name,
+        model_name=bundle.meta['model_name'],
+    )
+    since = int((datetime.now() - timedelta(days=settings.milvus_config.retention_days)).timestamp())
+    stats = dict.fromkeys(['total', 'expired', 'skipped', 'stored'], 0)
+    try:
+        for batch in itertools.batched(bundle.records(), batch_size):
+            stats['total'] += len(batch)
+            # 超出保留期的记录所在分区会被删除，不导入
+            kept = [record for record in batch if record.timestamp >= since]
+            stats['expired'] += len(batch) - len(kept)
+            if not kept:
+                continue
+            duplicates = await storage.find_duplicates(
+                np.stack([record.vector for record in kept]), [record.preset for record in kept],
+                days_filter=settings.milvus_config.retention_days)
+            stats['skipped'] += sum(duplicates)
+            rows, thumbs = [], []
+            for record, duplicate in zip(kept, duplicates):
+                payload = encode_elements(record.elements)
+                if duplicate or len(payload) > PAYLOAD_MAX_LENGTH:
+                    continue
+                rows.append({
+                    'payload': payload,
+                    'labeled_url': record.labeled_url,
+                    'image_url': record.image_url,
+                    'vector': record.vector.tolist(),
+                    'timestamp': record.timestamp,
+                    'key': record.key,
+                    'preset': record.preset,
+                    'dhash': to_signed(record.dhash),
+                })
+                thumbs.append(record.thumb)
+            stats['stored'] += await storage.insert_rows(rows, thumbs)
+    finally:
+        await storage.close()
+        bundle.close()
+    logger.info(f'bundle imported: {stats}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='截图缓存离线包的导出与导入')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help='从向量数据库导出离线包')
+    export_parser.add_argument('-o', '--output', required=True, help='离线包文件路径')
+    export_parser.add_argument('--days', type=int, default=settings.milvus_config.retention_days, help='导出最近天数')
+    export_parser.add_argument('--preset', default=None, choices=['fast', 'balanced', 'accurate'], help='只导出该预设')
+    export_parser.add_argument('--concurrency', type=int, default=16, help='原图下载并发数')
+    import_parser = subparsers.add_parser('import', help='将离线包导入向量数据库')
+    import_parser.add_argument('bundle', help='离线包文件路径')
+    import_parser.add_argument('--batch-size', type=int, default=256, help='每批写入条数')
+    args = parser.parse_args()
+    if args.command == 'export':
+        asyncio.run(export_bundle(args.output, args.days, args.preset, args.concurrency))
+    else:
+        asyncio.run(import_bundle(args.bundle, args.batch_size))
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/19 23:20
+"""
+截图缓存预热：批量解析历史截图并写入缓存，新部署的服务启动即可命中
+
+    python -m cli.warm_cache report/ screenshots.txt --preset balanced --batch-size 16
+"""
+import argparse
+import asyncio
+import itertools
+import time
+
+import numpy as np
+from loguru import logger
+
+from cli import iter_sources, load_source, is_url
+from config import settings
+from core.batch import BatchParser, ParserModels
+from core.handler import BoxesHandler
+from routers.omni.deps import RequestParams
+from util.context import Context, context_var
+from util.image_vector_storage import AsyncImageVectorStorage, CacheEntry
+
+
+async def upload(source: str, image_source) -> str:
+    """URL 输入已在对象存储中，直接作为原始图片地址"""
+    if is_url(source):
+        return source
+    return await settings.storage_client.async_upload_file(
+        image_source.buffer(), prefix=settings.storage_prefix, image=image_source.array)
+
+
+async def warm_cache(inputs: list[str], preset: str, batch_size: int, key: str, limit: int | None):
+    storage, models = await asyncio.gather(
+        AsyncImageVectorStorage.create_instance(
+            host=settings.milvus_config.host,
+            port=settings.milvus_config.port,
+            collection_name=settings.milvus_config.collection_name,
+        ),
+        asyncio.to_thread(ParserModels.load),
+    )
+    # 与服务写入缓存的条件一致：完整识别图标、计算空间关系、使用默认识别引擎
+    params = RequestParams(preset=preset)
+    params.icon_caption.mode = 'eager'
+    params.icon_caption.engine = settings.caption_config.engine
+    params.spatial_relations = True
+
+    stats = dict.fromkeys(['total', 'skipped', 'loading', 'stored', 'failed'], 0)
+    st = time.perf_counter()
+    try:
+        for batch in itertools.batched(itertools.islice(iter_sources(inputs), limit), batch_size):
+            stats['total'] += len(batch)
+            loaded = await asyncio.gather(*(load_source(source) for source in batch), return_exceptions=True)
+            items = []
+            for source, result in zip(batch, loaded):
+                if isinstance(result, Exception):
+                    stats['failed'] += 1
+                    logger.error(f'load {source} failed: {result}')
+                else:
+                    items.append((source, result))
+            if not items:
+                continue
+
+            # 批量计算向量并查重，已缓存的截图不再解析
+            vectors = await asyncio.to_thread(storage.images_to_vectors, [image.image for _, image in items])
+            duplicates = await storage.find_duplicates(
+                vectors, [params.preset] * len(items), days_filter=settings.milvus_config.retention_days)
+            stats['skipped'] += sum(duplicates)
+            keep = [i for i, duplicate in enumerate(duplicates) if not duplicate]
+            if not keep:
+                continue
+            items, vectors = [items[i] for i in keep], vectors[keep]
+
+            context_var.set(Context())
+            results = await asyncio.to_thread(
+                BatchParser([models.create_parser(image, params) for _, image in items]).parse)
+
+            entries, entry_vectors = [], []
+            for (source, image), parsed_result, vector in zip(items, results, vectors):
+                # 加载中/空白页不缓存，与服务一致
+                if parsed_result.is_loading:
+                    stats['loading'] += 1
+                    continue
+                annotated_image = await asyncio.to_thread(
+                    BoxesHandler.annotate, image=image.image, elements=parsed_result.columns)
+                image_url, labeled_url = await asyncio.gather(
+                    upload(source, image),
+                    settings.storage_client.async_upload_file(annotated_image, prefix=settings.storage_prefix),
+                )
+                entries.append(CacheEntry(image=image.image, elements=parsed_result.elements, labeled_url=labeled_url,
+                                          key=key, image_url=image_url, preset=params.preset))
+                entry_vectors.append(vector)
+            if entries:
+                stats['stored'] += await storage.store_many(entries, vectors=np.stack(entry_vectors))
+
+            elapsed = time.perf_counter() - st
+            logger.info(f'{stats}, {stats["total"] / elapsed:.2f} images/s')
+    finally:
+        await storage.close()
+    logger.info(f'cache warmed: {stats}, elapsed: {time.perf_counter() - st:.1f}s')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='批量解析历史截图并预热截图缓存')
+    parser.add_argument('inputs', nargs='+', help='图片文件/URL、目录、.txt/.jsonl 清单或 page_eyes 报告 .html')
+    parser.add_argument('--preset', default='balanced', choices=['fast', 'balanced', 'accurate'], help='解析预设')
+    parser.add_argument('--batch-size', type=int, default=16, help='每批解析的图片数')
+    parser.add_argument('--key', default='warm_cache', help='写入缓存的来源 key')
+    parser.add_argument('--limit', type=int, default=None, help='最多处理的图片数')
+    args = parser.parse_args()
+    asyncio.run(warm_cache(args.inputs, args.preset, args.batch_size, args.key, args.limit))
@@ -48,6 +48,13 @@ class MinioConfig(BaseSettings):
     secure: bool = Field(default=False)
 
 
+class LocalStorageConfig(BaseSettings):
+    """本地目录存储，未配置 COS 与 MinIO 时使用，用于离线调试与基准测试"""
+    model_config = SettingsConfigDict(env_file='.env', env_prefix='local_storage_', extra='ignore')
+
+    dir: Optional[Path] = None
+
+
 class OCRConfig(BaseSettings):
     model_config = SettingsConfigDict(env_file='.env', env_prefix='OCR_', extra='ignore')
 
@@ -79,6 +86,33 @@ class OCRConfig(BaseSettings):
     # 0.0表示不过滤，保留所有识别结果
     text_rec_score_thresh: float = 0.7
 
+    # OCR 实例池大小，PaddleOCR 实例非线程安全，分块与并发请求的并行度受其限制，为 1 时分块顺序识别；
+    # 每个实例单独占用模型内存，内存受限时可调小
+    pool_size: int = 2
+
+
+class OCRTileConfig(BaseSettings):
+    """长截图/高分辨率截图分块识别"""
+    model_config = SettingsConfigDict(env_file='.env', env_prefix='OCR_TILE_', extra='ignore')
+
+    enable: bool = True
+    # 长边缩小倍数 (长边 / text_det_limit_side_len) 超过该值时分块识别，普通手机截图 (3200 / 960 ≈ 3.3) 不分块
+    max_downscale: float = 3.5
+    # 分块边长为 text_det_limit_side_len 的倍数，即每个分块最多缩小该倍数
+    tile_scale: float = 1.6
+    # 分块重叠像素，需大于单行文字高度，保证被切断的文字在相邻分块中完整出现
+    overlap: int = 128
+
+
+class MobileOCRConfig(BaseSettings):
+    """fast 预设使用的轻量 OCR 模型"""
+    model_config = SettingsConfigDict(env_file='.env', env_prefix='OCR_MOBILE_', extra='ignore')
+
+    text_detection_model_name: str = 'PP-OCRv5_mobile_det'
+    text_recognition_model_name: str = 'PP-OCRv4_mobile_rec'
+
+    preload: bool = False  # 是否在启动时加载，否则首次使用时加载
+
 
 class YoloConfig(BaseSettings):
     model_config = SettingsConfigDict(env_file='.env', env_prefix='YOLO_', extra='ignore')
@@ -104,6 +138,29 @@ class OverlayYoloConfig(BaseSettings):
     iou: float = 0.5  # IoU 阈值
 
 
+class LoadingCheckConfig(BaseSettings):
+    model_config = SettingsConfigDict(env_file='.env', env_prefix='LOADING_CHECK_', extra='ignore')
+
+    enable: bool = True  # 是否在完整解析前进行加载中/空白页快速检测
+
+    # 颜色统计前将截图缩小到该边长以内，加载页判断只关心颜色分布，无需全分辨率
+    sample_size: int = 256
+    color_bits_to_reduce: int = 6
+
+    # 单一颜色占比超过该值且几乎没有边缘(见 blank_edge_ratio)时判定为空白页/加载中，不再执行后续识别
+    blank_threshold: float = 0.995
+    # 空白页的边缘像素占比上限，只有少量文字、边框的稀疏页面(如空状态页)颜色占比同样很高，需由边缘区分
+    blank_edge_ratio: float = 0.0001
+    # 相邻像素任一通道差值达到该值时视为边缘
+    edge_threshold: int = 24
+    # 单一颜色占比超过该值视为疑似加载页，需要弹窗模型进一步确认
+    dominance_threshold: float = 0.9
+
+    # 疑似加载页时是否使用弹窗模型确认 "页面加载中"
+    use_overlay: bool = True
+    overlay_conf: float = 0.8  # "页面加载中" 置信度阈值
+
+
 class CaptionConfig(BaseSettings):
     model_config = SettingsConfigDict(env_file='.env', env_prefix='CAPTION_', extra='ignore')
 
@@ -119,6 +176,62 @@ class CaptionConfig(BaseSettings):
     batch_size: int = 4
     max_new_tokens: int = 20
 
+    # 按需识别(lazy)模式下，图标裁剪图与识别结果的保留时间(秒)与最大解析会话数
+    lazy_ttl: int = 600
+    lazy_max_sessions: int = 512
+
+    # 图标识别引擎: florence(生成式描述)、clip(嵌入最近邻分类)、hybrid(先分类，置信度低于阈值时使用 florence)
+    engine: Literal['florence', 'clip', 'hybrid'] = 'florence'
+
+
+class IconClassifierConfig(BaseSettings):
+    model_config = SettingsConfigDict(env_file='.env', env_prefix='ICON_CLASSIFIER_', extra='ignore')
+
+    # 是否加载 CLIP 图标分类器，图标识别引擎为 clip/hybrid 时需要开启
+    enable: bool = False
+    model_name: str = 'ViT-B/32'
+    # 标签表文件(labels, embeddings)，不存在时使用内置的常见图标文本标签
+    table_file: Path = root_path / 'model/weights/icon_classifier/labels.npz'
+    # hybrid 模式下，分类置信度低于该值的图标使用 florence 识别
+    threshold: float = 0.6
+    batch_size: int = 64
+
+
+class WorkerConfig(BaseSettings):
+    """预派生解析进程配置，主进程加载模型后 fork 出解析进程，仅支持 CPU 推理"""
+    model_config = SettingsConfigDict(env_file='.env', env_prefix='WORKER_', extra='ignore')
+
+    processes: int = 0  # 解析进程数，0 表示在主进程内解析
+    torch_threads: int = 0  # 每个解析进程的 torch 计算线程数，0 表示按 CPU 核数平分
+    job_timeout: float = 300  # 单次解析超时时间(秒)
+    max_failures: int = 3  # 同一解析进程连续启动失败(预热失败或就绪前退出)的次数上限，超出后不再重启，服务标记为异常
+
+
+class PipelineConfig(BaseSettings):
+    """
+    分阶段流水线解析，各阶段拥有独立的线程池与有界队列，不同请求可同时处于不同阶段
+
+    仅在主进程内解析时生效，解析进程模式下每个进程仍顺序执行各阶段
+    """
+    model_config = SettingsConfigDict(env_file='.env', env_prefix='PIPELINE_', extra='ignore')
+
+    enable: bool = True
+    # 阶段名 -> 并行线程数，模型阶段为 1 时同一模型同一时间只执行一个推理；ocr 为 0 时与 OCR 实例池大小一致
+    # 环境变量以 JSON 配置，如 PIPELINE_STAGES='{"ocr": 2, "caption": 1}'
+    stages: dict[str, int] = {
+        'decode': 2,
+        'ocr': 0,
+        'icon_detect': 1,
+        'overlay_detect': 1,
+        'overlap': 2,
+        'crop': 2,
+        'caption': 1,
+        'sort': 2,
+        'rois': 1,
+        'annotate': 2,
+    }
+    queue_size: int = 8  # 每个阶段的最大排队任务数，队列已满时上游等待
+
 
 class MilvusConfig(BaseSettings):
     model_config = SettingsConfigDict(env_file='.env', env_prefix='MILVUS_', extra='ignore')
@@ -128,6 +241,49 @@ class MilvusConfig(BaseSettings):
     port: int = 19530
     threshold: float = 0.9999
     similarity_threshold: float = 0.95
+    collection_name: str = 'image_cache_v2'
+    retention_days: int = 30  # 缓存保留天数，按自然日分区，过期分区整体删除
+    # 重新列出日期分区的间隔(秒)，其他副本、预热缓存或离线包导入新建的分区在此之后才会被查询
+    partition_refresh_interval: float = 60
+    dedupe_on_write: bool = True  # 写入时跳过向量相似度达到 threshold 的重复结果
+    # 向量索引：HNSW 查询耗时随数据量近似对数增长；IVF_FLAT/IVF_SQ8 需按数据量调整 nlist(约 4*sqrt(N)) 与 nprobe
+    # 与已有集合的索引类型不一致时启动时重建索引
+    index_type: Literal['HNSW', 'IVF_FLAT', 'IVF_SQ8'] = 'HNSW'
+    hnsw_m: int = 16
+    hnsw_ef_construction: int = 200
+    hnsw_ef: int = 64  # 查询时的候选集大小，越大召回越高
+    ivf_nlist: int = 1024
+    ivf_nprobe: int = 32  # 查询时搜索的聚类数，越大召回越高
+    # 第一级感知哈希索引：64 位 dHash 的 BK 树，确定命中/未命中时跳过 CLIP 编码与向量检索
+    hash_tier: bool = True
+    hash_hit_distance: int = 2  # 汉明距离不超过该值且缩略图一致时直接命中
+    hash_thumb_threshold: float = 1.0  # 32x32 灰度缩略图平均绝对差(0-255)上限
+    hash_miss_distance: int = 12  # 该距离内没有候选时确定未命中
+    # 索引只在启动时完整加载，之后其他副本、预热缓存或离线包导入写入的记录不在本进程索引中，
+    # 开启后会把这些记录误判为未命中直到重启；仅在单副本且所有写入都经过本进程时开启
+    hash_rule_out_misses: bool = False
+    hash_max_entries: int = 100000  # 索引条目上限，超出后不再排除未命中
+    # 解析结果写回缓冲：攒批后批量写入，请求不等待写入
+    write_batch_size: int = 32  # 单批最大条数
+    write_flush_interval: float = 1.0  # 最长攒批时间(秒)
+    write_max_pending: int = 256  # 最多缓存的待写入条数，超出时丢弃，每条持有一张已解码截图
+
+
+class CacheBundleConfig(BaseSettings):
+    """截图缓存离线包(python -m cli.cache_bundle export 导出)，启动时只读映射，先于向量数据库查询，不依赖 Milvus"""
+    model_config = SettingsConfigDict(env_file='.env', env_prefix='CACHE_BUNDLE_', extra='ignore')
+
+    path: Optional[Path] = None  # 为空时不启用
+    hit_distance: int = 2  # 汉明距离不超过该值且缩略图一致时命中
+    thumb_threshold: float = 1.0  # 32x32 灰度缩略图平均绝对差(0-255)上限
+
+
+class FrameSocketConfig(BaseSettings):
+    """同机部署时的 Unix domain socket 二进制帧协议，agent 的 OMNI_BASE_URL 配置为 unix://{path}"""
+    model_config = SettingsConfigDict(env_file='.env', env_prefix='FRAME_SOCKET_', extra='ignore')
+
+    path: Optional[Path] = None  # 为空时不启用
+    max_bytes: int = 64 << 20  # 单个请求帧上限，原始像素帧按 宽x高x通道 计
 
 
 class Settings(BaseSettings):
@@ -137,15 +293,23 @@ class Settings(BaseSettings):
     openapi_url: Optional[str] = None  # 默认禁用 OpenAPI JSON 文件 (/openapi.json)、Swagger UI 和 ReDoc，规避安全风险
     log_level: str | int = logging.INFO
     max_concurrency: int = 4  # 最大并发数，限流用
-    storage_client: StorageClient = StorageClient.create_from_config(CosConfig(), MinioConfig())
+    storage_client: StorageClient = StorageClient.create_from_config(CosConfig(), MinioConfig(), LocalStorageConfig())
     storage_prefix: str = 'omni-parser/'
 
     milvus_config: MilvusConfig = MilvusConfig()
+    cache_bundle_config: CacheBundleConfig = CacheBundleConfig()
+    frame_socket_config: FrameSocketConfig = FrameSocketConfig()
 
     ocr_config: OCRConfig = OCRConfig()
+    mobile_ocr_config: MobileOCRConfig = MobileOCRConfig()
+    ocr_tile_config: OCRTileConfig = OCRTileConfig()
     yolo_config: YoloConfig = YoloConfig()
     overlay_yolo_config: OverlayYoloConfig = OverlayYoloConfig()
     caption_config: CaptionConfig = CaptionConfig()
+    icon_classifier_config: IconClassifierConfig = IconClassifierConfig()
+    loading_check_config: LoadingCheckConfig = LoadingCheckConfig()
+    worker_config: WorkerConfig = WorkerConfig()
+    pipeline_config: PipelineConfig = PipelineConfig()
 
     device: str = 'cuda' if torch.cuda.is_available() else 'cpu'
     torch_dtype: dtype = torch.float32 if device == 'cpu' else torch.float16
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/19 23:00
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+from loguru import logger
+
+from config import settings
+from core.columns import ElementColumns
+from core.parse import OmniParser, ParsedResult
+from core.pipeline import PipelineScheduler
+from core.worker import ParseWorkerPool, ParserFactory
+from model.icon_captioner import IconCaptioner
+from model.icon_classifier import IconClassifier
+from model.icon_detector import IconDetector
+from model.ocr_pool import OCRPool
+from model.overlay_detector import OverlayDetector
+from util.context import context_var
+from util.image import ImageUtil, ImageSource
+
+
+def create_ocr(mobile: bool = False) -> OCRPool:
+    """按配置创建 OCR 实例池，mobile 为 True 时使用 mobile 模型"""
+    overrides = settings.mobile_ocr_config.model_dump(exclude={'preload'}) if mobile else {}
+    return OCRPool(settings.ocr_config.pool_size, **settings.ocr_config.model_dump(exclude={'pool_size'}), **overrides)
+
+
+def build_parser(
+        source: ImageSource,
+        params,
+        *,
+        ocr: OCRPool,
+        icon_detector: IconDetector,
+        icon_captioner: IconCaptioner,
+        icon_classifier: IconClassifier | None,
+        overlay_detector: OverlayDetector
+) -> OmniParser:
+    """
+    按请求参数构建解析器，接口、解析进程与离线任务共用，保证各入口的解析结果一致
+
+    Args:
+        source: 图片
+        params: 解析请求参数 (RequestParams)
+    """
+    return OmniParser(
+        source=source,
+        ocr=ocr,
+        ocr_params=params.ocr,
+        icon_detector=icon_detector,
+        icon_detect_params=params.icon_detect,
+        icon_captioner=icon_captioner,
+        icon_caption_params=params.icon_caption,
+        icon_classifier=icon_classifier,
+        overlay_detector=overlay_detector,
+        overlay_detect_params=params.overlay_detect,
+        loading_check_params=params.loading_check,
+        overlap_iou_threshold=settings.overlap_iou_threshold,
+        device=settings.device,
+        rois=params.rois,
+        spatial_relations=params.spatial_relations,
+    )
+
+
+async def dispatch_parse(
+        source: ImageSource,
+        params,
+        parser_factory: ParserFactory,
+        worker_pool: ParseWorkerPool | None = None,
+        scheduler: PipelineScheduler | None = None,
+        job_timeout: float | None = None
+) -> ParsedResult:
+    """
+    接口与基准测试共用的解析分发：有解析进程池时交给解析进程，启用流水线时各阶段在共享的阶段线程池中执行，
+    否则在默认线程池中顺序解析
+
+    Args:
+        source: 图片
+        params: 解析请求参数 (RequestParams)
+        parser_factory: 解析器工厂，解析进程中同样使用
+        worker_pool: 解析进程池
+        scheduler: 分阶段流水线调度，为 None 时不使用流水线
+        job_timeout: 解析进程的单次解析超时时间(秒)
+    """
+    if worker_pool:
+        return await worker_pool.submit(source, params, context_var.get().timer_recorder, timeout=job_timeout)
+    omni = await asyncio.to_thread(parser_factory, source, params)
+    if scheduler is not None:
+        # 不同请求的不同阶段可同时进行
+        return await omni.parse_pipelined(scheduler)
+    return await asyncio.to_thread(omni.parse)
+
+
+@dataclass
+class ParserModels:
+    """离线任务使用的模型集合，不依赖 Web 服务的全局状态"""
+    ocr: OCRPool
+    icon_detector: IconDetector
+    icon_captioner: IconCaptioner
+    overlay_detector: OverlayDetector
+    icon_classifier: IconClassifier | None = None
+    mobile_ocr: OCRPool | None = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    @classmethod
+    def load(cls) -> 'ParserModels':
+        """按配置并行加载各模型"""
+        loaders = {
+            'ocr': create_ocr,
+            'icon_detector': IconDetector,
+            'icon_captioner': IconCaptioner,
+            'overlay_detector': OverlayDetector,
+        }
+        if settings.icon_classifier_config.enable:
+            loaders['icon_classifier'] = IconClassifier
+        with ThreadPoolExecutor(max_workers=len(loaders)) as executor:
+            futures = {name: executor.submit(loader) for name, loader in loaders.items()}
+            return cls(**{name: future.result() for name, future in futures.items()})
+
+    def get_ocr(self, engine: str) -> OCRPool:
+        """mobile 模型按需加载"""
+        if engine != 'mobile':
+            return self.ocr
+        with self._lock:
+            if self.mobile_ocr is None:
+                self.mobile_ocr = create_ocr(mobile=True)
+        return self.mobile_ocr
+
+    def create_parser(self, source: ImageSource, params) -> OmniParser:
+        """
+        Args:
+            source: 图片
+            params: 解析请求参数 (RequestParams)
+        """
+        return build_parser(
+            source,
+            params,
+            ocr=self.get_ocr(params.ocr.engine),
+            icon_detector=self.icon_detector,
+            icon_captioner=self.icon_captioner,
+            icon_classifier=self.icon_classifier,
+            overlay_detector=self.overlay_detector,
+        )
+
+
+@dataclass
+class BatchParser:
+    """
+    多张图片合并解析，结果与逐张调用 OmniParser.parse 一致
+
+    - OCR：在 OCR 实例池中并行识别
+    - 图标检测、弹窗检测：相同输入尺寸的图片拼批，一次前向推理多张
+    - 图标识别：全部图片的图标裁剪图合并后按 batch_size 拼批
+
+    同一批解析器需使用相同的模型与请求参数，不支持区域解析
+    """
+    parsers: list[OmniParser]
+    yolo_batch_size: int = 16
+
+    def _map(self, func, parsers: list[OmniParser]) -> list:
+        """在 OCR 实例池大小的线程池中并行执行，线程中沿用当前请求上下文(耗时记录)"""
+        if not parsers:
+            return []
+        workers = max(1, min(parsers[0].ocr.size, len(parsers)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, func, parser) for parser in parsers]
+            return [future.result() for future in futures]
+
+    def parse(self) -> list[ParsedResult]:
+        if not self.parsers:
+            return []
+        first = self.parsers[0]
+        if any(parser.rois for parser in self.parsers):
+            raise ValueError('batch parse does not support rois')
+        context = context_var.get()
+        results: list[ParsedResult | None] = [None] * len(self.parsers)
+        overlays: list[ElementColumns | None] = [None] * len(self.parsers)
+
+        if first.loading_check_params.enable:
+            with context.timer_recorder.timer('加载中快速检测'):
+                checks = self._map(OmniParser.loading_check, self.parsers)
+            for i, (loading_result, overlay_columns) in enumerate(checks):
+                results[i], overlays[i] = loading_result, overlay_columns
+        pending = [i for i, result in enumerate(results) if result is None]
+        parsers = [self.parsers[i] for i in pending]
+        if not parsers:
+            return results
+        logger.info(f'batch parse {len(parsers)} images, {len(self.parsers) - len(parsers)} loading screens')
+
+        with context.timer_recorder.timer('批量ocr识别'):
+            ocr_columns = self._map(OmniParser.ocr_stage, parsers)
+
+        icon_params = first.icon_detect_params.model_dump(exclude_none=True, exclude={'imgsz'})
+        with context.timer_recorder.timer('批量icon 目标检测'):
+            icon_results = first.icon_detector.predict_batch(
+                [parser.icon_letterbox() for parser in parsers], batch_size=self.yolo_batch_size, **icon_params)
+            icon_columns = [parser.icon_columns_from(result) for parser, result in zip(parsers, icon_results)]
+
+        # 加载中检测已得到弹窗结果的图片不再重复检测
+        overlay_columns = [overlays[i] for i in pending]
+        if first.overlay_detect_params.enable:
+            detect = [k for k, columns in enumerate(overlay_columns) if columns is None]
+            overlay_params = first.overlay_detect_params.model_dump(exclude_none=True, exclude={'enable', 'imgsz'})
+            with context.timer_recorder.timer('批量弹窗/加载中检测'):
+                overlay_results = first.overlay_detector.predict_batch(
+                    [parsers[k].overlay_letterbox() for k in detect], batch_size=self.yolo_batch_size,
+                    **overlay_params)
+            for k, result in zip(detect, overlay_results):
+                overlay_columns[k] = parsers[k].overlay_columns_from(result)
+        overlay_columns = [columns if columns is not None else ElementColumns.empty() for columns in overlay_columns]
+        for parser in parsers:
+            # 目标检测已完成，释放共享的预处理输入
+            parser._letterbox_inputs.clear()
+
+        filtered = [parser.overlap_stage(ocr, icon) for parser, ocr, icon in zip(parsers, ocr_columns, icon_columns)]
+        if first.icon_caption_params.mode == 'eager':
+            with context.timer_recorder.timer('批量icon元素识别'):
+                crops = [ImageUtil.crop_images(parser.source.array, icons.bbox.tolist())
+                         for parser, (icons, _) in zip(parsers, filtered)]
+                captions = first.icon_caption_predict([crop for image_crops in crops for crop in image_crops])
+                # 识别异常时返回空列表，与逐张解析一致不填充描述
+                if len(captions) == sum(len(image_crops) for image_crops in crops):
+                    offsets = np.cumsum([0] + [len(image_crops) for image_crops in crops])
+                    for k, (icons, _) in enumerate(filtered):
+                        icons.content = list(captions[offsets[k]:offsets[k + 1]])
+
+        for k, (i, parser) in enumerate(zip(pending, parsers)):
+            icons, ocr = filtered[k]
+            results[i] = parser.sorted_result(
+                ElementColumns.concat(icons, ocr, overlay_columns[k]), ocr_columns[k], icon_columns[k],
+                overlay_columns[k])
+        return results
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/19 17:05
+from dataclasses import dataclass
+from typing import Iterable
+
+import numpy as np
+
+from . import Element
+
+# 元素来源，type 与 interactivity 由来源决定
+SOURCES = ('box_ocr_content_ocr', 'box_yolo_content_yolo', 'box_yolo_content_ocr', 'box_yolo_content_overlay')
+SOURCE_TYPES = ('text', 'icon', 'icon', 'overlay')
+SOURCE_INTERACTIVITY = (False, True, True, True)
+SOURCE_OCR, SOURCE_YOLO, SOURCE_YOLO_OCR, SOURCE_OVERLAY = range(len(SOURCES))
+
+TYPES = ('text', 'icon', 'overlay')
+TYPE_CODES = np.array([TYPES.index(t) for t in SOURCE_TYPES], dtype=np.int8)
+
+NEIGHBOR_FIELDS = ('left_elem_ids', 'top_elem_ids', 'right_elem_ids', 'bottom_elem_ids')
+COLUMN_FIELDS = ('type', 'bbox', 'interactivity', 'content', 'score', 'source', *NEIGHBOR_FIELDS)
+
+
+@dataclass
+class ElementColumns:
+    """
+    列式(structure-of-arrays)元素集合，解析流程内部使用
+
+    坐标、分数、来源以 NumPy 数组保存，各阶段按列批量计算，
+    仅在接口返回、缓存存储等边界处转换为 Element 对象或列式 JSON。
+    """
+    bbox: np.ndarray  # Nx4 float64，归一化坐标 [x1, y1, x2, y2]
+    score: np.ndarray  # N float64
+    source: np.ndarray  # N int8，SOURCES 下标
+    content: list[str | None]
+    neighbors: dict[str, list[list[int]]] | None = None  # 空间关系，空间排序后才有，值为排序后的下标
+
+    def __post_init__(self):
+        self.bbox = np.asarray(self.bbox, dtype=np.float64).reshape(-1, 4)
+        self.score = np.asarray(self.score, dtype=np.float64).reshape(-1)
+        self.source = np.asarray(self.source, dtype=np.int8).reshape(-1)
+
+    def __len__(self) -> int:
+        return len(self.content)
+
+    @classmethod
+    def empty(cls) -> 'ElementColumns':
+        return cls(bbox=np.empty((0, 4)), score=np.empty(0), source=np.empty(0), content=[])
+
+    @classmethod
+    def create(
+            cls,
+            bbox: np.ndarray,
+            score: Iterable[float],
+            source: int,
+            content: list[str | None] | None = None
+    ) -> 'ElementColumns':
+        """同一来源的一批元素，content 为空时内容均为 None"""
+        bbox = np.asarray(bbox, dtype=np.float64).reshape(-1, 4)
+        return cls(
+            bbox=bbox,
+            score=np.fromiter(score, dtype=np.float64, count=len(bbox)),
+            source=np.full(len(bbox), source, dtype=np.int8),
+            content=list(content) if content is not None else [None] * len(bbox),
+        )
+
+    @classmethod
+    def from_elements(cls, elements: list[Element | dict]) -> 'ElementColumns':
+        """由 Element 对象或其字典(如缓存数据)构建，保留空间关系"""
+        if not elements:
+            return cls.empty()
+        elements = [el.model_dump() if isinstance(el, Element) else el for el in elements]
+        neighbors = None
+        if any(el.get(name) for el in elements for name in NEIGHBOR_FIELDS):
+            neighbors = {name: [list(el.get(name) or []) for el in elements] for name in NEIGHBOR_FIELDS}
+        return cls(
+            bbox=np.array([el['bbox'] for el in elements]),
+            score=np.array([el.get('score', 0) for el in elements]),
+            source=np.array([SOURCES.index(el['source']) for el in elements]),
+            content=[el.get('content') for el in elements],
+            neighbors=neighbors,
+        )
+
+    @classmethod
+    def concat(cls, *columns: 'ElementColumns') -> 'ElementColumns':
+        """按顺序拼接，空间关系下标不再有效，不保留"""
+        columns = [c for c in columns if len(c)]
+        if not columns:
+            return cls.empty()
+        return cls(
+            bbox=np.concatenate([c.bbox for c in columns]),
+            score=np.concatenate([c.score for c in columns]),
+            source=np.concatenate([c.source for c in columns]),
+            content=[content for c in columns for content in c.content],
+        )
+
+    def take(self, indices: np.ndarray | list[int]) -> 'ElementColumns':
+        """按下标(或布尔掩码)选取元素，空间关系下标不再有效，不保留"""
+        indices = np.asarray(indices)
+        if indices.dtype == bool:
+            indices = np.flatnonzero(indices)
+        return ElementColumns(
+            bbox=self.bbox[indices],
+            score=self.score[indices],
+            source=self.source[indices],
+            content=[self.content[i] for i in indices],
+        )
+
+    @property
+    def areas(self) -> np.ndarray:
+        return (self.bbox[:, 2] - self.bbox[:, 0]) * (self.bbox[:, 3] - self.bbox[:, 1])
+
+    @property
+    def types(self) -> list[str]:
+        return [SOURCE_TYPES[s] for s in self.source]
+
+    @property
+    def interactivity(self) -> list[bool]:
+        return [SOURCE_INTERACTIVITY[s] for s in self.source]
+
+    @property
+    def sources(self) -> list[str]:
+        return [SOURCES[s] for s in self.source]
+
+    def to_elements(self) -> list[Element]:
+        """转换为 Element 对象，id 为元素下标；数据已由流程保证类型，跳过校验"""
+        neighbors = self.neighbors or {name: [[] for _ in range(len(self))] for name in NEIGHBOR_FIELDS}
+        return [
+            Element.model_construct(
+                id=i,
+                type=SOURCE_TYPES[source],
+                bbox=bbox,
+                interactivity=SOURCE_INTERACTIVITY[source],
+                content=content,
+                score=score,
+                source=SOURCES[source],
+                **{name: neighbors[name][i] for name in NEIGHBOR_FIELDS},
+            )
+            for i, (bbox, score, source, content) in enumerate(
+                zip(self.bbox.tolist(), self.score.tolist(), self.source.tolist(), self.content)
+            )
+        ]
+
+    def to_columnar(self, fields: Iterable[str] | None = None, decimals: int = 4) -> dict:
+        """
+        紧凑的列式结构：各字段为等长数组，下标即元素 id
+
+        - type、source 为分类编码，取值见 legend；interactivity 为布尔数组
+        - bbox、score 保留 decimals 位小数
+        - 数组字段保持 NumPy 类型，由 orjson(OPT_SERIALIZE_NUMPY) 直接序列化
+
+        Args:
+            fields: 需要的字段，为空时返回全部字段
+            decimals: 坐标与分数保留的小数位数
+        """
+        fields = set(fields or COLUMN_FIELDS)
+        data: dict = {'count': len(self)}
+        legend = {}
+        if 'bbox' in fields:
+            data['bbox'] = np.round(self.bbox, decimals)
+        if 'score' in fields:
+            data['score'] = np.round(self.score, decimals)
+        if 'type' in fields:
+            data['type'] = TYPE_CODES[self.source]
+            legend['type'] = TYPES
+        if 'interactivity' in fields:
+            data['interactivity'] = np.array(SOURCE_INTERACTIVITY)[self.source]
+        if 'source' in fields:
+            data['source'] = self.source
+            legend['source'] = SOURCES
+        if 'content' in fields:
+            data['content'] = self.content
+        for name in NEIGHBOR_FIELDS:
+            if name in fields:
+                data[name] = self.neighbors[name] if self.neighbors else [[] for _ in range(len(self))]
+        if legend:
+            data['legend'] = legend
+        return data
@@ -4,12 +4,15 @@
 # @Email : aidenmo@tencent.com
 # @Time : 2025/12/28 12:15
 
+import heapq
+from typing import Iterable
+
 import numpy as np
 import supervision as sv
 from PIL.Image import Image
-from rtree import index
 
 from util.label_annotator import CustomLabelAnnotator
+from .columns import ElementColumns, NEIGHBOR_FIELDS, SOURCES, SOURCE_YOLO_OCR
 from . import Element
 
 
@@ -69,351 +72,265 @@ class BoxesHandler:
         return ratio > 0.80
 
     @staticmethod
-    def build_rtree_index(elements: list) -> index.Index | None:
-        """
-        构建 R-tree 索引
-        """
-        if not elements:
-            return None
-        idx = index.Index()
-        for i, element in enumerate(elements):
-            bbox = element.bbox
-            idx.insert(i, bbox)
-        return idx
+    def pairwise_intersection(boxes1: np.ndarray, boxes2: np.ndarray) -> np.ndarray:
+        """两组边界框 [x1, y1, x2, y2] 两两之间的交集面积，形状为 len(boxes1) x len(boxes2)"""
+        w = np.minimum(boxes1[:, None, 2], boxes2[None, :, 2]) - np.maximum(boxes1[:, None, 0], boxes2[None, :, 0])
+        h = np.minimum(boxes1[:, None, 3], boxes2[None, :, 3]) - np.maximum(boxes1[:, None, 1], boxes2[None, :, 1])
+        return np.clip(w, 0, None) * np.clip(h, 0, None)
 
     @classmethod
     def remove_overlap(
             cls,
-            icon_elements: list[Element],
-            ocr_elements: list[Element],
-            iou_threshold: float
-    ) -> tuple[list[Element], list[Element]]:
+            icon_columns: ElementColumns,
+            ocr_columns: ElementColumns,
+            iou_threshold: float,
+            chunk_size: int = 512
+    ) -> tuple[ElementColumns, ElementColumns]:
         """
-        使用 R-tree 空间索引优化重叠检测，复杂度从 O(N²) 降到 O(N log N)
+        按列批量计算重叠关系并过滤元素
+
+        1. 图标之间：IoU(交并比、两者覆盖率三者的最大值)超过阈值时保留面积较小的图标
+        2. 图标与 OCR：按 OCR 原始顺序检查，80% 以上落在图标内的文本拼接为图标内容并移除该 OCR 元素；
+           遇到包含该图标(图标 80% 以上落在文本内)的 OCR 元素时丢弃图标，之后的文本不再检查
 
-        icon_elements format: [{'type': 'icon', 'bbox':[x,y], 'interactivity':True, 'content':None }, ...]
-        ocr_elements format: [{'type': 'text', 'bbox':[x,y], 'interactivity':False, 'content':str }, ...]
+        Args:
+            icon_columns: 图标元素
+            ocr_columns: OCR 元素
+            iou_threshold: 图标重叠 IoU 阈值
+            chunk_size: 图标两两计算时的分块行数，限制中间矩阵的内存
+
+        Returns:
+            (纯图标元素, 保留的 OCR 元素 + 以 OCR 文本为内容的图标元素)
         """
-        # 构建 R-tree 索引 - 为 icon boxes 建立索引
-        icon_bbox_idx = cls.build_rtree_index(icon_elements)
-
-        # 为 OCR boxes 也建立 R-tree 索引
-        ocr_bbox_idx = cls.build_rtree_index(ocr_elements)
-
-        # 使用 R-tree 快速查找重叠候选
-        # 直接原地在 icon_elements, ocr_elements 中删除重叠的元素
-        # 面积计算使用缓存，避免重复计算
-        filtered_icon_elements = []
-        filtered_ocr_elements = [*ocr_elements]
-        for i, icon_element in enumerate(icon_elements):
-            icon_bbox1 = icon_element.bbox
-            is_valid_bbox = True
-
-            # 只检查与 box1 可能重叠的 icon boxes 候选（空间查询）
-            candidates = list(icon_bbox_idx.intersection(icon_bbox1))
-            for j in candidates:
-                if i == j:
-                    continue
-                icon_bbox2 = icon_elements[j].bbox
-                # keep the smaller box
-                if (cls.calculate_iou(icon_bbox1, icon_bbox2) > iou_threshold
-                        and cls.box_area(icon_bbox1) > cls.box_area(icon_bbox2)):
-                    is_valid_bbox = False
-                    break
+        if len(icon_columns) == 0:
+            return icon_columns, ocr_columns
+
+        icon_areas = icon_columns.areas
+        valid = np.ones(len(icon_columns), dtype=bool)
+        for start in range(0, len(icon_columns), chunk_size):
+            chunk = slice(start, start + chunk_size)
+            intersection = cls.pairwise_intersection(icon_columns.bbox[chunk], icon_columns.bbox)
+            area1, area2 = icon_areas[chunk, None], icon_areas[None, :]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                # 加 1e-6 防止除零，面积为 0 时覆盖率记为 0
+                iou = np.maximum(
+                    intersection / (area1 + area2 - intersection + 1e-6),
+                    np.where((area1 > 0) & (area2 > 0),
+                             np.maximum(intersection / area1, intersection / area2), 0)
+                )
+            # keep the smaller box
+            valid[chunk] = ~((iou > iou_threshold) & (area1 > area2)).any(axis=1)
+
+        valid_icons = np.flatnonzero(valid)
+        if len(ocr_columns) == 0:
+            return icon_columns.take(valid_icons), ocr_columns
+
+        intersection = cls.pairwise_intersection(icon_columns.bbox[valid_icons], ocr_columns.bbox)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ocr_inside = intersection / ocr_columns.areas[None, :] > 0.80
+            icon_inside = intersection / icon_areas[valid_icons, None] > 0.80
+        # 第一个包含图标的 OCR 元素之前、落在图标内的文本作为图标内容
+        stop = icon_inside & ~ocr_inside
+        dropped = stop.any(axis=1)
+        first_stop = np.where(dropped, stop.argmax(axis=1), stop.shape[1])
+        labeled = ocr_inside & (np.arange(stop.shape[1])[None, :] < first_stop[:, None])
+
+        with_text = ~dropped & labeled.any(axis=1)
+        labels = [
+            ' '.join(ocr_columns.content[j] for j in np.flatnonzero(row)).strip()
+            for row in labeled[with_text]
+        ]
+        text_icons = valid_icons[with_text]
+        filtered_ocr_columns = ElementColumns.concat(
+            ocr_columns.take(~labeled.any(axis=0)),
+            ElementColumns.create(icon_columns.bbox[text_icons], icon_columns.score[text_icons],
+                                  SOURCE_YOLO_OCR, labels)
+        )
+        filtered_icon_columns = icon_columns.take(valid_icons[~dropped & ~with_text])
+        return filtered_icon_columns, filtered_ocr_columns
+
+    @staticmethod
+    def is_same_row(y1a, y2a, cya, ha, y1b, y2b, cyb, hb) -> np.ndarray:
+        """
+        判断两组元素是否应该在同一行，参数为等长数组
 
-            if is_valid_bbox:
-                if ocr_elements:
-                    element_added = False
-                    ocr_labels = ''
-
-                    # 使用 R-tree 快速查找可能重叠的 OCR boxes
-                    ocr_candidates = list(ocr_bbox_idx.intersection(icon_bbox1))
-
-                    for j in ocr_candidates:
-                        if not element_added:
-                            ocr_element = ocr_elements[j]
-                            ocr_bbox = ocr_element.bbox
-
-                            if cls.is_inside(ocr_bbox, icon_bbox1):  # ocr inside icon
-                                try:
-                                    # TODO 为什么不是移除 icon box(拼接在一起是否影响点击小元素)，什么情况下异常？
-                                    ocr_labels += ocr_element.content + ' '
-                                    # TODO remove 复杂度是 O(N), 可以优化
-                                    filtered_ocr_elements.remove(ocr_element)
-                                except:
-                                    continue
-                            elif cls.is_inside(icon_bbox1, ocr_bbox):  # icon inside ocr
-                                element_added = True
-                                break
-
-                    if not element_added:
-                        if ocr_labels:
-                            filtered_ocr_elements.append(
-                                Element(
-                                    type='icon',
-                                    bbox=icon_element.bbox,
-                                    interactivity=True,
-                                    score=icon_element.score,
-                                    content=ocr_labels.strip(),
-                                    source='box_yolo_content_ocr')
-                            )
-                        else:
-                            filtered_icon_elements.append(
-                                Element(
-                                    type='icon',
-                                    bbox=icon_element.bbox,
-                                    interactivity=True,
-                                    score=icon_element.score,
-                                    content=None,
-                                    source='box_yolo_content_yolo'
-                                )
-                            )
-                else:
-                    filtered_icon_elements.append(icon_element)
-
-        return filtered_icon_elements, filtered_ocr_elements
+        1. 垂直重叠比例(重叠高度 / 较小高度)超过 20%；
+        2. 或垂直距离小于平均高度的 30%，且中心点距离小于平均高度的 50%
+        """
+        overlap = np.minimum(y2a, y2b) - np.maximum(y1a, y1b)
+        min_height = np.minimum(ha, hb)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            overlap_ratio = np.where((overlap > 0) & (min_height > 0), overlap / min_height, 0)
+        vertical_distance = np.where(overlap > 0, 0, -overlap)
+        avg_height = (ha + hb) / 2
+        return (overlap_ratio > 0.2) | (
+                (vertical_distance < avg_height * 0.3) & (np.abs(cya - cyb) < avg_height * 0.5))
 
     @classmethod
-    def sort_elements_spatially(cls, elements: list[Element]):
+    def same_row_neighbors(cls, y1: np.ndarray, y2: np.ndarray) -> list[set[int]]:
         """
-        扫描线算法进行元素排序，并为每个元素添加空间关系信息
+        计算按 y1 升序排列的元素中，每个元素可同行的其他元素
+
+        同行要求垂直重叠或垂直距离小于平均高度的 30%，因此只需检查 y1 落在窗口内的后续元素，
+        不构造 N x N 矩阵
+        """
+        n = len(y1)
+        cy, heights = (y1 + y2) / 2, y2 - y1
+        max_height = max(float(heights.max()), 0)
+        end = np.searchsorted(y1, y2 + 0.15 * (np.maximum(heights, 0) + max_height), side='left')
+        counts = np.maximum(end - np.arange(1, n + 1), 0)
+        ii = np.repeat(np.arange(n), counts)
+        jj = ii + 1 + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        same_row = cls.is_same_row(y1[ii], y2[ii], cy[ii], heights[ii], y1[jj], y2[jj], cy[jj], heights[jj])
+        neighbors = [set() for _ in range(n)]
+        for i, j in zip(ii[same_row].tolist(), jj[same_row].tolist()):
+            neighbors[i].add(j)
+            neighbors[j].add(i)
+        return neighbors
+
+    @classmethod
+    def sort_elements_spatially(cls, columns: ElementColumns, relations: bool = True) -> ElementColumns:
+        """
+        扫描线算法进行元素排序，并计算每个元素的空间关系
 
         Args:
-            elements: 包含bbox信息的元素列表，每个元素应包含'bbox'字段
-                     bbox格式为[x1, y1, x2, y2]（归一化坐标）
+            columns: 元素，bbox 格式为[x1, y1, x2, y2]（归一化坐标）
+            relations: 是否计算空间关系，关闭时仅按阅读顺序排序
 
         Returns:
-            排序后的元素列表，每个元素新增以下字段：
+            排序后的元素，relations 开启时 neighbors 包含以下字段，值为排序后的下标(即元素 id)：
             - left_elem_ids: 同行左侧元素的id列表
             - top_elem_ids: 上行重叠元素的id列表
             - right_elem_ids: 同行右侧元素的id列表
             - bottom_elem_ids: 下行重叠元素的id列表
         """
+        if len(columns) == 0:
+            return columns
 
-        def has_vertical_overlap(elem1, elem2):
-            """检查两个元素是否有垂直重叠"""
-            return not (elem1['y2'] <= elem2['y1'] or elem2['y2'] <= elem1['y1'])
-
-        def calculate_overlap_ratio(elem1, elem2):
-            """计算两个元素的垂直重叠比例"""
-            if not has_vertical_overlap(elem1, elem2):
-                return 0.0
-
-            overlap_start = max(elem1['y1'], elem2['y1'])
-            overlap_end = min(elem1['y2'], elem2['y2'])
-            overlap_height = overlap_end - overlap_start
-
-            min_height = min(elem1['height'], elem2['height'])
-            return overlap_height / min_height if min_height > 0 else 0.0
-
-        def calculate_horizontal_overlap_ratio(elem1, elem2):
-            """计算两个元素的水平重叠比例"""
-            # 检查是否有水平重叠
-            if elem1['x2'] <= elem2['x1'] or elem2['x2'] <= elem1['x1']:
-                return 0.0
-
-            overlap_start = max(elem1['x1'], elem2['x1'])
-            overlap_end = min(elem1['x2'], elem2['x2'])
-            overlap_width = overlap_end - overlap_start
-
-            min_width = min(elem1['width'], elem2['width'])
-            return overlap_width / min_width if min_width > 0 else 0.0
-
-        def calculate_vertical_distance(elem1, elem2):
-            """计算两个元素的垂直距离"""
-            if has_vertical_overlap(elem1, elem2):
-                return 0.0
-
-            if elem1['y2'] <= elem2['y1']:
-                return elem2['y1'] - elem1['y2']
-            else:
-                return elem1['y1'] - elem2['y2']
-
-        def should_be_same_row(elem1, elem2):
-            """判断两个元素是否应该在同一行"""
-            # 1. 如果有显著的垂直重叠（>40%），则认为在同一行
-            overlap_ratio = calculate_overlap_ratio(elem1, elem2)
-            if overlap_ratio > 0.4:
-                return True
-
-            # 2. 如果垂直距离很小，且高度相近，则可能在同一行
-            vertical_distance = calculate_vertical_distance(elem1, elem2)
-            avg_height = (elem1['height'] + elem2['height']) / 2
-
-            # 垂直距离小于平均高度的30%，且有一定重叠或距离很近
-            if vertical_distance < avg_height * 0.3:
-                # 进一步检查中心点距离
-                center_distance = abs(elem1['y'] - elem2['y'])
-                if center_distance < avg_height * 0.5:
-                    return True
-
-            # 3. 对于归一化坐标，使用绝对阈值作为兜底
-            if overlap_ratio > 0.2 and vertical_distance < 0.015:
-                return True
-
-            return False
-
-        # 开始排序
-        if not elements:
-            return elements
-
-        # 计算每个元素的详细信息
-        element_info = []
-        for i, element in enumerate(elements):
-            x1, y1, x2, y2 = element.bbox
-            center_x = (x1 + x2) / 2
-            center_y = (y1 + y2) / 2
-            height = y2 - y1
-            width = x2 - x1
-            element_info.append({
-                'index': i,
-                'element': element,
-                'x': center_x,
-                'y': center_y,
-                'y1': y1,
-                'y2': y2,
-                'x1': x1,
-                'x2': x2,
-                'height': height,
-                'width': width
-            })
+        order, row_starts = cls.group_rows(columns.bbox)
+        sorted_columns = columns.take(order)
+        if relations:
+            sorted_columns.neighbors = cls.spatial_relations(sorted_columns.bbox, row_starts)
+        return sorted_columns
 
+    @classmethod
+    def group_rows(cls, bbox: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        行分组与阅读顺序排序
+
+        从每个未分组元素开始新行，按顺序扫描可同行的后续元素，
+        候选元素需要与行内所有元素都可同行，顶部远离当前行底部时停止扫描
+
+        Returns:
+            (阅读顺序的元素下标, 各行在排序结果中的起始位置，末尾为元素总数)
+        """
         # 按y坐标排序（先按顶部边界，再按中心点）
-        element_info.sort(key=lambda x: (x['y1'], x['y']))
+        x1, y1, x2, y2 = bbox.T
+        order = np.lexsort(((y1 + y2) / 2, y1))
+        x1, y1, x2, y2 = x1[order], y1[order], x2[order], y2[order]
+        neighbors = cls.same_row_neighbors(y1, y2)
 
-        # 使用改进的扫描线算法进行行分组
+        y1_list, y2_list = y1.tolist(), y2.tolist()
+        processed = [False] * len(order)
         rows = []
-        processed = [False] * len(element_info)
-
-        for i, current_elem in enumerate(element_info):
+        for i in range(len(order)):
             if processed[i]:
                 continue
-
-            # 开始新行
-            current_row = [current_elem]
+            row, row_bottom = [i], y2_list[i]
             processed[i] = True
-
-            # 使用扫描线思想：从当前元素开始，向下扫描寻找同行元素
-            j = i + 1
-            while j < len(element_info):
+            candidates = [j for j in neighbors[i] if j > i]
+            heapq.heapify(candidates)
+            seen = set(candidates)
+            while candidates:
+                j = heapq.heappop(candidates)
                 if processed[j]:
-                    j += 1
                     continue
-
-                candidate = element_info[j]
-
-                # 如果候选元素的顶部已经远离当前行的底部，停止扫描
-                current_row_bottom = max(elem['y2'] for elem in current_row)
-                if candidate['y1'] > current_row_bottom + 0.02:  # 归一化坐标下的合理阈值
+                if y1_list[j] > row_bottom + 0.02:  # 归一化坐标下的合理阈值
                     break
+                if all(k in neighbors[j] for k in row):
+                    row.append(j)
+                    processed[j] = True
+                    row_bottom = max(row_bottom, y2_list[j])
+                    for k in neighbors[j]:
+                        if k > j and k not in seen:
+                            heapq.heappush(candidates, k)
+                            seen.add(k)
+            rows.append(row)
+
+        # 每行的起始元素 y1 最小且行按起始元素顺序生成，行之间已按顶部排序；行内严格按x坐标排序
+        x1_list, cx_list = x1.tolist(), ((x1 + x2) / 2).tolist()
+        rows = [sorted(row, key=lambda k: (x1_list[k], cx_list[k])) for row in rows]
+        row_starts = np.cumsum([0] + [len(row) for row in rows])
+        return order[[k for row in rows for k in row]], row_starts
 
-                # 检查候选元素是否与当前行中的任何元素兼容
-                can_join = any(should_be_same_row(row_elem, candidate) for row_elem in current_row)
-
-                if can_join:
-                    # 进一步验证：确保加入后不会破坏行的一致性
-                    temp_row = current_row + [candidate]
-                    row_is_consistent = True
-
-                    # 检查新行中所有元素对是否都兼容
-                    for k in range(len(temp_row)):
-                        for l in range(k + 1, len(temp_row)):
-                            if not should_be_same_row(temp_row[k], temp_row[l]):
-                                # 如果不兼容，但有足够的重叠，仍然允许
-                                overlap = calculate_overlap_ratio(temp_row[k], temp_row[l])
-                                if overlap < 0.3:
-                                    row_is_consistent = False
-                                    break
-                        if not row_is_consistent:
-                            break
-
-                    if row_is_consistent:
-                        current_row.append(candidate)
-                        processed[j] = True
-
-                j += 1
-
-            rows.append(current_row)
-
-        # 按行的最顶部元素排序
-        rows.sort(key=lambda row_elements: min(elem['y1'] for elem in row_elements))
-
-        # 行内严格按x坐标排序（扫描线算法的本意）
-        sorted_elements = []
-        element_to_row_map = {}  # 记录每个元素属于哪一行
-
-        for row_idx, row in enumerate(rows):
-            row.sort(key=lambda elem: (elem['x1'], elem['x']))
-            for elem_info in row:
-                element_to_row_map[elem_info['index']] = row_idx
-            sorted_elements.extend([info['element'] for info in row])
-
-        # 为每个元素添加空间关系信息
-        for i, element in enumerate(sorted_elements):
-            # 找到当前元素在原始列表中的索引
-            current_elem_info = None
-            current_row_idx = None
-            for elem_info in element_info:
-                if elem_info['element'] is element:
-                    current_elem_info = elem_info
-                    current_row_idx = element_to_row_map[elem_info['index']]
-                    break
-
-            if current_elem_info is None:
-                continue
+    @staticmethod
+    def spatial_relations(
+            bbox: np.ndarray,
+            row_starts: np.ndarray,
+            ids: Iterable[int] | None = None
+    ) -> dict[str, list[list[int]]]:
+        """
+        计算已按阅读顺序排序元素的空间关系
 
-            # 计算同行的左右元素
-            current_row = rows[current_row_idx]
-            for other_elem_info in current_row:
-                if other_elem_info['index'] == current_elem_info['index']:
-                    continue
+        Args:
+            bbox: 阅读顺序排列的元素坐标
+            row_starts: 各行起始位置，见 group_rows
+            ids: 只计算这些元素(排序后的下标)的空间关系，为空时计算全部元素
 
-                # 找到其他元素在sorted_elements中的索引
-                other_elem_index = sorted_elements.index(other_elem_info['element'])
-
-                # 左侧元素：x坐标更小, 越接近的越靠前
-                if other_elem_info['x1'] < current_elem_info['x1']:
-                    element.left_elem_ids.append(other_elem_index)
-                # 右侧元素：x坐标更大
-                elif other_elem_info['x1'] > current_elem_info['x1']:
-                    element.right_elem_ids.append(other_elem_index)
-
-            # 计算上下行的重叠元素（只考虑紧邻的相邻行）
-            # 上一行（紧邻）
-            if current_row_idx > 0:
-                prev_row = rows[current_row_idx - 1]
-                for other_elem_info in prev_row:
-                    # 计算水平重叠率
-                    h_overlap = calculate_horizontal_overlap_ratio(current_elem_info, other_elem_info)
-
-                    if h_overlap >= 0.1:  # 重叠率>=10%
-                        other_elem_index = sorted_elements.index(other_elem_info['element'])
-                        element.top_elem_ids.append(other_elem_index)
-
-            # 下一行（紧邻）
-            if current_row_idx < len(rows) - 1:
-                next_row = rows[current_row_idx + 1]
-                for other_elem_info in next_row:
-                    # 计算水平重叠率
-                    h_overlap = calculate_horizontal_overlap_ratio(current_elem_info, other_elem_info)
-
-                    if h_overlap >= 0.1:  # 重叠率>=10%
-                        other_elem_index = sorted_elements.index(other_elem_info['element'])
-                        element.bottom_elem_ids.append(other_elem_index)
-
-            # 对ID列表进行排序，保持一致性
-            element.left_elem_ids.sort(reverse=True)
-            element.top_elem_ids.sort(reverse=True)
-            element.right_elem_ids.sort()
-            element.bottom_elem_ids.sort()
-
-        return sorted_elements
+        Returns:
+            各空间关系字段的 id 列表，未计算的元素为空列表
+        """
+        n = len(bbox)
+        relations = {name: [[] for _ in range(n)] for name in NEIGHBOR_FIELDS}
+        wanted = None if ids is None else np.zeros(n, dtype=bool)
+        if wanted is not None:
+            wanted[list(ids)] = True
+        x1, x2 = bbox[:, 0], bbox[:, 2]
+        widths = x2 - x1
+        row_ranges = list(zip(row_starts[:-1].tolist(), row_starts[1:].tolist()))
+
+        # 行内元素已按 x1 排序，左右元素为连续区间
+        for row_idx, (start, end) in enumerate(row_ranges):
+            # 当前行与上一行都不包含需要计算的元素时跳过
+            prev_start = row_ranges[row_idx - 1][0] if row_idx > 0 else start
+            if wanted is not None and not wanted[prev_start:end].any():
+                continue
+            row_x1 = x1[start:end]
+            lows = np.searchsorted(row_x1, row_x1, side='left').tolist()
+            highs = np.searchsorted(row_x1, row_x1, side='right').tolist()
+            for p, low, high in zip(range(start, end), lows, highs):
+                if wanted is None or wanted[p]:
+                    relations['left_elem_ids'][p] = list(range(start + low - 1, start - 1, -1))
+                    relations['right_elem_ids'][p] = list(range(start + high, end))
+
+            # 与上一行水平重叠率 >= 10% 的元素互为上下关系
+            if row_idx == 0:
+                continue
+            overlap = (np.minimum(x2[prev_start:start, None], x2[None, start:end])
+                       - np.maximum(x1[prev_start:start, None], x1[None, start:end]))
+            min_width = np.minimum(widths[prev_start:start, None], widths[None, start:end])
+            with np.errstate(divide='ignore', invalid='ignore'):
+                adjacent = (overlap > 0) & (min_width > 0) & (overlap / min_width >= 0.1)
+            for a, b in zip(*(indices.tolist() for indices in np.nonzero(adjacent))):
+                top, bottom = prev_start + a, start + b
+                if wanted is None or wanted[top]:
+                    relations['bottom_elem_ids'][top].append(bottom)
+                if wanted is None or wanted[bottom]:
+                    relations['top_elem_ids'][bottom].append(top)
+
+        # 对ID列表进行排序，保持一致性
+        for ids in relations['top_elem_ids']:
+            ids.sort(reverse=True)
+        return relations
 
     @classmethod
-    def annotate(cls, image: Image, elements: list[Element], visualize=False) -> Image:
+    def annotate(cls, image: Image, elements: ElementColumns | list[Element], visualize=False) -> Image:
         image = image.copy()  # 避免修改原图
         if not elements:
             return image
+        if not isinstance(elements, ElementColumns):
+            elements = ElementColumns.from_elements(elements)
         w, h = image.size
         class_map = {
             'box_yolo_content_yolo': 'i',
@@ -421,10 +338,9 @@ class BoxesHandler:
             'box_yolo_content_ocr': 'io',
             'box_yolo_content_overlay': 'ov',
         }
-        bboxes, classes, scores = zip(*[(el.bbox, class_map[el.source], el.score) for el in elements])
-        xyxy = np.asarray(bboxes) * [w, h, w, h]
-        class_id = np.asarray(classes)
-        scores = np.asarray(scores)
+        xyxy = elements.bbox * [w, h, w, h]
+        class_id = np.asarray([class_map[source] for source in SOURCES])[elements.source]
+        scores = elements.score
 
         # noinspection PyTypeChecker
         detections = sv.Detections(xyxy=xyxy, class_id=class_id, confidence=scores)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/19 18:30
+import threading
+import uuid
+from dataclasses import dataclass, field
+
+import numpy as np
+from PIL import Image
+
+from config import settings
+from core.columns import ElementColumns, SOURCE_YOLO
+from core.parse import OmniParser
+from model.icon_captioner import IconCaptioner
+from model.icon_classifier import IconClassifier
+from schemas.omni import IconCaptionParams
+from util.image import ImageUtil, ImageSource
+from util.ttl_cache import TTLCache
+
+
+@dataclass
+class CaptionSession:
+    """一次 lazy 解析中待识别的图标，只保留裁剪图，不持有整张截图"""
+    crops: dict[int, Image.Image]  # 元素 id -> 图标裁剪图
+    params: IconCaptionParams  # 解析请求的图标识别参数
+    captions: dict[int, str] = field(default_factory=dict)  # 已识别的结果
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+class LazyCaptionHandler:
+    """
+    图标按需识别
+
+    lazy 模式解析时只裁剪图标并登记会话，客户端通过 parse_id + 元素 id 请求识别，
+    同一会话内已识别的图标直接返回缓存结果
+    """
+    sessions: TTLCache[str, CaptionSession] = TTLCache(
+        maxsize=settings.caption_config.lazy_max_sessions,
+        ttl=settings.caption_config.lazy_ttl
+    )
+
+    @classmethod
+    def create_session(cls, source: ImageSource, columns: ElementColumns, params: IconCaptionParams) -> str | None:
+        """
+        登记已排序元素中待识别的图标
+
+        Args:
+            source: 解析的图片
+            columns: 空间排序后的元素，下标即元素 id
+            params: 图标识别参数，按需识别时使用相同的识别引擎
+
+        Returns:
+            parse_id，没有待识别图标时为 None
+        """
+        ids = np.flatnonzero(columns.source == SOURCE_YOLO)
+        if not len(ids):
+            return None
+        crops = ImageUtil.crop_images(source.array, columns.bbox[ids].tolist())
+        parse_id = uuid.uuid4().hex
+        cls.sessions.set(parse_id, CaptionSession(crops=dict(zip(ids.tolist(), crops)), params=params))
+        return parse_id
+
+    @classmethod
+    def caption(
+            cls,
+            parse_id: str,
+            ids: list[int],
+            captioner: IconCaptioner,
+            classifier: IconClassifier | None = None,
+            batch_size: int | None = None
+    ) -> dict[int, str] | None:
+        """
+        识别指定图标，只对未识别过的图标调用模型
+
+        Returns:
+            元素 id -> 图标描述，会话不存在或已过期时为 None
+        """
+        session = cls.sessions.get(parse_id)
+        if session is None:
+            return None
+        with session.lock:
+            pending = [i for i in dict.fromkeys(ids) if i in session.crops and i not in session.captions]
+            if pending:
+                params = session.params if batch_size is None else session.params.model_copy(
+                    update={'batch_size': batch_size})
+                captions = OmniParser.recognize_icons(
+                    [session.crops[i] for i in pending], captioner, classifier, params)
+                session.captions.update(zip(pending, captions))
+            return {i: session.captions[i] for i in dict.fromkeys(ids) if i in session.captions}
@@ -4,39 +4,58 @@
 # @Email : aidenmo@tencent.com
 # @Time : 2025/12/25 19:46
 import gc
+import math
 import threading
-from dataclasses import dataclass
+from dataclasses import dataclass, field, replace
+from functools import cached_property
 from typing import Literal
 
 import numpy as np
 import torch
 from PIL import Image
-from paddleocr import PaddleOCR
-from paddlex.inference.pipelines.ocr.result import OCRResult
+from loguru import logger
 
+from config import settings
+from core.columns import ElementColumns, SOURCE_OCR, SOURCE_YOLO, SOURCE_OVERLAY
 from core.handler import BoxesHandler
+from core.pipeline import Node, PipelineScheduler
+from core.tiles import TileHandler
 from model.icon_captioner import IconCaptioner
+from model.icon_classifier import IconClassifier
 from model.icon_detector import IconDetector
+from model.letterbox import LetterboxInput
+from model.ocr_pool import OCRPool
 from model.overlay_detector import OverlayDetector, OVERLAY_CLASS_NAMES
-from schemas.omni import OCRParams, IconDetectParams, IconCaptionParams, OverlayDetectParams
+from schemas.omni import OCRParams, IconDetectParams, IconCaptionParams, OverlayDetectParams, LoadingCheckParams
 from util.context import context_var
-from util.image import ImageUtil
+from util.image import ImageUtil, ImageSource
 from . import Element
 
 
 @dataclass
 class ParsedResult:
-    elements: list[Element]
-    ocr_elements: list[Element]
-    icon_elements: list[Element]
-    overlay_elements: list[Element]
+    columns: ElementColumns  # 合并、空间排序后的元素，下标即元素 id
+    ocr_columns: ElementColumns
+    icon_columns: ElementColumns
+    overlay_columns: ElementColumns
+    is_loading: bool = False  # 是否为加载中/空白页面，为 True 时未执行完整解析
+
+    @classmethod
+    def loading(cls, overlay_columns: ElementColumns | None = None) -> 'ParsedResult':
+        overlay_columns = overlay_columns if overlay_columns is not None else ElementColumns.empty()
+        return cls(columns=overlay_columns, ocr_columns=ElementColumns.empty(), icon_columns=ElementColumns.empty(),
+                   overlay_columns=overlay_columns, is_loading=True)
+
+    @cached_property
+    def elements(self) -> list[Element]:
+        """接口返回、缓存存储等边界处才构建 Element 对象"""
+        return self.columns.to_elements()
 
-threading_lock = threading.Lock()
 
 @dataclass
 class OmniParser:
-    image: Image.Image  # 要解析的图片
-    ocr: PaddleOCR
+    source: ImageSource  # 要解析的图片，各阶段共享同一份解码后的像素
+    ocr: OCRPool
     ocr_params: OCRParams
     icon_detector: IconDetector
     icon_detect_params: IconDetectParams
@@ -44,130 +63,393 @@ class OmniParser:
     icon_caption_params: IconCaptionParams
     overlay_detector: OverlayDetector
     overlay_detect_params: OverlayDetectParams
+    loading_check_params: LoadingCheckParams
     overlap_iou_threshold: float
     device: Literal['cuda', 'cpu']
+    icon_classifier: IconClassifier | None = None  # 未加载时图标识别均使用 icon_captioner
+    rois: list[tuple[float, float, float, float]] | None = None  # 归一化感兴趣区域，仅解析这些区域
+    spatial_relations: bool = True  # 是否计算元素空间关系，关闭时仅按阅读顺序排序
+    _letterbox_inputs: dict[tuple[int, int], LetterboxInput] = field(default_factory=dict, init=False, repr=False)
+    # 流水线模式下图标检测与弹窗检测在不同线程中并行预处理
+    _letterbox_lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def ocr_predict(self) -> dict:
+        # 区域解析时为整图的切片视图，OCR 需要连续内存，整图时不拷贝
+        img_ndarray = np.ascontiguousarray(self.source.array)
+        params = self.ocr_params.model_dump(exclude_none=True, exclude={'engine', 'tile'})
+        tiles = self.ocr_tiles()
+        if len(tiles) <= 1:
+            return self.ocr.predict(img_ndarray, **params)
+
+        # 长截图分块后在 OCR 实例池中并行识别，再合并为整图结果
+        h, w = img_ndarray.shape[:2]
+        overlap = settings.ocr_tile_config.overlap
+        logger.info(f'image size: {w}x{h}, split into {len(tiles)} tiles for OCR')
+        tile_images = [np.ascontiguousarray(img_ndarray[y1:y2, x1:x2]) for x1, y1, x2, y2 in tiles]
+        tile_results = [
+            (result.get('rec_boxes'), result.get('rec_texts'), result.get('rec_scores'))
+            for result in self.ocr.predict_many(tile_images, **params)
+        ]
+        rec_boxes, rec_texts, rec_scores = TileHandler.merge_ocr_results(tiles, tile_results, w, h, overlap)
+        return {'rec_boxes': rec_boxes, 'rec_texts': rec_texts, 'rec_scores': rec_scores}
+
+    def ocr_tiles(self) -> list[tuple[int, int, int, int]]:
+        """长边缩小倍数超过阈值时切分为重叠分块，避免整图缩小后丢失小字"""
+        w, h = self.source.size
+        limit_side_len = self.ocr_params.text_det_limit_side_len or settings.ocr_config.text_det_limit_side_len
+        tile_config = settings.ocr_tile_config
+        if (not self.ocr_params.tile or self.ocr_params.text_det_limit_type == 'min'
+                or max(w, h) / limit_side_len <= tile_config.max_downscale):
+            return [(0, 0, w, h)]
+        return TileHandler.split_tiles(w, h, int(limit_side_len * tile_config.tile_scale), tile_config.overlap)
 
-    def ocr_predict(self) -> OCRResult:
-        img_ndarray = np.asarray(self.image)
-        params = self.ocr_params.model_dump(exclude_none=True)
-        with threading_lock:
-            return self.ocr.predict(img_ndarray, **params)[0]
+    def letterbox(self, imgsz: int, stride: int) -> LetterboxInput:
+        """YOLO 预处理输入，按输入尺寸缓存，图标检测与弹窗检测尺寸相同时只预处理一次"""
+        key = (imgsz, stride)
+        with self._letterbox_lock:
+            if key not in self._letterbox_inputs:
+                self._letterbox_inputs[key] = LetterboxInput.from_array(self.source.array, imgsz, stride)
+            return self._letterbox_inputs[key]
+
+    def icon_letterbox(self) -> LetterboxInput:
+        return self.letterbox(self.icon_detect_params.imgsz or self.icon_detector.imgsz, self.icon_detector.stride)
 
     def icon_detect_predict(self) -> tuple[torch.Tensor, torch.Tensor]:
-        params = self.icon_detect_params.model_dump(exclude_none=True)
-        return self.icon_detector.predict(self.image, **params)
+        params = self.icon_detect_params.model_dump(exclude_none=True, exclude={'imgsz'})
+        return self.icon_detector.predict(self.icon_letterbox(), **params)
+
+    def icon_columns_from(self, icon_result: tuple[torch.Tensor, torch.Tensor]) -> ElementColumns:
+        icon_boxes, icon_scores = icon_result
+        w, h = self.source.size
+        return ElementColumns.create(
+            bbox=icon_boxes.numpy() / [w, h, w, h],
+            score=icon_scores.tolist(),
+            source=SOURCE_YOLO,
+        )
 
     def icon_caption_predict(self, images: list[Image.Image]) -> list[str]:
-        params = self.icon_caption_params.model_dump(exclude_none=True)
-        return self.icon_captioner.predict(images, **params)
+        return self.recognize_icons(images, self.icon_captioner, self.icon_classifier, self.icon_caption_params)
+
+    @staticmethod
+    def recognize_icons(
+            images: list[Image.Image],
+            icon_captioner: IconCaptioner,
+            icon_classifier: IconClassifier | None,
+            params: IconCaptionParams
+    ) -> list[str]:
+        """
+        按识别引擎识别图标
+
+        - florence: 全部图标使用 Florence-2 生成描述
+        - clip: 全部图标使用嵌入分类
+        - hybrid: 先批量分类，置信度低于阈值的图标再使用 Florence-2
+        """
+        engine = params.engine
+        if engine != 'florence' and icon_classifier is None:
+            logger.warning('icon classifier is not loaded, fallback to florence')
+            engine = 'florence'
+        if engine == 'florence':
+            return icon_captioner.predict(images, batch_size=params.batch_size)
+
+        labels, scores = icon_classifier.predict(images, batch_size=settings.icon_classifier_config.batch_size)
+        if engine == 'clip':
+            return labels
+        uncertain = [i for i, score in enumerate(scores) if score < params.threshold]
+        if uncertain:
+            captions = icon_captioner.predict([images[i] for i in uncertain], batch_size=params.batch_size)
+            # 识别异常时 predict 返回空列表，保留分类结果
+            for i, caption in zip(uncertain, captions):
+                labels[i] = caption
+        logger.info(f'icon classifier: {len(images) - len(uncertain)}/{len(images)} above threshold')
+        return labels
+
+    def overlay_letterbox(self) -> LetterboxInput:
+        return self.letterbox(self.overlay_detect_params.imgsz or self.overlay_detector.imgsz,
+                              self.overlay_detector.stride)
 
     def overlay_detect_predict(self) -> tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
-        params = self.overlay_detect_params.model_dump(exclude_none=True)
-        return self.overlay_detector.predict(self.image, **params)
+        params = self.overlay_detect_params.model_dump(exclude_none=True, exclude={'enable', 'imgsz'})
+        return self.overlay_detector.predict(self.overlay_letterbox(), **params)
+
+    def overlay_columns_from(
+            self,
+            overlay_result: tuple[torch.Tensor, torch.Tensor, torch.Tensor]
+    ) -> ElementColumns:
+        overlay_boxes, overlay_scores, overlay_classes = overlay_result
+        w, h = self.source.size
+        return ElementColumns.create(
+            bbox=overlay_boxes.numpy() / [w, h, w, h],
+            score=overlay_scores.tolist(),
+            source=SOURCE_OVERLAY,
+            content=[OVERLAY_CLASS_NAMES.get(int(cls_idx), '') for cls_idx in overlay_classes.tolist()],
+        )
+
+    def loading_check(self) -> tuple[ParsedResult | None, ElementColumns | None]:
+        """
+        完整解析前的加载中/空白页快速检测
+
+        1. 在降采样图像上统计主要颜色占比，超过 blank_threshold 且边缘像素占比不超过 blank_edge_ratio 时
+           直接判定为空白页；仅颜色占比高的稀疏页面(空状态页等)不直接判定
+        2. 占比超过 dominance_threshold 时为疑似加载页，使用弹窗模型确认是否存在 "页面加载中"
+
+        Returns:
+            (判定为加载中时的解析结果, 已执行的弹窗检测结果，供后续流程复用)
+        """
+        params = self.loading_check_params
+        context = context_var.get()
+        with context.timer_recorder.timer('加载中快速检测'):
+            _, dominance_ratio = self.source.dominant_color(
+                color_bits_to_reduce=settings.loading_check_config.color_bits_to_reduce,
+                sample_size=settings.loading_check_config.sample_size,
+            )
+        if dominance_ratio >= params.blank_threshold:
+            with context.timer_recorder.timer('空白页边缘检测'):
+                edge_ratio = self.source.edge_ratio(
+                    edge_threshold=settings.loading_check_config.edge_threshold,
+                    sample_size=settings.loading_check_config.sample_size,
+                )
+            if edge_ratio <= params.blank_edge_ratio:
+                logger.info(f'空白页/加载中，跳过完整解析, 主要颜色占比: {dominance_ratio}, 边缘占比: {edge_ratio}')
+                return ParsedResult.loading(), None
+
+        if not (params.use_overlay and self.overlay_detect_params.enable
+                and dominance_ratio >= params.dominance_threshold):
+            return None, None
+
+        with context.timer_recorder.timer('弹窗/加载中检测'):
+            overlay_columns = self.overlay_columns_from(self.overlay_detect_predict())
+        is_loading = np.array([content == OVERLAY_CLASS_NAMES[0] for content in overlay_columns.content], dtype=bool)
+        if (is_loading & (overlay_columns.score >= params.overlay_conf)).any():
+            logger.info(f'检测到页面加载中，跳过完整解析, 主要颜色占比: {dominance_ratio}')
+            return ParsedResult.loading(
+                BoxesHandler.sort_elements_spatially(overlay_columns, self.spatial_relations)), overlay_columns
+        return None, overlay_columns
 
     # @profile  # 逐行统计内存消耗
     def parse(self) -> ParsedResult:
         """Parse the image and return structured output."""
+        overlay_columns = None
+        if self.loading_check_params.enable:
+            loading_result, overlay_columns = self.loading_check()
+            if loading_result is not None:
+                return loading_result
+
+        if self.rois:
+            return self.sorted_result(*self.parse_rois(overlay_columns))
+        return self.sorted_result(*self.parse_elements(overlay_columns))
+
+    def sorted_result(
+            self,
+            merged_columns: ElementColumns,
+            ocr_columns: ElementColumns,
+            icon_columns: ElementColumns,
+            overlay_columns: ElementColumns
+    ) -> ParsedResult:
+        context = context_var.get()
+        with context.timer_recorder.timer('元素空间排序'):
+            columns = BoxesHandler.sort_elements_spatially(merged_columns, self.spatial_relations)
+        return ParsedResult(
+            columns=columns,
+            ocr_columns=ocr_columns,
+            icon_columns=icon_columns,
+            overlay_columns=overlay_columns,
+        )
+
+    def parse_rois(
+            self,
+            overlay_columns: ElementColumns | None = None
+    ) -> tuple[ElementColumns, ElementColumns, ElementColumns, ElementColumns]:
+        """
+        仅解析感兴趣区域，耗时与区域面积成正比
+
+        每个区域裁剪后单独执行 OCR、目标检测与图标识别，再将坐标映射回整张图片的归一化坐标。
+        区域重叠时，完全位于之前区域内的元素视为重复并丢弃。
+
+        Args:
+            overlay_columns: 加载中检测时已得到的整图弹窗检测结果，存在时区域内不再重复检测
+        """
+        w, h = self.source.size
+        crop_boxes = []
+        for x1, y1, x2, y2 in self.rois:
+            crop_box = (int(x1 * w), int(y1 * h), min(math.ceil(x2 * w), w), min(math.ceil(y2 * h), h))
+            if crop_box[2] > crop_box[0] and crop_box[3] > crop_box[1]:
+                crop_boxes.append(crop_box)
+        # 区域的归一化坐标
+        roi_bboxes = np.array([[x1 / w, y1 / h, x2 / w, y2 / h] for x1, y1, x2, y2 in crop_boxes]).reshape(-1, 4)
+
+        region_results = []
+        region_overlay_params = self.overlay_detect_params.model_copy(
+            update={'enable': self.overlay_detect_params.enable and overlay_columns is None}
+        )
+        for i, crop_box in enumerate(crop_boxes):
+            region = replace(
+                self,
+                source=self.source.crop(crop_box),
+                overlay_detect_params=region_overlay_params,
+                rois=None
+            )
+            region_results.append([
+                self.dedupe_region(self.map_from_region(columns, roi_bboxes[i]), roi_bboxes[:i])
+                for columns in region.parse_elements()
+            ])
+
+        merged_columns, ocr_columns, icon_columns, region_overlay_columns = (
+            ElementColumns.concat(*columns) for columns in zip(*region_results)
+        ) if region_results else (ElementColumns.empty() for _ in range(4))
+
+        if overlay_columns is None:
+            overlay_columns = region_overlay_columns
+        else:
+            # 复用整图弹窗检测结果，仅保留与区域相交的元素
+            intersects = BoxesHandler.pairwise_intersection(overlay_columns.bbox, roi_bboxes) > 0
+            overlay_columns = overlay_columns.take(intersects.any(axis=1))
+            merged_columns = ElementColumns.concat(merged_columns, overlay_columns)
+
+        return merged_columns, ocr_columns, icon_columns, overlay_columns
+
+    @staticmethod
+    def map_from_region(columns: ElementColumns, roi_bbox: np.ndarray) -> ElementColumns:
+        """将区域内的归一化坐标映射为整张图片的归一化坐标"""
+        rx1, ry1, rx2, ry2 = roi_bbox
+        rw, rh = rx2 - rx1, ry2 - ry1
+        return replace(columns, bbox=columns.bbox * [rw, rh, rw, rh] + [rx1, ry1, rx1, ry1])
+
+    @staticmethod
+    def dedupe_region(columns: ElementColumns, previous_rois: np.ndarray) -> ElementColumns:
+        """丢弃完全位于之前区域内的元素"""
+        if len(previous_rois) == 0 or len(columns) == 0:
+            return columns
+        bbox, rois = columns.bbox[:, None, :], previous_rois[None, :, :]
+        within = ((bbox[..., :2] >= rois[..., :2]) & (bbox[..., 2:] <= rois[..., 2:])).all(axis=2)
+        return columns.take(~within.any(axis=1))
+
+    def parse_elements(
+            self,
+            overlay_columns: ElementColumns | None = None
+    ) -> tuple[ElementColumns, ElementColumns, ElementColumns, ElementColumns]:
+        """
+        对整张图片执行 OCR、目标检测、图标识别与弹窗检测，各阶段按列处理元素
+
+        Returns:
+            (合并后未排序的元素, OCR 元素, 图标元素, 弹窗元素)，坐标均为相对 self.source 的归一化坐标
+        """
+        ocr_columns = self.ocr_stage()
+        icon_columns = self.icon_detect_stage()
+        filtered_icon_columns, filtered_ocr_columns = self.overlap_stage(ocr_columns, icon_columns)
+        if self.icon_caption_params.mode == 'eager':
+            filtered_icon_columns = self.caption_stage(filtered_icon_columns, self.crop_stage(filtered_icon_columns))
+        if overlay_columns is None:
+            overlay_columns = self.overlay_detect_stage()
+
+        # 目标检测已完成，释放共享的预处理输入
+        self._letterbox_inputs.clear()
+
+        merged_columns = ElementColumns.concat(filtered_icon_columns, filtered_ocr_columns, overlay_columns)
+        return merged_columns, ocr_columns, icon_columns, overlay_columns
+
+    def ocr_stage(self) -> ElementColumns:
         context = context_var.get()
         with context.timer_recorder.timer('ocr识别'):
             ocr_result = self.ocr_predict()
-        ocr_boxes: np.ndarray[np.ndarray[np.int16]] = ocr_result.get('rec_boxes')
-        ocr_texts: list[str] = ocr_result.get('rec_texts')
-        ocr_scores: list[float] = ocr_result.get('rec_scores')
+        w, h = self.source.size
+        ocr_columns = ElementColumns.create(
+            bbox=np.asarray(ocr_result.get('rec_boxes')).reshape(-1, 4) / [w, h, w, h],
+            score=ocr_result.get('rec_scores'),
+            source=SOURCE_OCR,
+            content=ocr_result.get('rec_texts'),
+        )
         # 目的 快速释放内存
         # gc.collect()释放内存给Python内存池，不保证还给操作系统
         # 操作系统回收发生在Python进程结束或内存压力大时
         del ocr_result
         gc.collect()
+        return ocr_columns
 
-        w, h = self.image.size
-        ocr_elements = []
-        icon_elements = []
-
-        if ocr_boxes.shape[0] > 0:
-            # 少量数据直接放在 CPU 中计算
-            # TODO 验证放 GPU 计算性能对比 torch.tensor(ocr_boxes, device='cuda')
-            ocr_bboxes = torch.tensor(ocr_boxes) / torch.Tensor([w, h, w, h])
-            ocr_bboxes = ocr_bboxes.tolist()  # Tensors are automatically moved to the CPU first if necessary
-
-            ocr_elements = [
-                Element(
-                    type='text',
-                    bbox=bbox,
-                    score=score,
-                    interactivity=False,
-                    content=text,
-                    source='box_ocr_content_ocr'
-                )
-                for bbox, text, score in zip(ocr_bboxes, ocr_texts, ocr_scores)
-            ]
-
+    def icon_detect_stage(self) -> ElementColumns:
+        context = context_var.get()
         with context.timer_recorder.timer('icon 目标检测'):
-            icon_boxes, icon_scores = self.icon_detect_predict()
-        if icon_boxes.shape[0] > 0:
-            icon_bboxes = icon_boxes / torch.Tensor([w, h, w, h])
-            icon_bboxes = icon_bboxes.tolist()
-            icon_elements = [
-                Element(
-                    type='icon',
-                    bbox=bbox,
-                    interactivity=True,
-                    content=None,
-                    source='box_yolo_content_yolo',
-                    score=score
-                )
-                for bbox, score in zip(icon_bboxes, icon_scores)
-            ]
-        del icon_boxes, icon_scores
+            icon_columns = self.icon_columns_from(self.icon_detect_predict())
         gc.collect()
+        return icon_columns
 
+    def overlay_detect_stage(self) -> ElementColumns:
+        if not self.overlay_detect_params.enable:
+            return ElementColumns.empty()
+        context = context_var.get()
+        with context.timer_recorder.timer('弹窗/加载中检测'):
+            overlay_columns = self.overlay_columns_from(self.overlay_detect_predict())
+        gc.collect()
+        return overlay_columns
+
+    def overlap_stage(
+            self,
+            ocr_columns: ElementColumns,
+            icon_columns: ElementColumns
+    ) -> tuple[ElementColumns, ElementColumns]:
+        """Returns: (去重后的图标元素, 去重后的 OCR 元素)"""
+        context = context_var.get()
         with context.timer_recorder.timer('移除重叠元素'):
-            filtered_icon_elements, filtered_ocr_elements = BoxesHandler.remove_overlap(
-                icon_elements,
-                ocr_elements,
-                iou_threshold=self.overlap_iou_threshold
-            )
+            return BoxesHandler.remove_overlap(icon_columns, ocr_columns, iou_threshold=self.overlap_iou_threshold)
+
+    def crop_stage(self, icon_columns: ElementColumns) -> list[Image.Image]:
+        context = context_var.get()
         with context.timer_recorder.timer('裁剪出icon元素'):
-            cropped_images = ImageUtil.crop_images(self.image, [el.bbox for el in filtered_icon_elements])
+            return ImageUtil.crop_images(self.source.array, icon_columns.bbox.tolist())
 
+    def caption_stage(self, icon_columns: ElementColumns, cropped_images: list[Image.Image]) -> ElementColumns:
+        context = context_var.get()
         with context.timer_recorder.timer('icon元素识别'):
-            icon_captions = self.icon_caption_predict(cropped_images)
+            icon_columns.content = list(self.icon_caption_predict(cropped_images))
+        del cropped_images
+        gc.collect()
+        return icon_columns
 
-        for el, caption in zip(filtered_icon_elements, icon_captions):
-            el.content = caption
+    def stage_nodes(self, overlay_columns: ElementColumns | None = None) -> list[Node]:
+        """
+        整图解析的 DAG：OCR、图标检测、弹窗检测互不依赖，可由不同阶段的线程池并行执行
 
-        del icon_captions
-        gc.collect()
+        Args:
+            overlay_columns: 加载中检测时已得到的弹窗检测结果，存在时不再重复检测
+        """
+        eager = self.icon_caption_params.mode == 'eager'
 
-        with context.timer_recorder.timer('弹窗/加载中检测'):
-            overlay_boxes, overlay_scores, overlay_classes = self.overlay_detect_predict()
-
-        overlay_elements = []
-        if overlay_boxes.shape[0] > 0:
-            overlay_bboxes = overlay_boxes / torch.Tensor([w, h, w, h])
-            overlay_bboxes = overlay_bboxes.tolist()
-            overlay_elements = [
-                Element(
-                    type='overlay',
-                    bbox=bbox,
-                    interactivity=True,
-                    content=OVERLAY_CLASS_NAMES.get(int(cls_idx), ''),
-                    source='box_yolo_content_overlay',
-                    score=float(score),
-                )
-                for bbox, score, cls_idx in zip(overlay_bboxes, overlay_scores, overlay_classes)
+        def merge(ocr, icon_detect, overlay_detect, overlap, caption=None) -> ParsedResult:
+            # 目标检测已完成，释放共享的预处理输入
+            self._letterbox_inputs.clear()
+            filtered_icon_columns, filtered_ocr_columns = overlap
+            merged_columns = ElementColumns.concat(
+                caption if caption is not None else filtered_icon_columns, filtered_ocr_columns, overlay_detect)
+            return self.sorted_result(merged_columns, ocr, icon_detect, overlay_detect)
+
+        nodes = [
+            Node('ocr', self.ocr_stage),
+            Node('icon_detect', self.icon_detect_stage),
+            Node('overlay_detect', (lambda: overlay_columns) if overlay_columns is not None
+                 else self.overlay_detect_stage),
+            Node('overlap', self.overlap_stage, deps=('ocr', 'icon_detect')),
+        ]
+        if eager:
+            nodes += [
+                Node('crop', lambda overlap: self.crop_stage(overlap[0]), deps=('overlap',)),
+                Node('caption', lambda overlap, crop: self.caption_stage(overlap[0], crop), deps=('overlap', 'crop')),
             ]
-        del overlay_boxes, overlay_scores, overlay_classes
-        gc.collect()
+        nodes.append(Node('merge', merge, stage='sort',
+                          deps=('ocr', 'icon_detect', 'overlay_detect', 'overlap') + (('caption',) if eager else ())))
+        return nodes
 
-        merged_elements = filtered_icon_elements + filtered_ocr_elements + overlay_elements
-        merged_elements = BoxesHandler.sort_elements_spatially(merged_elements)
-        for i, el in enumerate(merged_elements):
-            el.id = i
+    async def parse_pipelined(self, scheduler: PipelineScheduler) -> ParsedResult:
+        """
+        与 parse 结果一致，各阶段提交到跨请求共享的阶段线程池中执行
 
-        return ParsedResult(
-            elements=merged_elements,
-            ocr_elements=ocr_elements,
-            icon_elements=icon_elements,
-            overlay_elements=overlay_elements,
-        )
+        区域解析的各区域仍在 rois 阶段中顺序执行
+        """
+        overlay_columns = None
+        if self.loading_check_params.enable:
+            # 快速检测会使用弹窗模型，与弹窗检测共用阶段
+            loading_result, overlay_columns = await scheduler.submit('overlay_detect', self.loading_check)
+            if loading_result is not None:
+                return loading_result
+        if self.rois:
+            return await scheduler.submit('rois', lambda: self.sorted_result(*self.parse_rois(overlay_columns)))
+        results = await scheduler.run_dag(self.stage_nodes(overlay_columns))
+        return results['merge']
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/19 21:10
+import asyncio
+import contextvars
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, TypeVar
+
+from loguru import logger
+
+T = TypeVar('T')
+
+
+@dataclass
+class StageMetrics:
+    submitted: int = 0
+    completed: int = 0
+    failed: int = 0
+    waiting: int = 0  # 已提交、等待空闲线程的任务数
+    running: int = 0
+    backpressure_seconds: float = 0  # 队列已满时提交方等待入队的累计时间
+    wait_seconds: float = 0  # 累计排队时间
+    run_seconds: float = 0  # 累计执行时间
+
+
+class Stage:
+    """
+    流水线阶段：独立的有界线程池 + 有界队列
+
+    同一阶段最多 workers 个任务并行执行、queue_size 个任务排队，队列已满时提交方等待(背压)
+    """
+
+    def __init__(self, name: str, workers: int, queue_size: int):
+        self.name = name
+        self.workers = workers
+        self.queue_size = queue_size
+        self.metrics = StageMetrics()
+        self._slots = asyncio.Semaphore(workers + queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'stage-{name}')
+
+    async def submit(self, func: Callable[..., T], *args, **kwargs) -> T:
+        metrics = self.metrics
+        st = time.perf_counter()
+        await self._slots.acquire()
+        metrics.backpressure_seconds += time.perf_counter() - st
+        metrics.submitted += 1
+        metrics.waiting += 1
+        enqueued = time.perf_counter()
+
+        def run():
+            # 在工作线程中记录出队时间，区分排队与执行耗时
+            started = time.perf_counter()
+            metrics.waiting -= 1
+            metrics.running += 1
+            metrics.wait_seconds += started - enqueued
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.running -= 1
+                metrics.run_seconds += time.perf_counter() - started
+
+        # run_in_executor 不传播 contextvars，显式复制请求上下文(耗时记录等)
+        context = contextvars.copy_context()
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self._executor, functools.partial(context.run, run))
+        except BaseException:
+            metrics.failed += 1
+            raise
+        finally:
+            self._slots.release()
+        metrics.completed += 1
+        return result
+
+    def snapshot(self) -> dict:
+        metrics = self.metrics
+        done = max(metrics.completed + metrics.failed, 1)
+        return {
+            'workers': self.workers,
+            'queue_size': self.queue_size,
+            'waiting': metrics.waiting,
+            'running': metrics.running,
+            'submitted': metrics.submitted,
+            'completed': metrics.completed,
+            'failed': metrics.failed,
+            'avg_wait_ms': round(metrics.wait_seconds / done * 1000, 2),
+            'avg_run_ms': round(metrics.run_seconds / done * 1000, 2),
+            'backpressure_seconds': round(metrics.backpressure_seconds, 3),
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+@dataclass
+class Node:
+    """
+    DAG 节点：依赖节点全部完成后，在 stage 对应的阶段线程池中执行 func
+
+    func 以依赖节点名为关键字参数接收依赖节点的结果
+    """
+    name: str
+    func: Callable[..., Any]
+    deps: tuple[str, ...] = ()
+    stage: str | None = None  # 默认与节点同名
+
+
+class PipelineScheduler:
+    """
+    跨请求的分阶段流水线调度
+
+    解析流程拆分为 DAG，各阶段(OCR、图标检测、图标识别等)拥有独立的线程池与队列，
+    不同请求可同时处于不同阶段：请求 A 在图标识别时，OCR 可以开始处理请求 B。
+    各阶段的排队与执行指标用于定位瓶颈阶段。
+    """
+
+    def __init__(self, stages: dict[str, int], queue_size: int = 8):
+        """
+        Args:
+            stages: 阶段名 -> 并行线程数，模型阶段通常为 1，保证同一模型同一时间只被一个线程使用
+            queue_size: 每个阶段的最大排队任务数
+        """
+        self.stage_workers = stages
+        self.queue_size = queue_size
+        self._stages: dict[str, Stage] = {}
+
+    def stage(self, name: str) -> Stage:
+        # 阶段在事件循环中首次使用时创建，信号量绑定到运行中的事件循环
+        if name not in self._stages:
+            if name not in self.stage_workers:
+                logger.warning(f'pipeline stage {name} not configured, use 1 worker')
+            self._stages[name] = Stage(name, self.stage_workers.get(name, 1), self.queue_size)
+        return self._stages[name]
+
+    async def submit(self, stage: str, func: Callable[..., T], *args, **kwargs) -> T:
+        return await self.stage(stage).submit(func, *args, **kwargs)
+
+    async def run_dag(self, nodes: list[Node]) -> dict[str, Any]:
+        """
+        执行 DAG，节点按依赖就绪顺序并发执行
+
+        Args:
+            nodes: 节点列表，依赖节点需在前
+
+        Returns:
+            节点名 -> 结果；任一节点失败时取消其余节点并抛出异常
+        """
+        tasks: dict[str, asyncio.Task] = {}
+
+        async def run_node(node: Node):
+            results = await asyncio.gather(*(tasks[dep] for dep in node.deps))
+            return await self.submit(node.stage or node.name, node.func, **dict(zip(node.deps, results)))
+
+        for node in nodes:
+            missing = [dep for dep in node.deps if dep not in tasks]
+            if missing:
+                raise ValueError(f'pipeline node {node.name} depends on undefined nodes: {missing}')
+            tasks[node.name] = asyncio.create_task(run_node(node))
+        try:
+            return dict(zip(tasks, await asyncio.gather(*tasks.values())))
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+
+    def snapshot(self) -> dict[str, dict]:
+        return {name: stage.snapshot() for name, stage in self._stages.items()}
+
+    def close(self):
+        for stage in self._stages.values():
+            stage.close()
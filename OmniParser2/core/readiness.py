@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/19 20:40
+import asyncio
+import inspect
+import time
+from dataclasses import dataclass, field, asdict
+from typing import Awaitable, Callable, Literal, TypeVar
+
+from loguru import logger
+
+T = TypeVar('T')
+
+
+@dataclass
+class ComponentStatus:
+    state: Literal['pending', 'loading', 'loaded', 'warming', 'ready', 'failed'] = 'pending'
+    load_seconds: float | None = None
+    warmup_seconds: float | None = None
+    error: str | None = None
+
+
+@dataclass
+class Readiness:
+    """
+    服务启动就绪状态
+
+    各组件(模型、向量库等)并行加载与预热，全部就绪后服务才接收解析请求，/health 返回各组件耗时
+    """
+    components: dict[str, ComponentStatus] = field(default_factory=dict)
+    started_at: float = field(default_factory=time.perf_counter)
+    ready_seconds: float | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_seconds is not None
+
+    @property
+    def failed(self) -> bool:
+        return any(status.state == 'failed' for status in self.components.values())
+
+    def register(self, *names: str):
+        """预先登记组件，加载开始前 /health 即可看到全部组件"""
+        for name in names:
+            self.components.setdefault(name, ComponentStatus())
+
+    async def load(self, name: str, loader: Callable[[], T | Awaitable[T]]) -> T:
+        """加载组件并记录耗时，同步函数在线程中执行；失败时记录错误并抛出"""
+        status = self.components.setdefault(name, ComponentStatus())
+        status.state = 'loading'
+        st = time.perf_counter()
+        try:
+            if inspect.iscoroutinefunction(loader):
+                component = await loader()
+            else:
+                component = await asyncio.to_thread(loader)
+        except Exception as e:
+            status.state, status.error = 'failed', repr(e)
+            logger.exception(f'{name} load failed')
+            raise
+        status.state, status.load_seconds = 'loaded', time.perf_counter() - st
+        logger.info(f'{name} loaded in {status.load_seconds:.2f}s')
+        return component
+
+    async def warmup(self, name: str, warmup: Callable[[], None | Awaitable[None]] | None = None):
+        """执行一次预热推理，触发算子选择、显存分配等延迟初始化，同步函数在线程中执行"""
+        status = self.components.setdefault(name, ComponentStatus())
+        status.state = 'warming'
+        st = time.perf_counter()
+        try:
+            if inspect.iscoroutinefunction(warmup):
+                await warmup()
+            elif warmup is not None:
+                await asyncio.to_thread(warmup)
+        except Exception as e:
+            status.state, status.error = 'failed', repr(e)
+            logger.exception(f'{name} warmup failed')
+            raise
+        status.state, status.warmup_seconds = 'ready', time.perf_counter() - st
+        logger.info(f'{name} warmed up in {status.warmup_seconds:.2f}s')
+
+    def fail(self, name: str, error: str):
+        """组件在就绪后失效(如解析进程无法重启)，服务标记为异常"""
+        status = self.components.setdefault(name, ComponentStatus())
+        status.state, status.error = 'failed', error
+        logger.error(f'{name} failed: {error}')
+
+    def mark_ready(self):
+        self.ready_seconds = time.perf_counter() - self.started_at
+        logger.info(f'service ready in {self.ready_seconds:.2f}s')
+
+    def to_dict(self) -> dict:
+        return {
+            'status': 'failed' if self.failed else 'ready' if self.ready else 'starting',
+            'ready_seconds': self.ready_seconds,
+            'components': {name: asdict(status) for name, status in self.components.items()},
+        }
+
+
+readiness = Readiness()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/19 14:20
+import math
+
+import numpy as np
+
+
+class TileHandler:
+    """长截图/高分辨率截图的分块与分块结果合并"""
+
+    @staticmethod
+    def split_tiles(
+            width: int,
+            height: int,
+            tile_size: int,
+            overlap: int
+    ) -> list[tuple[int, int, int, int]]:
+        """
+        将图片切分为相互重叠的网格分块
+
+        Args:
+            width: 图片宽度
+            height: 图片高度
+            tile_size: 分块最大边长(不含重叠部分)
+            overlap: 相邻分块的重叠像素
+
+        Returns:
+            分块像素坐标列表 [(x1, y1, x2, y2), ...]，按行优先排列
+        """
+
+        def split_axis(length: int) -> list[tuple[int, int]]:
+            n = max(1, math.ceil(length / tile_size))
+            step = length / n
+            spans = []
+            for i in range(n):
+                start = int(i * step) - (overlap // 2 if i > 0 else 0)
+                end = int((i + 1) * step) + (overlap // 2 if i < n - 1 else 0)
+                spans.append((max(0, start), min(length, end)))
+            return spans
+
+        return [(x1, y1, x2, y2) for y1, y2 in split_axis(height) for x1, x2 in split_axis(width)]
+
+    @staticmethod
+    def merge_ocr_results(
+            tiles: list[tuple[int, int, int, int]],
+            tile_results: list[tuple[np.ndarray, list[str], list[float]]],
+            width: int,
+            height: int,
+            overlap: int,
+            edge_margin: int = 2,
+            dedupe_threshold: float = 0.5
+    ) -> tuple[np.ndarray, list[str], list[float]]:
+        """
+        合并各分块的 OCR 结果，映射回整图坐标并去除重叠区域的重复文本框
+
+        1. 贴着分块内部切割边且完全落在重叠带内的框，在相邻分块中是完整的，直接丢弃被截断的一侧
+        2. 剩余框按分数从高到低做去重：与其他分块已保留框的交集占较小框面积超过 dedupe_threshold 视为重复
+
+        Args:
+            tiles: 分块像素坐标
+            tile_results: 每个分块的 (rec_boxes, rec_texts, rec_scores)，rec_boxes 为分块内像素坐标 [x1, y1, x2, y2]
+            width: 整图宽度
+            height: 整图高度
+            overlap: 相邻分块的重叠像素
+            edge_margin: 判定贴边的像素容差
+            dedupe_threshold: 去重阈值
+
+        Returns:
+            (rec_boxes, rec_texts, rec_scores)，rec_boxes 为整图像素坐标
+        """
+        all_boxes, all_texts, all_scores, all_tile_ids = [], [], [], []
+        for tile_id, ((tx1, ty1, tx2, ty2), (boxes, texts, scores)) in enumerate(zip(tiles, tile_results)):
+            if len(texts) == 0:
+                continue
+            boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4) + [tx1, ty1, tx1, ty1]
+
+            # 贴着内部切割边，且垂直于该边的范围落在重叠带内
+            cut_left = (tx1 > 0) & (boxes[:, 0] <= tx1 + edge_margin) & (boxes[:, 2] <= tx1 + overlap)
+            cut_top = (ty1 > 0) & (boxes[:, 1] <= ty1 + edge_margin) & (boxes[:, 3] <= ty1 + overlap)
+            cut_right = (tx2 < width) & (boxes[:, 2] >= tx2 - edge_margin) & (boxes[:, 0] >= tx2 - overlap)
+            cut_bottom = (ty2 < height) & (boxes[:, 3] >= ty2 - edge_margin) & (boxes[:, 1] >= ty2 - overlap)
+            keep = ~(cut_left | cut_top | cut_right | cut_bottom)
+
+            all_boxes.append(boxes[keep])
+            all_tile_ids.append(np.full(int(keep.sum()), tile_id))
+            all_texts.extend(text for text, k in zip(texts, keep) if k)
+            all_scores.extend(float(score) for score, k in zip(scores, keep) if k)
+
+        if not all_texts:
+            return np.empty((0, 4), dtype=np.int32), [], []
+
+        boxes = np.concatenate(all_boxes)
+        scores = np.asarray(all_scores)
+        areas = np.maximum(boxes[:, 2] - boxes[:, 0], 1) * np.maximum(boxes[:, 3] - boxes[:, 1], 1)
+
+        # 两两交集面积，仅在分块重叠区域内才会出现重复，数量级很小
+        ix1 = np.maximum(boxes[:, None, 0], boxes[None, :, 0])
+        iy1 = np.maximum(boxes[:, None, 1], boxes[None, :, 1])
+        ix2 = np.minimum(boxes[:, None, 2], boxes[None, :, 2])
+        iy2 = np.minimum(boxes[:, None, 3], boxes[None, :, 3])
+        intersection = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+        overlap_ratio = intersection / np.minimum(areas[:, None], areas[None, :])
+        # 同一分块内的框由模型自身处理，只对不同分块之间去重
+        tile_ids = np.concatenate(all_tile_ids)
+        overlap_ratio[tile_ids[:, None] == tile_ids[None, :]] = 0
+
+        kept = []
+        suppressed = np.zeros(len(boxes), dtype=bool)
+        for i in np.argsort(-scores, kind='stable'):
+            if suppressed[i]:
+                continue
+            kept.append(i)
+            suppressed |= overlap_ratio[i] > dedupe_threshold
+
+        kept.sort()
+        return boxes[kept], [all_texts[i] for i in kept], [all_scores[i] for i in kept]
@@ -0,0 +1,432 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/19 20:10
+import asyncio
+import gc
+import itertools
+import multiprocessing as mp
+import os
+import signal
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+from multiprocessing.connection import Connection, wait
+from multiprocessing.reduction import recv_handle, send_handle
+from typing import Callable
+
+import numpy as np
+import torch
+from loguru import logger
+
+from core.parse import OmniParser, ParsedResult
+from util.context import Context, context_var
+from util.image import ImageSource
+from util.timer import TimerInfo, TimerRecorder
+
+# (图片, 请求参数) -> 解析器，在主进程中定义，fork 后子进程直接继承其引用的模型
+ParserFactory = Callable[[ImageSource, object], OmniParser]
+
+
+class WorkerLost(Exception):
+    """解析进程在收到任务前退出"""
+
+
+@dataclass
+class WorkerSlot:
+    """解析进程位置的状态，只在事件循环线程中修改"""
+    conn: Connection | None = None  # 与解析进程的双向管道，进程未启动或已退出时为 None
+    pid: int | None = None
+    job_id: int | None = None  # 已分发的任务
+    started: bool = False  # 进程是否已收到任务，未收到时进程退出的任务可以重新分发
+    ready: bool = False  # 当前进程是否已预热完成
+    failures: int = 0  # 连续启动失败次数，预热完成后清零
+    error: str | None = None  # 最近一次预热失败的错误
+    given_up: bool = False  # 连续启动失败次数达到上限，不再重启
+
+
+class ParseWorkerPool:
+    """
+    预派生(pre-fork)解析进程池
+
+    主进程加载全部模型后 fork 出多个解析进程，模型权重所在的内存页以写时复制方式共享，
+    常驻内存随进程数亚线性增长；各进程有独立的 GIL 与 OCR 实例，解析吞吐随 CPU 核数扩展。
+
+    注意：CUDA 上下文不能跨 fork 使用，仅支持 CPU 推理；fork 需在任何推理之前进行，
+    避免子进程继承 OpenMP 等线程池的锁状态。因此 start 时先 fork 出一个不做推理的孵化进程(zygote)，
+    全部解析进程(包括崩溃后的补位进程)都由孵化进程 fork，主进程之后的推理不影响解析进程。
+
+    每个解析进程与主进程之间是独立的双向管道，主进程把任务分发给空闲的解析进程，
+    不存在多个进程争用的共享队列锁，任一进程被强制结束(OOM、kill -9)都不会阻塞其他进程；
+    管道关闭即表示进程退出，其正在处理的任务立即失败，并由孵化进程在原位置补位。
+    连续启动失败(预热失败或就绪前退出)达到 max_failures 次的位置不再重启，通过 on_failure 上报。
+    """
+
+    def __init__(
+            self,
+            processes: int,
+            parser_factory: ParserFactory,
+            torch_threads: int = 0,
+            warmup: Callable[[], None] | None = None,
+            max_failures: int = 3,
+            on_failure: Callable[[str], None] | None = None
+    ):
+        """
+        Args:
+            processes: 解析进程数
+            parser_factory: 在子进程中构建解析器的函数
+            torch_threads: 每个进程的 torch 计算线程数，0 表示按 CPU 核数平分
+            warmup: 子进程启动后执行的预热函数，全部子进程预热完成后 wait_ready 返回
+            max_failures: 同一位置连续启动失败的次数上限
+            on_failure: 某个位置放弃重启时的回调，参数为错误信息
+        """
+        self.processes = processes
+        self.parser_factory = parser_factory
+        self.warmup = warmup
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // processes)
+        self.max_failures = max_failures
+        self.on_failure = on_failure
+        self._ctx = mp.get_context('fork')
+        self._slots = [WorkerSlot() for _ in range(processes)]
+        self._futures: dict[int, asyncio.Future] = {}
+        self._job_ids = itertools.count()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._idle: asyncio.Queue[tuple[int | None, Connection | None]] | None = None
+        self._zygote: mp.Process | None = None
+        self._zygote_conn: Connection | None = None
+        self._wake_conn: Connection | None = None
+        self._reader: threading.Thread | None = None
+        self._ready: asyncio.Future | None = None
+        self._ready_slots: set[int] = set()
+        self._closed = False
+        self.restarts = 0
+
+    def start(self):
+        """在模型加载完成、首次推理之前调用"""
+        self._loop = asyncio.get_running_loop()
+        self._ready = self._loop.create_future()
+        self._idle = asyncio.Queue()
+        self._zygote_conn, zygote_conn = self._ctx.Pipe()
+        # 冻结已有对象，避免子进程 GC 改写对象头导致共享内存页被复制
+        gc.disable()
+        gc.freeze()
+        try:
+            self._zygote = self._ctx.Process(target=self._zygote_main, args=(zygote_conn,), name='parse-zygote',
+                                             daemon=True)
+            self._zygote.start()
+        finally:
+            gc.enable()
+        zygote_conn.close()
+        wake_conn, self._wake_conn = self._ctx.Pipe(duplex=False)
+        self._reader = threading.Thread(target=self._read_events, args=(wake_conn,), name='parse-worker-events',
+                                        daemon=True)
+        self._reader.start()
+        for index in range(self.processes):
+            self._zygote_conn.send(index)
+        logger.info(f'started {self.processes} parse workers, torch threads per worker: {self.torch_threads}')
+
+    def _zygote_main(self, conn: Connection):
+        """孵化进程入口：按主进程的请求 fork 解析进程，并把与解析进程的管道交给主进程"""
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        # 解析进程退出后由内核自动回收
+        signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+        self._zygote_conn.close()
+        while True:
+            try:
+                index = conn.recv()
+            except EOFError:
+                break
+            if index is None:
+                break
+            parent_conn, child_conn = self._ctx.Pipe()
+            gc.freeze()
+            pid = os.fork()
+            if pid == 0:
+                conn.close()
+                parent_conn.close()
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                code = 0
+                try:
+                    self._worker_main(index, child_conn)
+                except BaseException:
+                    traceback.print_exc()
+                    code = 1
+                finally:
+                    os._exit(code)
+            child_conn.close()
+            conn.send((index, pid))
+            send_handle(conn, parent_conn.fileno(), os.getppid())
+            parent_conn.close()
+
+    def _worker_main(self, index: int, conn: Connection):
+        """解析进程入口：循环处理管道中的解析任务，管道关闭或收到 None 时退出"""
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        gc.enable()
+        torch.set_num_threads(self.torch_threads)
+        try:
+            if self.warmup is not None:
+                self.warmup()
+        except Exception:
+            conn.send(('ready', traceback.format_exc()))
+            return
+        conn.send(('ready', None))
+        logger.info(f'parse worker {index} ready, pid: {os.getpid()}')
+        while True:
+            try:
+                job = conn.recv()
+            except (EOFError, OSError):
+                break
+            if job is None:
+                break
+            job_id, raw, name, params = job
+            conn.send(('started', job_id))
+            context = Context()
+            context_var.set(context)
+            try:
+                context.source = ImageSource(raw, name=name, encoded=False) if isinstance(raw, np.ndarray) \
+                    else ImageSource.decode(raw, name)
+                result = self.parser_factory(context.source, params).parse()
+                conn.send(('result', job_id, result, context.timer_recorder.records, None))
+            except Exception as e:
+                logger.error(f'parse worker {index} error: {e}')
+                conn.send(('result', job_id, None, context.timer_recorder.records, traceback.format_exc()))
+
+    def _read_events(self, wake_conn: Connection):
+        """主进程后台线程：接收孵化进程交来的管道与解析进程的消息，事件交给事件循环处理"""
+        conns: dict[Connection, int] = {}
+        zygote_conn = self._zygote_conn
+        while True:
+            watched = [wake_conn, *conns] + ([zygote_conn] if zygote_conn is not None else [])
+            for conn in wait(watched):
+                if conn is wake_conn:
+                    return
+                if conn is zygote_conn:
+                    try:
+                        index, pid = conn.recv()
+                        worker_conn = Connection(recv_handle(conn))
+                    except (EOFError, OSError):
+                        zygote_conn = None
+                        self._call_soon(self._on_zygote_exit)
+                        continue
+                    conns[worker_conn] = index
+                    self._call_soon(self._on_spawned, index, pid, worker_conn)
+                    continue
+                index = conns[conn]
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    del conns[conn]
+                    conn.close()
+                    self._call_soon(self._on_exit, index, conn)
+                    continue
+                self._call_soon(self._on_message, index, conn, message)
+
+    def _call_soon(self, callback: Callable, *args):
+        try:
+            self._loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # 事件循环已关闭
+            pass
+
+    def _on_spawned(self, index: int, pid: int, conn: Connection):
+        slot = self._slots[index]
+        slot.conn, slot.pid, slot.job_id, slot.ready = conn, pid, None, False
+
+    def _on_message(self, index: int, conn: Connection, message: tuple):
+        slot = self._slots[index]
+        if slot.conn is not conn:
+            return
+        if message[0] == 'ready':
+            error = message[1]
+            if error:
+                # 预热失败的进程随后退出，由 _on_exit 计数并决定是否重启
+                slot.error = f'parse worker {index} warmup error:\n{error}'
+                logger.error(slot.error)
+                return
+            slot.ready, slot.failures, slot.error = True, 0, None
+            self._ready_slots.add(index)
+            if len(self._ready_slots) == self.processes and not self._ready.done():
+                self._ready.set_result(True)
+        elif message[0] == 'started':
+            slot.started = True
+            return
+        else:
+            _, job_id, result, records, error = message
+            slot.job_id, slot.started = None, False
+            future = self._futures.pop(job_id, None)
+            if future is not None:
+                self._set_result(future, (result, records, error))
+        self._idle.put_nowait((index, conn))
+
+    def _on_exit(self, index: int, conn: Connection):
+        slot = self._slots[index]
+        if slot.conn is not conn or self._closed:
+            return
+        logger.error(f'parse worker {index} (pid: {slot.pid}) exited, job: {slot.job_id}')
+        if slot.job_id is not None:
+            future = self._futures.get(slot.job_id)
+            if future is not None and not future.done():
+                if slot.started:
+                    future.set_exception(RuntimeError(f'parse worker {index} (pid: {slot.pid}) exited'))
+                else:
+                    # 进程在收到任务前退出(如空闲时被强制结束)，任务重新分发
+                    future.set_exception(WorkerLost())
+        if not slot.ready:
+            slot.failures += 1
+        slot.conn, slot.pid, slot.job_id, slot.started, slot.ready = None, None, None, False, False
+        if slot.failures >= self.max_failures:
+            self._give_up(index, slot.error or f'parse worker {index} exited before ready {slot.failures} times')
+        elif self._zygote_conn is not None:
+            logger.info(f'respawning parse worker {index}...')
+            self.restarts += 1
+            self._zygote_conn.send(index)
+
+    def _on_zygote_exit(self):
+        if self._closed:
+            return
+        self._zygote_conn = None
+        logger.error('parse worker zygote exited, workers will not be respawned')
+        for index, slot in enumerate(self._slots):
+            if slot.conn is None and not slot.given_up:
+                self._give_up(index, 'parse worker zygote exited')
+
+    def _give_up(self, index: int, error: str):
+        slot = self._slots[index]
+        slot.given_up = True
+        logger.error(f'parse worker {index} will not be restarted: {error}')
+        if not self._ready.done():
+            self._ready.set_exception(RuntimeError(error))
+        if self.on_failure is not None:
+            self.on_failure(error)
+        if not self.available:
+            # 唤醒等待空闲进程的请求，使其立即失败
+            self._idle.put_nowait((None, None))
+
+    async def wait_ready(self):
+        """等待全部解析进程预热完成"""
+        await asyncio.shield(self._ready)
+
+    @staticmethod
+    def _set_result(future: asyncio.Future, item: tuple[ParsedResult | None, list[TimerInfo], str | None]):
+        if future.done():
+            return
+        result, records, error = item
+        if error:
+            future.set_exception(RuntimeError(f'parse worker error:\n{error}'))
+        else:
+            future.set_result((result, records))
+
+    async def _acquire(self) -> tuple[int, Connection]:
+        """等待空闲的解析进程"""
+        while True:
+            if not self.available:
+                raise RuntimeError('no parse worker available')
+            index, conn = await self._idle.get()
+            if index is None:
+                # 传递给其他等待的请求
+                self._idle.put_nowait((None, None))
+                continue
+            slot = self._slots[index]
+            if slot.conn is conn and slot.job_id is None:
+                return index, conn
+
+    async def _dispatch(self, job_id: int, job: tuple) -> tuple[ParsedResult, list[TimerInfo]]:
+        while True:
+            index, conn = await self._acquire()
+            self._slots[index].job_id = job_id
+            future = self._futures[job_id] = self._loop.create_future()
+            try:
+                await asyncio.to_thread(conn.send, job)
+                return await future
+            except (OSError, WorkerLost):
+                # 进程在收到任务前退出，由 _on_exit 补位，任务交给其他进程
+                logger.warning(f'parse worker {index} exited before receiving job {job_id}, redispatching')
+
+    async def submit(self, source: ImageSource, params, timer_recorder: TimerRecorder,
+                     timeout: float | None = None) -> ParsedResult:
+        """
+        将解析任务分发给空闲的解析进程
+
+        Args:
+            source: 请求图片，只传输原始字节，由子进程解码；原始像素帧传输像素数组
+            params: 请求参数
+            timer_recorder: 请求的耗时记录器，合并子进程中各阶段的耗时
+            timeout: 超时时间(秒)，包含等待空闲进程的时间
+        """
+        job_id = next(self._job_ids)
+        # 原始像素帧无法由子进程解码，直接传输像素数组
+        data = source.raw if source.encoded else source.array
+        try:
+            result, records = await asyncio.wait_for(self._dispatch(job_id, (job_id, data, source.name, params)),
+                                                     timeout)
+        finally:
+            self._futures.pop(job_id, None)
+        timer_recorder.records.extend(records)
+        return result
+
+    @property
+    def alive(self) -> int:
+        return sum(slot.conn is not None for slot in self._slots)
+
+    @property
+    def available(self) -> int:
+        """未放弃重启的位置数"""
+        return sum(not slot.given_up for slot in self._slots)
+
+    @property
+    def pids(self) -> list[int | None]:
+        return [slot.pid for slot in self._slots]
+
+    def snapshot(self) -> dict:
+        """解析进程健康状态：存活、就绪、放弃重启的进程数，累计重启次数与等待结果的任务数"""
+        return {
+            'processes': self.processes,
+            'alive': self.alive,
+            'ready': sum(slot.ready for slot in self._slots),
+            'busy': sum(slot.job_id is not None for slot in self._slots),
+            'given_up': self.processes - self.available,
+            'restarts': self.restarts,
+            'pending': len(self._futures),
+        }
+
+    def close(self):
+        self._closed = True
+        for slot in self._slots:
+            if slot.conn is not None:
+                try:
+                    slot.conn.send(None)
+                except OSError:
+                    pass
+        if self._zygote_conn is not None:
+            try:
+                self._zygote_conn.send(None)
+            except OSError:
+                pass
+        if self._wake_conn is not None:
+            self._wake_conn.send(None)
+            self._reader.join(timeout=5)
+        if self._zygote is not None:
+            self._zygote.join(timeout=5)
+            if self._zygote.is_alive():
+                self._zygote.terminate()
+        # 解析进程是孵化进程的子进程，不能 join，等待其自行退出
+        pids = [slot.pid for slot in self._slots if slot.pid is not None]
+        deadline = time.monotonic() + 5
+        while pids and time.monotonic() < deadline:
+            pids = [pid for pid in pids if _pid_alive(pid)]
+            time.sleep(0.05)
+        for pid in pids:
+            os.kill(pid, signal.SIGTERM)
+        for slot in self._slots:
+            slot.conn, slot.pid = None, None
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/19 19:00
+import argparse
+import json
+from pathlib import Path
+from typing import Iterable, List, Tuple
+
+import clip
+import numpy as np
+import torch
+from PIL import Image
+from loguru import logger
+
+from config import settings
+
+# 常见闭集图标，标签表文件不存在时以文本嵌入初始化(零样本)，描述与微调数据集 caption 风格一致
+DEFAULT_LABELS = (
+    'an icon of close', 'an icon of back', 'an icon of search', 'an icon of share', 'an icon of play',
+    'an icon of pause', 'an icon of settings', 'an icon of more', 'an icon of menu', 'an icon of home',
+    'an icon of add', 'an icon of delete', 'an icon of edit', 'an icon of download', 'an icon of refresh',
+    'an icon of like', 'an icon of comment', 'an icon of favorite', 'an icon of user', 'an icon of message',
+    'an icon of camera', 'an icon of microphone', 'an icon of scan', 'an icon of filter', 'an icon of next',
+    'an icon of previous', 'an icon of volume', 'an icon of shopping cart', 'an icon of notification',
+    'an icon of location',
+)
+
+
+class IconClassifier:
+    """
+    基于 CLIP 图像嵌入的图标分类器，Florence-2 图标识别的快速替代
+
+    一次批量前向得到全部裁剪图的嵌入，与标签表中的嵌入做最近邻匹配。
+    标签表为本地 npz 文件(labels, embeddings)，每个标签可有多条嵌入(样本原型)，
+    可由微调数据集构建或追加，见 build_table。
+
+    置信度为各标签最大相似度按 CLIP logit_scale 做 softmax 后的最高概率，
+    低于阈值时由调用方回退到 Florence-2。
+    """
+
+    def __init__(self, model=None, preprocess=None):
+        """
+        Args:
+            model: 已加载的 CLIP 模型，为空时按配置加载，可与向量缓存共用同一模型
+            preprocess: CLIP 预处理函数
+        """
+        self.config = settings.icon_classifier_config
+        self.device = settings.device
+        if model is None:
+            logger.info(f"loading icon classifier model: {self.config.model_name}...")
+            model, preprocess = clip.load(self.config.model_name, device=self.device)
+        self.model = model.eval()
+        self.preprocess = preprocess
+        self.logit_scale = float(self.model.logit_scale.exp())
+
+        self.labels, self.embeddings = self._load_table(self.config.table_file)
+        # 标签下标 -> 嵌入行，用于按标签聚合最大相似度
+        self.label_names, self.label_index = np.unique(self.labels, return_inverse=True)
+        logger.info(f"icon classifier label table: {len(self.label_names)} labels, {len(self.labels)} embeddings")
+
+    def _load_table(self, table_file: Path) -> Tuple[np.ndarray, torch.Tensor]:
+        if table_file.exists():
+            table = np.load(table_file)
+            labels, embeddings = table['labels'], table['embeddings']
+        else:
+            logger.warning(f"icon label table not found from {table_file}, using default text labels")
+            labels = np.array(DEFAULT_LABELS)
+            embeddings = self.encode_texts(list(DEFAULT_LABELS))
+        return labels, torch.from_numpy(np.asarray(embeddings, dtype=np.float32)).to(self.device)
+
+    @torch.inference_mode()
+    def encode_images(self, images: List[Image.Image], batch_size: int = 64) -> np.ndarray:
+        """批量计算归一化的图像嵌入"""
+        features = []
+        for i in range(0, len(images), batch_size):
+            batch = torch.stack([self.preprocess(image) for image in images[i:i + batch_size]]).to(self.device)
+            features.append(self.model.encode_image(batch).float())
+        features = torch.cat(features) if features else torch.empty(0, self.model.visual.output_dim)
+        return torch.nn.functional.normalize(features, dim=-1).cpu().numpy()
+
+    @torch.inference_mode()
+    def encode_texts(self, texts: List[str]) -> np.ndarray:
+        """计算归一化的文本嵌入，用于无样本的标签"""
+        tokens = clip.tokenize(texts).to(self.device)
+        features = self.model.encode_text(tokens).float()
+        return torch.nn.functional.normalize(features, dim=-1).cpu().numpy()
+
+    @torch.inference_mode()
+    def predict(self, images: List[Image.Image], batch_size: int = 64) -> Tuple[List[str], List[float]]:
+        """
+        图标分类
+
+        Args:
+            images: 图标裁剪图
+            batch_size: 图像编码批大小
+
+        Returns:
+            (标签列表, 置信度列表)
+        """
+        if not images:
+            return [], []
+        features = torch.from_numpy(self.encode_images(images, batch_size)).to(self.device)
+        similarity = (features @ self.embeddings.T).cpu().numpy()
+        # 每个标签取其全部原型中的最大相似度
+        label_similarity = np.full((len(images), len(self.label_names)), -np.inf, dtype=np.float32)
+        np.maximum.at(label_similarity.T, self.label_index, similarity.T)
+        logits = label_similarity * self.logit_scale
+        probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+        probs /= probs.sum(axis=1, keepdims=True)
+        best = probs.argmax(axis=1)
+        return self.label_names[best].tolist(), probs[np.arange(len(images)), best].tolist()
+
+    def build_table(
+            self,
+            samples: Iterable[Tuple[Image.Image, str]],
+            table_file: Path | None = None,
+            append: bool = True,
+            batch_size: int = 64
+    ) -> int:
+        """
+        由(图标图片, 标签)样本构建标签表并保存
+
+        Args:
+            samples: 样本，标签即识别结果文本
+            table_file: 标签表文件，默认使用配置路径
+            append: 是否追加到已有标签表
+            batch_size: 图像编码批大小
+
+        Returns:
+            标签表中的嵌入条数
+        """
+        table_file = table_file or self.config.table_file
+        images, labels = [], []
+        for image, label in samples:
+            images.append(image)
+            labels.append(label)
+        embeddings = self.encode_images(images, batch_size)
+        labels = np.array(labels)
+        if append and table_file.exists():
+            table = np.load(table_file)
+            labels = np.concatenate([table['labels'], labels])
+            embeddings = np.concatenate([table['embeddings'], embeddings])
+        table_file.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(table_file, labels=labels, embeddings=embeddings.astype(np.float32))
+        return len(labels)
+
+    @staticmethod
+    def load_dataset(dataset_file: Path, min_loss_weight: float = 0) -> Iterable[Tuple[Image.Image, str]]:
+        """
+        读取 Florence-2 微调数据集(json 列表或 jsonl)，图片路径相对数据集文件所在目录
+
+        Args:
+            dataset_file: 数据集文件，每条包含 image、caption 字段
+            min_loss_weight: 只使用 loss_weight 不低于该值的样本，可用于只取业务核心图标
+        """
+        text = dataset_file.read_text(encoding='utf-8')
+        records = json.loads(text) if text.lstrip().startswith('[') else [
+            json.loads(line) for line in text.splitlines() if line.strip()
+        ]
+        for record in records:
+            if record.get('loss_weight', 1.0) < min_loss_weight:
+                continue
+            image_path = dataset_file.parent / record['image']
+            if not image_path.exists():
+                logger.warning(f"image not found: {image_path}")
+                continue
+            yield Image.open(image_path).convert('RGB'), record['caption']
+
+
+if __name__ == '__main__':
+    # 由微调数据集构建标签表: python -m model.icon_classifier --dataset data/train.json
+    parser = argparse.ArgumentParser(description='构建图标分类标签表')
+    parser.add_argument('--dataset', type=Path, required=True, help='Florence-2 微调数据集文件(json/jsonl)')
+    parser.add_argument('--table-file', type=Path, default=None, help='标签表文件，默认使用配置路径')
+    parser.add_argument('--min-loss-weight', type=float, default=0, help='只使用 loss_weight 不低于该值的样本')
+    parser.add_argument('--overwrite', action='store_true', help='覆盖已有标签表，默认追加')
+    args = parser.parse_args()
+
+    classifier = IconClassifier()
+    count = classifier.build_table(
+        IconClassifier.load_dataset(args.dataset, args.min_loss_weight),
+        table_file=args.table_file,
+        append=not args.overwrite
+    )
+    logger.info(f"label table saved, {count} embeddings")
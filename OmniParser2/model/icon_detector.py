@@ -4,6 +4,7 @@
 from pathlib import Path
 from typing import List, Tuple, Union, Optional
 
+import numpy as np
 import torch
 from PIL import Image
 from huggingface_hub import snapshot_download
@@ -11,6 +12,7 @@ from loguru import logger
 from ultralytics import YOLO
 
 from config import settings
+from model.letterbox import LetterboxInput
 
 
 class IconDetector:
@@ -51,19 +53,33 @@ class IconDetector:
         logger.info(f"loading icon detector model...")
         return YOLO(self.model_file)
 
+    @property
+    def imgsz(self) -> int:
+        """模型训练时的输入尺寸"""
+        imgsz = self.model.overrides.get('imgsz') or 640
+        return max(imgsz) if isinstance(imgsz, (list, tuple)) else int(imgsz)
+
+    @property
+    def stride(self) -> int:
+        """模型最大下采样步长"""
+        return max(int(self.model.model.stride.max()), 32)
+
     def predict(
             self,
-            image: Union[Image.Image, str],
+            image: Union[Image.Image, np.ndarray, str, LetterboxInput],
             conf: Optional[float] = settings.yolo_config.conf,
-            iou: Optional[float] = settings.yolo_config.iou
+            iou: Optional[float] = settings.yolo_config.iou,
+            imgsz: Optional[int] = None
     ) -> Tuple[torch.Tensor, torch.Tensor]:
         """
         执行图标检测
 
         Args:
-            image (Union[Image.Image, str]): 输入图像，可以是 PIL Image 对象或文件路径。
+            image (Union[Image.Image, np.ndarray, str, LetterboxInput]): 输入图像，可以是 PIL Image 对象、BGR ndarray、文件路径，
+                或与其他模型共享的预处理输入。
             conf (Optional[float]): 置信度阈值。默认使用配置值。
             iou (Optional[float]): NMS IOU 阈值。默认使用配置值。
+            imgsz (Optional[int]): 模型输入尺寸。默认使用模型训练尺寸，传入预处理输入时忽略。
 
         Returns:
             Tuple[torch.Tensor, torch.Tensor, List[str]]:
@@ -72,12 +88,14 @@ class IconDetector:
         """
 
         try:
-            # 实测发现不传imgsz效果更优，去除单独配置
+            # 实测发现不传imgsz效果更优，去除单独配置，仅在 fast 预设等需要降低输入尺寸时传入
+            extra = {'imgsz': imgsz} if imgsz and not isinstance(image, LetterboxInput) else {}
             results = self.model.predict(
-                source=image,
+                source=image.tensor if isinstance(image, LetterboxInput) else image,
                 conf=conf,
                 iou=iou,
-                verbose=False
+                verbose=False,
+                **extra
             )
 
             if not results:
@@ -90,9 +108,38 @@ class IconDetector:
             # ultralytics 的 boxes.xyxy 和 boxes.conf 可能是 GPU tensor
             boxes = result.boxes.xyxy.cpu()
             scores = result.boxes.conf.cpu()
+            if isinstance(image, LetterboxInput):
+                boxes = image.unmap_boxes(boxes)
 
             return boxes, scores
 
         except Exception as e:
             logger.error(f"YOLO推理出现异常: {e}")
             return torch.empty(0, 4), torch.empty(0)
+
+    def predict_batch(
+            self,
+            images: list[LetterboxInput],
+            conf: Optional[float] = settings.yolo_config.conf,
+            iou: Optional[float] = settings.yolo_config.iou,
+            batch_size: int = 16
+    ) -> List[Tuple[torch.Tensor, torch.Tensor]]:
+        """
+        批量图标检测，相同输入尺寸的图片拼批推理，结果顺序与输入一致
+
+        Args:
+            images: 预处理输入
+            conf: 置信度阈值
+            iou: NMS IOU 阈值
+            batch_size: 单次前向推理的最大图片数
+        """
+        outputs: List[Tuple[torch.Tensor, torch.Tensor]] = [(torch.empty(0, 4), torch.empty(0))] * len(images)
+        for indices, tensor in LetterboxInput.stack(images, batch_size):
+            try:
+                results = self.model.predict(source=tensor, conf=conf, iou=iou, verbose=False)
+            except Exception as e:
+                logger.error(f"YOLO批量推理出现异常: {e}")
+                continue
+            for i, result in zip(indices, results):
+                outputs[i] = images[i].unmap_boxes(result.boxes.xyxy.cpu()), result.boxes.conf.cpu()
+        return outputs
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/19 16:10
+import math
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+import torch
+
+from config import settings
+
+
+@dataclass
+class LetterboxInput:
+    """
+    YOLO 模型的预处理输入，图标检测与弹窗检测共享
+
+    与 ultralytics 单图推理的默认预处理一致：等比缩放长边至 imgsz，短边以灰色最小填充到 stride 的整数倍，
+    转换为 1x3xHxW、0~1 的 float 张量。直接传入张量时 ultralytics 跳过自身的预处理，
+    输出坐标为张量坐标，需要使用 unmap_boxes 映射回原图。
+    """
+    tensor: torch.Tensor  # 1x3xHxW RGB 0~1
+    ratio: float  # 原图到张量的缩放比例
+    pad: tuple[int, int]  # (left, top) 填充像素
+    image_size: tuple[int, int]  # 原图 (width, height)
+
+    @classmethod
+    def from_array(cls, image_np: np.ndarray, imgsz: int, stride: int = 32,
+                   device: str = settings.device) -> 'LetterboxInput':
+        """
+        Args:
+            image_np: HxWx3 RGB uint8 数组
+            imgsz: 模型输入尺寸，向上取整为 stride 的整数倍
+            stride: 模型最大下采样步长
+            device: 张量所在设备，两个模型共享同一份设备内存
+        """
+        imgsz = math.ceil(imgsz / stride) * stride
+        h, w = image_np.shape[:2]
+        ratio = min(imgsz / h, imgsz / w)
+        new_w, new_h = round(w * ratio), round(h * ratio)
+        # 最小填充，仅补齐到 stride 的整数倍
+        dw, dh = (imgsz - new_w) % stride / 2, (imgsz - new_h) % stride / 2
+
+        if (new_w, new_h) != (w, h):
+            image_np = cv2.resize(image_np, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+        top, bottom = round(dh - 0.1), round(dh + 0.1)
+        left, right = round(dw - 0.1), round(dw + 0.1)
+        image_np = cv2.copyMakeBorder(image_np, top, bottom, left, right, cv2.BORDER_CONSTANT,
+                                      value=(114, 114, 114))
+
+        tensor = torch.from_numpy(image_np).to(device).permute(2, 0, 1).unsqueeze(0).float().div_(255)
+        return cls(tensor=tensor.contiguous(), ratio=ratio, pad=(left, top), image_size=(w, h))
+
+    def unmap_boxes(self, boxes: torch.Tensor) -> torch.Tensor:
+        """将张量坐标 xyxy 映射回原图像素坐标"""
+        if boxes.shape[0] == 0:
+            return boxes
+        left, top = self.pad
+        w, h = self.image_size
+        boxes = (boxes - torch.tensor([left, top, left, top], dtype=boxes.dtype)) / self.ratio
+        boxes[:, 0::2] = boxes[:, 0::2].clamp(0, w)
+        boxes[:, 1::2] = boxes[:, 1::2].clamp(0, h)
+        return boxes
+
+    @staticmethod
+    def stack(inputs: list['LetterboxInput'], batch_size: int) -> list[tuple[list[int], torch.Tensor]]:
+        """
+        按张量尺寸分组拼批，同一分辨率的截图填充后尺寸相同，可一次前向推理
+
+        Returns:
+            [(批内各输入的下标, Bx3xHxW 张量)]
+        """
+        groups: dict[tuple[int, ...], list[int]] = {}
+        for i, item in enumerate(inputs):
+            groups.setdefault(tuple(item.tensor.shape), []).append(i)
+        return [
+            (indices[start:start + batch_size], torch.cat([inputs[i].tensor for i in indices[start:start + batch_size]]))
+            for indices in groups.values()
+            for start in range(0, len(indices), batch_size)
+        ]
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/19 14:05
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator
+
+import numpy as np
+from loguru import logger
+from paddleocr import PaddleOCR
+from paddlex.inference.pipelines.ocr.result import OCRResult
+
+
+class OCRPool:
+    """
+    PaddleOCR 实例池
+
+    PaddleOCR 实例非线程安全，每个实例同一时间只处理一张图片，
+    池大小为 1 时等价于全局锁；多个实例时可并行识别多张图片或同一张图片的多个分块。
+    """
+
+    def __init__(self, size: int = 1, **ocr_kwargs):
+        self.size = max(1, size)
+        self._idle: queue.Queue[PaddleOCR] = queue.Queue()
+        for i in range(self.size):
+            logger.info(f'loading OCR model {i + 1}/{self.size}...')
+            self._idle.put(PaddleOCR(**ocr_kwargs))
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix='ocr')
+
+    @contextmanager
+    def acquire(self) -> Iterator[PaddleOCR]:
+        """借用一个空闲的 OCR 实例，使用完后归还"""
+        ocr = self._idle.get()
+        try:
+            yield ocr
+        finally:
+            self._idle.put(ocr)
+
+    def predict(self, image: np.ndarray, **params) -> OCRResult:
+        with self.acquire() as ocr:
+            return ocr.predict(image, **params)[0]
+
+    def predict_many(self, images: list[np.ndarray], **params) -> list[OCRResult]:
+        """在实例池中并行识别多张图片，结果顺序与输入一致"""
+        if len(images) == 1:
+            return [self.predict(images[0], **params)]
+        return list(self._executor.map(lambda image: self.predict(image, **params), images))
+
+    def warmup(self, image: np.ndarray):
+        """每个实例各识别一次，触发推理引擎的延迟初始化"""
+        instances = [self._idle.get() for _ in range(self.size)]
+        try:
+            for ocr in instances:
+                ocr.predict(image)
+        finally:
+            for ocr in instances:
+                self._idle.put(ocr)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
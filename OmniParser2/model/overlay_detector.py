@@ -4,12 +4,14 @@
 
 from typing import Optional, Tuple, Union
 
+import numpy as np
 import torch
 from PIL import Image
 from loguru import logger
 from ultralytics import YOLO
 
 from config import settings
+from model.letterbox import LetterboxInput
 
 
 OVERLAY_CLASS_NAMES: dict[int, str] = {
@@ -50,19 +52,32 @@ class OverlayDetector:
         logger.info(f'loading overlay detector model from {self.model_file}...')
         return YOLO(self.model_file)
 
+    @property
+    def imgsz(self) -> int:
+        """模型训练时的输入尺寸"""
+        imgsz = self.model.overrides.get('imgsz') or 640
+        return max(imgsz) if isinstance(imgsz, (list, tuple)) else int(imgsz)
+
+    @property
+    def stride(self) -> int:
+        """模型最大下采样步长"""
+        return max(int(self.model.model.stride.max()), 32)
+
     def predict(
             self,
-            image: Union[Image.Image, str],
+            image: Union[Image.Image, np.ndarray, str, LetterboxInput],
             conf: Optional[float] = None,
             iou: Optional[float] = None,
+            imgsz: Optional[int] = None,
     ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
         """
         执行弹窗/加载中检测。
 
         Args:
-            image: 输入图像，可以是 PIL Image 对象或文件路径。
+            image: 输入图像，可以是 PIL Image 对象、BGR ndarray、文件路径，或与其他模型共享的预处理输入。
             conf: 置信度阈值，默认使用配置值。
             iou: NMS IoU 阈值，默认使用配置值。
+            imgsz: 模型输入尺寸，默认使用模型训练尺寸。
 
         Returns:
             Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
@@ -74,11 +89,13 @@ class OverlayDetector:
         iou = iou if iou is not None else settings.overlay_yolo_config.iou
 
         try:
+            extra = {'imgsz': imgsz} if imgsz and not isinstance(image, LetterboxInput) else {}
             results = self.model.predict(
-                source=image,
+                source=image.tensor if isinstance(image, LetterboxInput) else image,
                 conf=conf,
                 iou=iou,
                 verbose=False,
+                **extra,
             )
 
             if not results:
@@ -89,9 +106,34 @@ class OverlayDetector:
             boxes = result.boxes.xyxy.cpu()
             scores = result.boxes.conf.cpu()
             classes = result.boxes.cls.cpu().long()
+            if isinstance(image, LetterboxInput):
+                boxes = image.unmap_boxes(boxes)
 
             return boxes, scores, classes
 
         except Exception as e:
             logger.error(f'overlay YOLO 推理出现异常: {e}')
             return torch.empty(0, 4), torch.empty(0), torch.empty(0, dtype=torch.long)
+
+    def predict_batch(
+            self,
+            images: list[LetterboxInput],
+            conf: Optional[float] = None,
+            iou: Optional[float] = None,
+            batch_size: int = 16
+    ) -> list[Tuple[torch.Tensor, torch.Tensor, torch.Tensor]]:
+        """批量弹窗/加载中检测，相同输入尺寸的图片拼批推理，结果顺序与输入一致"""
+        conf = conf if conf is not None else settings.overlay_yolo_config.conf
+        iou = iou if iou is not None else settings.overlay_yolo_config.iou
+        empty = (torch.empty(0, 4), torch.empty(0), torch.empty(0, dtype=torch.long))
+        outputs = [empty] * len(images)
+        for indices, tensor in LetterboxInput.stack(images, batch_size):
+            try:
+                results = self.model.predict(source=tensor, conf=conf, iou=iou, verbose=False)
+            except Exception as e:
+                logger.error(f'overlay YOLO 批量推理出现异常: {e}')
+                continue
+            for i, result in zip(indices, results):
+                outputs[i] = (images[i].unmap_boxes(result.boxes.xyxy.cpu()), result.boxes.conf.cpu(),
+                              result.boxes.cls.cpu().long())
+        return outputs
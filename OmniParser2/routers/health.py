@@ -6,7 +6,11 @@
 from datetime import datetime
 
 from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
 
+from core.readiness import readiness
+from routers import omni
+from routers.omni.deps import pipeline
 from util.response import Response
 
 router = APIRouter()
@@ -14,5 +18,16 @@ router = APIRouter()
 
 @router.get("", summary="健康检查", status_code=status.HTTP_200_OK)
 async def health_check():
-    """健康检查"""
-    return Response(data={"status": "ok", 'datetime': f'{datetime.now():%Y-%m-%d %T}'})
+    """健康检查，模型加载与预热完成前或有组件失效时返回 503，data 中包含各组件的加载、预热耗时、流水线各阶段的排队指标、解析进程状态与缓存查询、写入指标"""
+    data = {**readiness.to_dict(), 'pipeline': pipeline.snapshot(), 'datetime': f'{datetime.now():%Y-%m-%d %T}'}
+    if omni.storage is not None:
+        data['cache_lookup'] = omni.storage.lookup_metrics.snapshot()
+    if omni.bundle is not None:
+        data['cache_bundle'] = omni.bundle.snapshot()
+    if omni.store_buffer is not None:
+        data['cache_writer'] = omni.store_buffer.snapshot()
+    if omni.worker_pool is not None:
+        data['parse_workers'] = omni.worker_pool.snapshot()
+    if not readiness.ready or readiness.failed:
+        return JSONResponse(Response(code=503, data=data).model_dump(), status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return Response(data=data)
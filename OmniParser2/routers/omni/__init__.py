@@ -4,59 +4,224 @@
 # @Email : aidenmo@tencent.com
 # @Time : 2025/6/15 17:22
 import asyncio
+import functools
+import hashlib
+import os
+import signal
+import threading
+import time
+import uuid
 from asyncio import Queue
 from contextlib import asynccontextmanager
-from io import BytesIO
-from typing import Annotated
+from dataclasses import dataclass
+from typing import Annotated, Callable
+
+import numpy as np
 
 from PIL import Image, ImageDraw
-from fastapi import APIRouter, Depends, FastAPI, BackgroundTasks
+from fastapi import APIRouter, Depends, FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from loguru import logger
-from paddleocr import PaddleOCR
+from pydantic import ValidationError
 
 from config import settings
+from core import Element
+from core.batch import build_parser, create_ocr, dispatch_parse
+from core.columns import ElementColumns, NEIGHBOR_FIELDS
 from core.handler import BoxesHandler
+from core.lazy_caption import LazyCaptionHandler
 from core.parse import OmniParser, ParsedResult
-from schemas.omni import ParsedResponse
+from core.readiness import readiness
+from core.worker import ParseWorkerPool
+from schemas.omni import ParsedResponse, RelationsParams, RelationsResponse, CaptionParams, CaptionResponse
 from model.icon_captioner import IconCaptioner
+from model.icon_classifier import IconClassifier
 from model.icon_detector import IconDetector
+from model.letterbox import LetterboxInput
+from model.ocr_pool import OCRPool
 from model.overlay_detector import OverlayDetector
-from util.context import Context
-from util.image_vector_storage import AsyncImageVectorStorage
+from util import frame_protocol
+from util.cache_bundle import CacheBundle
+from util.context import Context, context_var, trace_id_var
+from util.cos import download_file
+from util.frame_protocol import Frame, FrameServer
+from util.image import ImageSource
+from util.image_vector_storage import AsyncImageVectorStorage, CacheEntry
+from util.perceptual_hash import dhash, thumbnail
 from util.response import Response
-from .deps import RequestParams, idle_queue, get_context, get_queue, get_params
+from util.single_flight import SingleFlight
+from util.write_behind import WriteBehindBuffer
+from .deps import RequestParams, idle_queue, idle_slot, pipeline, run_stage, get_context, get_queue, get_params, \
+    require_ready, start_upload
 
 # 全局变量定义
-ocr: PaddleOCR | None = None
+ocr: OCRPool | None = None
+mobile_ocr: OCRPool | None = None
 icon_detector: IconDetector | None = None
 icon_captioner: IconCaptioner | None = None
+icon_classifier: IconClassifier | None = None
 overlay_detector: OverlayDetector | None = None
 storage: AsyncImageVectorStorage | None = None
+bundle: CacheBundle | None = None
+store_buffer: WriteBehindBuffer[CacheEntry] | None = None
+worker_pool: ParseWorkerPool | None = None
+frame_server: FrameServer | None = None
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    global ocr, icon_detector, icon_captioner, overlay_detector, storage
-    # 在应用启动时初始化模型，避免多进程重复初始化
-    logger.info('Initializing models...')
-    ocr = PaddleOCR(**settings.ocr_config.model_dump())
-    icon_detector = IconDetector()
-    icon_captioner = IconCaptioner()
-    overlay_detector = OverlayDetector()
-    logger.info('Models initialized.')
-    # 启动时加载向量数据库客户端
+mobile_ocr_lock = threading.Lock()
+
+
+def get_ocr(engine: str) -> OCRPool:
+    """获取 OCR 实例，mobile 模型按需加载"""
+    global mobile_ocr
+    if engine != 'mobile':
+        return ocr
+    with mobile_ocr_lock:
+        if mobile_ocr is None:
+            logger.info('Initializing mobile OCR models...')
+            mobile_ocr = create_ocr(mobile=True)
+    return mobile_ocr
+
+
+def model_warmups() -> dict[str, Callable[[], None]]:
+    """各模型的预热推理，使用空白图片触发算子选择、显存分配、分词器初始化等延迟初始化"""
+    blank = np.full((640, 640, 3), 255, dtype=np.uint8)
+    icon = Image.new('RGB', (64, 64), 'white')
+    warmups = {
+        'ocr': lambda: ocr.warmup(blank),
+        'icon_detector': lambda: icon_detector.predict(
+            LetterboxInput.from_array(blank, icon_detector.imgsz, icon_detector.stride)),
+        'overlay_detector': lambda: overlay_detector.predict(
+            LetterboxInput.from_array(blank, overlay_detector.imgsz, overlay_detector.stride)),
+        'icon_captioner': lambda: icon_captioner.predict([icon]),
+    }
+    if icon_classifier is not None:
+        warmups['icon_classifier'] = lambda: icon_classifier.predict([icon])
+    if mobile_ocr is not None:
+        warmups['mobile_ocr'] = lambda: mobile_ocr.warmup(blank)
+    return warmups
+
+
+def warmup_models():
+    for warmup in model_warmups().values():
+        warmup()
+
+
+def exit_on_init_failure(task: asyncio.Task):
+    """组件加载或预热失败时结束进程交由进程管理器重启，避免进程存活而 /health 一直返回 503"""
+    if task.cancelled() or task.exception() is None:
+        return
+    logger.opt(exception=task.exception()).critical('init components failed, shutting down')
+    # 与收到终止信号相同，uvicorn 正常关闭并执行 lifespan 的清理
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+async def init_components():
+    """并行加载模型与向量数据库，预热后标记服务就绪"""
+    global ocr, icon_detector, icon_captioner, icon_classifier, overlay_detector, storage, bundle, store_buffer, \
+        worker_pool
+    loaders = {
+        'ocr': create_ocr,
+        'icon_detector': IconDetector,
+        'icon_captioner': IconCaptioner,
+        'overlay_detector': OverlayDetector,
+    }
+    if settings.icon_classifier_config.enable:
+        loaders['icon_classifier'] = IconClassifier
+    if settings.mobile_ocr_config.preload:
+        loaders['mobile_ocr'] = lambda: get_ocr('mobile')
     if settings.milvus_config.enable:
-        storage = await AsyncImageVectorStorage.create_instance(
+        # 启动时加载向量数据库客户端
+        loaders['milvus'] = functools.partial(
+            AsyncImageVectorStorage.create_instance,
             host=settings.milvus_config.host,
             port=settings.milvus_config.port,
+            collection_name=settings.milvus_config.collection_name,
+        )
+    if settings.cache_bundle_config.path:
+        loaders['cache_bundle'] = functools.partial(
+            CacheBundle,
+            settings.cache_bundle_config.path,
+            hit_distance=settings.cache_bundle_config.hit_distance,
+            thumb_threshold=settings.cache_bundle_config.thumb_threshold,
+        )
+    readiness.register(*loaders)
+
+    logger.info('Initializing models...')
+    components = dict(zip(loaders, await asyncio.gather(
+        *(readiness.load(name, loader) for name, loader in loaders.items())
+    )))
+    ocr = components['ocr']
+    icon_detector = components['icon_detector']
+    icon_captioner = components['icon_captioner']
+    overlay_detector = components['overlay_detector']
+    icon_classifier = components.get('icon_classifier')
+    storage = components.get('milvus')
+    bundle = components.get('cache_bundle')
+    if storage is not None:
+        # 解析结果攒批写入向量数据库
+        store_buffer = WriteBehindBuffer(
+            functools.partial(storage.store_many, check_exist=settings.milvus_config.dedupe_on_write),
+            batch_size=settings.milvus_config.write_batch_size,
+            flush_interval=settings.milvus_config.write_flush_interval,
+            max_pending=settings.milvus_config.write_max_pending,
+            name='cache writer',
         )
+        store_buffer.start()
+    logger.info('Models initialized.')
+
+    if settings.worker_config.processes > 0 and settings.device != 'cpu':
+        logger.warning('parse workers only support cpu inference (CUDA cannot be forked), parse in process')
+    elif settings.worker_config.processes > 0:
+        # 模型加载完成、首次推理之前 fork 出孵化进程，解析进程均由其 fork，共享模型权重，各自预热
+        worker_pool = ParseWorkerPool(settings.worker_config.processes, create_parser,
+                                      settings.worker_config.torch_threads, warmup=warmup_models,
+                                      max_failures=settings.worker_config.max_failures,
+                                      on_failure=functools.partial(readiness.fail, 'parse_workers'))
+        worker_pool.start()
+        await readiness.warmup('parse_workers', worker_pool.wait_ready)
+    # 主进程中的模型同样预热：按需图标识别在主进程执行，解析进程模式下主进程只预热图标识别
+    warmups = model_warmups()
+    if worker_pool:
+        warmups = {name: warmups[name] for name in ('icon_captioner', 'icon_classifier') if name in warmups}
+    if storage is not None:
+        # 缓存查询使用的 CLIP 模型
+        warmups['milvus'] = lambda: storage._image_to_vector(Image.new('RGB', (64, 64), 'white'))
+    await asyncio.gather(*(readiness.warmup(name, warmup) for name, warmup in warmups.items()))
 
-    for _ in range(settings.max_concurrency):
+    # 并发名额不少于解析进程数，保证每个解析进程都能分到任务
+    for _ in range(max(settings.max_concurrency, worker_pool.processes if worker_pool else 0)):
         idle_queue.put_nowait(True)
+    readiness.mark_ready()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 在应用启动时初始化模型，避免多进程重复初始化；后台加载，服务先启动以便 /health 报告加载进度
+    global frame_server
+    init_task = asyncio.create_task(init_components())
+    init_task.add_done_callback(exit_on_init_failure)
+    if settings.frame_socket_config.path:
+        # 同机部署的 agent 通过 Unix socket 发送图片帧，服务就绪前同样返回 503
+        frame_server = FrameServer(settings.frame_socket_config.path, handle_frame,
+                                   max_bytes=settings.frame_socket_config.max_bytes)
+        await frame_server.start()
     try:
         yield
     finally:
-        await storage.close()
+        init_task.cancel()
+        if frame_server is not None:
+            await frame_server.close()
+        if worker_pool:
+            worker_pool.close()
+        pipeline.close()
+        if store_buffer is not None:
+            # 写入缓冲中剩余的解析结果
+            await store_buffer.close()
+        if storage is not None:
+            await storage.close()
+        if bundle is not None:
+            bundle.close()
 
 
 router = APIRouter(lifespan=lifespan)
@@ -64,9 +229,9 @@ router = APIRouter(lifespan=lifespan)
 
 async def visualize(image: Image.Image, annotated_merge_image: Image.Image, parsed_result: ParsedResult):
     annotated_icon_image = await asyncio.to_thread(
-        BoxesHandler.annotate, image=image, elements=parsed_result.icon_elements, visualize=True)
+        BoxesHandler.annotate, image=image, elements=parsed_result.icon_columns, visualize=True)
     annotated_ocr_image = await asyncio.to_thread(
-        BoxesHandler.annotate, image=image, elements=parsed_result.ocr_elements, visualize=True
+        BoxesHandler.annotate, image=image, elements=parsed_result.ocr_columns, visualize=True
     )
     all_images = [annotated_icon_image, annotated_ocr_image, annotated_merge_image]
     total_width = sum([image.width for image in all_images])
@@ -87,10 +252,29 @@ async def visualize(image: Image.Image, annotated_merge_image: Image.Image, pars
     return new_image
 
 
+def use_cache(params: RequestParams) -> bool:
+    # 区域解析只包含部分元素，不读写整图缓存
+    return ((settings.milvus_config.enable or bool(settings.cache_bundle_config.path))
+            and params.img_cache.store and not params.rois)
+
+
+def use_store(params: RequestParams) -> bool:
+    # 缓存按预设区分，单独修改了解析参数(跳过图标识别、关闭弹窗检测、切换 OCR 模型等)的结果与预设不一致，只读取缓存不写入
+    # lazy 解析的图标内容为空，同样不写入，避免为写入缓存在后台识别全部图标
+    return use_cache(params) and params.uses_preset_defaults()
+
+
 async def get_cache_data(params: RequestParams, context: Context):
-    if settings.milvus_config.enable and params.img_cache.store:
+    if use_cache(params):
+        cached_data = None
         with context.timer_recorder.timer('图片缓存查询'):
-            cached_data = await storage.query(context.image_buffer, days_filter=params.img_cache.within_days)
+            if bundle is not None:
+                # 离线包只读内存映射，命中时不再查询向量数据库
+                cached_data = await asyncio.to_thread(
+                    lambda: bundle.lookup(dhash(context.image), thumbnail(context.image), params.preset))
+            if cached_data is None and storage is not None:
+                cached_data = await storage.query(context.image, days_filter=params.img_cache.within_days,
+                                                  preset=params.preset)
         # 如果图片已存在，直接返回缓存的结果
         if cached_data:
             logger.info(f'图片已存在，直接返回缓存的结果...')
@@ -100,57 +284,105 @@ async def get_cache_data(params: RequestParams, context: Context):
     return None
 
 
-async def store_data(
-        image: BytesIO,
+def store_data(
+        image: Image.Image,
         params: RequestParams,
         parsed_result: ParsedResult,
         labeled_image_url: str,
         image_url: str
 ):
-    if settings.milvus_config.enable and params.img_cache.store:
-        await storage.store(
-            image,
-            [element.model_dump() for element in parsed_result.elements],
-            labeled_image_url,
+    """放入写回缓冲，由后台批量写入，缓冲已满时丢弃"""
+    # 加载中/空白页不缓存，避免后续相同截图直接命中加载态结果
+    if use_store(params) and not parsed_result.is_loading and store_buffer is not None:
+        store_buffer.put(CacheEntry(
+            image=image,
+            elements=parsed_result.elements,
+            labeled_url=labeled_image_url,
             key=params.key,
-            check_exist=False,
-            image_url=image_url)
+            image_url=image_url,
+            preset=params.preset,
+        ))
 
 
-@router.post("/parse/")
-async def parse(
-        params: Annotated[RequestParams, Depends(get_params)],
-        context: Annotated[Context, Depends(get_context)],
-        _: Annotated[Queue, Depends(get_queue)],
-        background_tasks: BackgroundTasks
-):
-    logger.info(f'params: {params.model_dump_json(exclude_defaults=True)}')
-    cached_data = await get_cache_data(params, context)
-    if cached_data:
-        image_url = await context.image_upload_task
-        return ParsedResponse(
-            parsed_content_list=cached_data["elements"],
-            labeled_image_url=cached_data["labeled_url"],
-            image_url=image_url,
-            timer=context.timer_recorder
-        )
+def format_response(
+        params: RequestParams,
+        response: ParsedResponse,
+        columns: ElementColumns | None = None
+) -> ParsedResponse | ORJSONResponse:
+    """
+    按请求的返回格式与字段输出解析结果
+
+    columnar 格式由 orjson 直接序列化 NumPy 列，不经过 pydantic 校验与逐元素字典构建
+
+    Args:
+        params: 请求参数
+        response: 解析结果
+        columns: 列式元素，为空时由 response.parsed_content_list 构建(如缓存数据)
+    """
+    if params.response_format == 'columnar':
+        if columns is None:
+            columns = ElementColumns.from_elements(response.parsed_content_list)
+        content = response.model_dump(exclude={'parsed_content_list', 'parsed_content_columns'})
+        content['parsed_content_list'] = []
+        content['parsed_content_columns'] = columns.to_columnar(params.fields)
+        return ORJSONResponse(content)
+
+    if params.fields:
+        fields = {'id', *params.fields}
+        response.parsed_content_list = [
+            el.model_dump(include=fields) if isinstance(el, Element)
+            else {name: value for name, value in el.items() if name in fields}
+            for el in response.parsed_content_list
+        ]
+    return response
 
-    omni = OmniParser(
-        image=context.image,
-        ocr=ocr,
-        ocr_params=params.ocr,
+
+@dataclass
+class ParseOutcome:
+    """一次完整解析的结果，相同请求并发时共享"""
+    parsed_result: ParsedResult
+    labeled_image_url: str
+    visualize_image_url: str | None = None
+    parse_id: str | None = None
+
+
+# 相同图片与参数的并发解析只执行一次
+parse_flight: SingleFlight[ParseOutcome] = SingleFlight()
+
+
+def parse_flight_key(params: RequestParams, context: Context) -> tuple[str, str]:
+    """图片内容哈希 + 影响解析结果的参数，key、返回格式与字段不影响解析结果"""
+    content_hash = hashlib.blake2b(context.source.raw, digest_size=16).hexdigest()
+    return content_hash, params.model_dump_json(exclude={'key', 'response_format', 'fields'})
+
+
+def create_parser(source: ImageSource, params: RequestParams) -> OmniParser:
+    """按请求参数构建解析器，解析进程中同样使用"""
+    return build_parser(
+        source,
+        params,
+        ocr=get_ocr(params.ocr.engine),
         icon_detector=icon_detector,
-        icon_detect_params=params.icon_detect,
         icon_captioner=icon_captioner,
-        icon_caption_params=params.icon_caption,
+        icon_classifier=icon_classifier,
         overlay_detector=overlay_detector,
-        overlay_detect_params=params.overlay_detect,
-        overlap_iou_threshold=settings.overlap_iou_threshold,
-        device=settings.device,
     )
-    parsed_result: ParsedResult = await asyncio.to_thread(omni.parse)
-    annotated_image = await asyncio.to_thread(BoxesHandler.annotate, image=context.image,
-                                              elements=parsed_result.elements, visualize=params.visualize)
+
+
+async def run_parse(params: RequestParams, context: Context) -> ParseOutcome:
+    async with idle_slot():
+        parsed_result = await dispatch_parse(
+            context.source, params, create_parser, worker_pool,
+            scheduler=pipeline if settings.pipeline_config.enable else None,
+            job_timeout=settings.worker_config.job_timeout,
+        )
+    parse_id = None
+    if params.icon_caption.mode == 'lazy':
+        with context.timer_recorder.timer('登记待识别icon'):
+            parse_id = await asyncio.to_thread(
+                LazyCaptionHandler.create_session, context.source, parsed_result.columns, params.icon_caption)
+    annotated_image = await run_stage('annotate', BoxesHandler.annotate, image=context.image,
+                                      elements=parsed_result.columns, visualize=params.visualize)
     labeled_image_url = await settings.storage_client.async_upload_file(annotated_image, prefix=settings.storage_prefix)
     visualize_image_url = None
     if params.visualize:
@@ -158,16 +390,42 @@ async def parse(
             visualize_image = await visualize(context.image, annotated_image, parsed_result)
         visualize_image_url = await settings.storage_client.async_upload_file(visualize_image,
                                                                               prefix=settings.storage_prefix)
+    return ParseOutcome(parsed_result, labeled_image_url, visualize_image_url, parse_id)
+
+
+async def parse_image(params: RequestParams, context: Context) -> tuple[ParsedResponse, ElementColumns | None]:
+    """
+    查询缓存或解析图片，HTTP 接口与 Unix socket 帧协议共用
+
+    Returns:
+        (解析结果, 列式元素)，命中缓存时列式元素为 None
+    """
+    logger.info(f'params: {params.model_dump_json(exclude_defaults=True)}')
+    cached_data = await get_cache_data(params, context)
+    if cached_data:
+        image_url = await context.image_upload_task
+        return ParsedResponse(
+            parsed_content_list=cached_data["elements"],
+            labeled_image_url=cached_data["labeled_url"],
+            image_url=image_url,
+            timer=context.timer_recorder
+        ), None
+
+    # 并发名额在实际解析时才占用，等待相同请求结果的请求不占用名额
+    outcome, shared = await parse_flight.do(parse_flight_key(params, context), lambda: run_parse(params, context))
+    parsed_result = outcome.parsed_result
+    if shared:
+        logger.info(f'相同请求正在解析，共享解析结果: {outcome.labeled_image_url}')
     image_url = await context.image_upload_task
-    # 后台存储数据，不阻塞接口响应
-    background_tasks.add_task(
-        store_data,
-        BytesIO(context.image_buffer.getvalue()),  # copy image buffer, avoid being closed
-        params,
-        parsed_result,
-        labeled_image_url,
-        image_url
-    )
+    if not shared:
+        # 放入写回缓冲后台批量存储，不阻塞接口响应；共享结果已由首个请求存储
+        store_data(
+            context.image,  # 复用已解码的图像，不再拷贝原始字节重新解码
+            params,
+            parsed_result,
+            outcome.labeled_image_url,
+            image_url
+        )
     # return Response(data=ParsedResponse(
     #     parsed_content_list=parsed_result.elements,
     #     labeled_image_url=labeled_image_url,
@@ -176,10 +434,114 @@ async def parse(
     #     timer=context.timer_recorder
     # ))
     # TODO: 先兼容老版本格式，后面统一用上面新的数据格式
+    columnar = params.response_format == 'columnar'
     return ParsedResponse(
-        parsed_content_list=parsed_result.elements,
-        labeled_image_url=labeled_image_url,
+        parsed_content_list=[] if columnar else parsed_result.elements,
+        labeled_image_url=outcome.labeled_image_url,
         image_url=image_url,
-        visualize=visualize_image_url,
+        visualize=outcome.visualize_image_url,
+        is_loading=parsed_result.is_loading,
+        parse_id=outcome.parse_id,
         timer=context.timer_recorder
-    )
+    ), parsed_result.columns
+
+
+@router.post("/parse/", dependencies=[Depends(require_ready)])
+async def parse(
+        params: Annotated[RequestParams, Depends(get_params)],
+        context: Annotated[Context, Depends(get_context)]
+):
+    return format_response(params, *await parse_image(params, context))
+
+
+@router.post("/caption/", dependencies=[Depends(require_ready)])
+async def caption(
+        params: CaptionParams,
+        _: Annotated[Queue, Depends(get_queue)]
+) -> Response[CaptionResponse]:
+    """按需识别 lazy 解析结果中的图标，同一 parse_id 内已识别的图标不重复识别"""
+    return Response(data=await caption_icons(params))
+
+
+async def caption_icons(params: CaptionParams) -> CaptionResponse:
+    captions = await run_stage(
+        'caption', LazyCaptionHandler.caption, params.parse_id, params.ids, icon_captioner, icon_classifier, params.batch_size)
+    if captions is None:
+        raise HTTPException(status_code=404, detail=f'parse_id not found or expired: {params.parse_id}')
+    return CaptionResponse(parse_id=params.parse_id, captions=captions)
+
+
+@router.post("/relations/")
+async def relations(params: RelationsParams) -> Response[RelationsResponse]:
+    """
+    按需计算元素空间关系，无状态，不重新解析图片
+
+    配合 /omni/parse/ 的 spatial_relations=False 使用，仅为需要的元素计算上下左右元素 id
+    """
+    bbox = np.asarray(params.bboxes, dtype=np.float64).reshape(-1, 4)
+    ids = list(range(len(bbox))) if params.ids is None else params.ids
+    if any(not 0 <= i < len(bbox) for i in ids):
+        raise HTTPException(status_code=400, detail=f'ids out of range [0, {len(bbox)})')
+
+    order, row_starts = BoxesHandler.group_rows(bbox)
+    # 排序后下标与请求下标互相映射
+    position = np.empty_like(order)
+    position[order] = np.arange(len(order))
+    result = BoxesHandler.spatial_relations(bbox[order], row_starts, position[ids].tolist())
+    order_list, position_list = order.tolist(), position.tolist()
+    return Response(data=RelationsResponse(elements=[
+        {'id': i, **{name: [order_list[k] for k in result[name][position_list[i]]] for name in NEIGHBOR_FIELDS}}
+        for i in ids
+    ]))
+
+
+async def handle_frame(frame: Frame) -> tuple[int, dict, bytes]:
+    """Unix socket 帧协议请求，与 HTTP 接口共用解析与图标识别流程，错误以 HTTP 状态码返回"""
+    trace_id = frame.meta.get('trace_id') or str(uuid.uuid4())
+    trace_id_var.set(trace_id)
+    with logger.contextualize(trace_id=trace_id):
+        st = time.perf_counter()
+        try:
+            if frame.type == frame_protocol.PARSE:
+                return await parse_frame(frame)
+            if frame.type == frame_protocol.CAPTION:
+                async with idle_slot():
+                    response = await caption_icons(CaptionParams.model_validate(frame.meta))
+                return 200, response.model_dump(mode='json'), b''
+            return 400, {'msg': f'unknown message type: {frame.type}'}, b''
+        except HTTPException as e:
+            return e.status_code, {'msg': e.detail}, b''
+        except ValidationError as e:
+            return 422, {'msg': '请求参数验证失败', 'errors': e.errors(include_url=False, include_context=False)}, b''
+        except Exception as e:
+            logger.exception(f'frame request failed: {e}')
+            return 500, {'msg': f'处理异常:{e}'}, b''
+        finally:
+            logger.info(f'Frame request elapsed time: {time.perf_counter() - st}s')
+
+
+async def parse_frame(frame: Frame) -> tuple[int, dict, bytes]:
+    """解析图片帧，元素以二进制列式返回，其余字段与 HTTP 接口一致"""
+    await require_ready()
+    params = RequestParams.model_validate(frame.meta.get('params') or {})
+    name = frame.meta.get('name') or 'frame.png'
+    if frame.body and frame.image_format == frame_protocol.RAW:
+        source = await run_stage('decode', ImageSource.from_pixels, frame.body, frame.width, frame.height,
+                                 frame.channels, name)
+    elif frame.body:
+        source = await run_stage('decode', ImageSource.decode, frame.body, name)
+    elif frame.meta.get('image_url'):
+        raw = await download_file(frame.meta['image_url'])
+        source = await run_stage('decode', ImageSource.decode, raw, name)
+    else:
+        raise HTTPException(status_code=400, detail="image or image_url is required")
+    context = Context(source=source, image_upload_task=start_upload(source))
+    context_var.set(context)
+
+    response, columns = await parse_image(params, context)
+    if columns is None:
+        columns = ElementColumns.from_elements(response.parsed_content_list)
+    columns_meta, body = await asyncio.to_thread(
+        lambda: frame_protocol.encode_columns(columns.to_columnar(params.fields)))
+    meta = response.model_dump(mode='json', exclude={'parsed_content_list', 'parsed_content_columns'})
+    return 200, {**meta, 'columns': columns_meta}, body
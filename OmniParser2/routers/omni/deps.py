@@ -5,35 +5,107 @@
 # @Time : 2025/7/7 18:10
 
 import asyncio
-import io
+import functools
 from asyncio import Queue
-from io import BytesIO
-from typing import Annotated, AsyncGenerator
+from contextlib import asynccontextmanager
+from typing import Annotated, AsyncGenerator, Callable, Literal, TypeVar
 
-from PIL import Image
 from fastapi import Depends, UploadFile, File, HTTPException, Form
 from fastapi.exceptions import RequestValidationError
 from loguru import logger
-from pydantic import BaseModel, HttpUrl, Field, ValidationError
+from pydantic import BaseModel, HttpUrl, Field, ValidationError, model_validator, field_validator
 
 from config import settings
-from schemas.omni import ImgCacheParams, OCRParams, IconDetectParams, IconCaptionParams, OverlayDetectParams
+from core.pipeline import PipelineScheduler
+from core.readiness import readiness
+from schemas.omni import ImgCacheParams, OCRParams, IconDetectParams, IconCaptionParams, OverlayDetectParams, \
+    LoadingCheckParams, PresetType, PRESETS, ElementField
 from util import format_bytes
 from util.context import Context, context_var
+from util.image import ImageSource
 from util.cos import download_file
 
+T = TypeVar('T')
+
 idle_queue = Queue()
 
 
+def create_pipeline() -> PipelineScheduler:
+    """按配置创建分阶段流水线调度"""
+    return PipelineScheduler(
+        {**settings.pipeline_config.stages,
+         'ocr': settings.pipeline_config.stages.get('ocr') or settings.ocr_config.pool_size},
+        queue_size=settings.pipeline_config.queue_size,
+    )
+
+
+# 跨请求共享的分阶段线程池
+pipeline = create_pipeline()
+
+
 class RequestParams(BaseModel):
     key: str = Field('', description="访问密钥")
+    preset: PresetType = Field(default='balanced', description="速度/精度预设：fast、balanced、accurate")
     img_cache: ImgCacheParams = Field(default_factory=ImgCacheParams, description="图片缓存参数")
     ocr: OCRParams = Field(default_factory=OCRParams, description="OCR 参数")
     icon_detect: IconDetectParams = Field(default_factory=IconDetectParams, description="图标检测参数")
     icon_caption: IconCaptionParams = Field(default_factory=IconCaptionParams, description="图标识别参数")
     overlay_detect: OverlayDetectParams = Field(default_factory=OverlayDetectParams, description="弹窗/加载中检测参数")
+    loading_check: LoadingCheckParams = Field(default_factory=LoadingCheckParams, description="加载中/空白页快速检测参数")
     overlap_iou_threshold: float = Field(default=settings.overlap_iou_threshold, description="图标重叠IoU阈值")
     visualize: bool = Field(default=False, description="是否可视化识别结果")
+    response_format: Literal['elements', 'columnar'] = Field(
+        default='elements', description="返回格式：elements 为元素对象列表，columnar 为各字段等长数组的紧凑列式结构")
+    fields: list[ElementField] | None = Field(default=None, description="返回的元素字段，为空时返回全部字段，id 总是返回")
+    spatial_relations: bool = Field(
+        default=True, description="是否计算元素空间关系(上下左右元素 id)，关闭时仅按阅读顺序排序，可按需调用 /omni/relations/ 计算")
+    rois: list[tuple[float, float, float, float]] | None = Field(
+        default=None, description="感兴趣区域列表 [x1, y1, x2, y2] (归一化坐标)，仅解析这些区域")
+
+    @field_validator('rois')
+    @classmethod
+    def check_rois(cls, rois: list[tuple[float, float, float, float]] | None):
+        for x1, y1, x2, y2 in rois or []:
+            if not (0 <= x1 < x2 <= 1 and 0 <= y1 < y2 <= 1):
+                raise ValueError(f'无效的感兴趣区域: {[x1, y1, x2, y2]}，需满足 0 <= x1 < x2 <= 1, 0 <= y1 < y2 <= 1')
+        return rois
+
+    @model_validator(mode='after')
+    def apply_preset(self) -> 'RequestParams':
+        """按预设填充参数，请求中显式传入的参数优先"""
+        for section, overrides in PRESETS[self.preset].items():
+            section_params: BaseModel = getattr(self, section)
+            for name, value in overrides.items():
+                if name not in section_params.model_fields_set:
+                    setattr(section_params, name, value)
+        return self
+
+    def uses_preset_defaults(self) -> bool:
+        """影响解析结果的参数均为预设默认值，结果可按预设写入缓存"""
+        return self.model_dump(exclude=RESULT_NEUTRAL_FIELDS) == preset_defaults(self.preset)
+
+
+# 不影响解析结果的参数
+RESULT_NEUTRAL_FIELDS = {'key', 'img_cache', 'response_format', 'fields', 'visualize'}
+
+
+@functools.cache
+def preset_defaults(preset: PresetType) -> dict:
+    """预设的默认解析参数，不含不影响解析结果的参数"""
+    return RequestParams(preset=preset).model_dump(exclude=RESULT_NEUTRAL_FIELDS)
+
+
+async def require_ready():
+    """模型加载与预热完成前拒绝解析请求"""
+    if not readiness.ready:
+        raise HTTPException(status_code=503, detail=f'service is {readiness.to_dict()["status"]}, retry later')
+
+
+async def run_stage(stage: str, func: Callable[..., T], *args, **kwargs) -> T:
+    """在流水线阶段线程池中执行，未启用流水线时在默认线程池中执行"""
+    if settings.pipeline_config.enable:
+        return await pipeline.submit(stage, func, *args, **kwargs)
+    return await asyncio.to_thread(func, *args, **kwargs)
 
 
 async def get_params(
@@ -52,48 +124,51 @@ async def get_params(
 async def get_image_source(
         file: UploadFile = File(default=None, description="图片文件"),
         image_url: HttpUrl = Form(None, description="图片的URL地址"),
-) -> AsyncGenerator[tuple[Image.Image, asyncio.Task, BytesIO], None]:
+) -> tuple[ImageSource, asyncio.Task]:
     if not any([file, image_url]):
         raise HTTPException(status_code=400, detail="file or image_url is required")
 
-    image_buffer = BytesIO()
-    try:
-        if file:
-            image_buffer = BytesIO(await file.read())
-            image_buffer.name = file.filename
-        else:
-            image_buffer = io.BytesIO(await download_file(image_url.__str__()))
-            image_buffer.name = image_url.path.rsplit('/', 1)[-1]
-        # 保持所有图片 3 channels
-        image = Image.open(image_buffer).convert('RGB')
-        logger.info(f'image: {image_buffer.name} size: {image.size} {format_bytes(len(image_buffer.getvalue()))}')
-        # 异步上传原始图片
-        image_upload_task = asyncio.create_task(
-            settings.storage_client.async_upload_file(
-                BytesIO(image_buffer.getvalue()), prefix=settings.storage_prefix)
-        )
-        yield image, image_upload_task, image_buffer
-    finally:
-        image_buffer.close()
+    if file:
+        raw, name = await file.read(), file.filename
+    else:
+        raw, name = await download_file(image_url.__str__()), image_url.path.rsplit('/', 1)[-1]
+    # 只解码一次，后续各阶段共享同一份像素
+    source = await run_stage('decode', ImageSource.decode, raw, name)
+    return source, start_upload(source)
+
+
+def start_upload(source: ImageSource) -> asyncio.Task:
+    """异步上传原始图片，原始字节不可变，无需拷贝"""
+    logger.info(f'image: {source.name} size: {source.size} {format_bytes(len(source.raw))}')
+    return asyncio.create_task(
+        settings.storage_client.async_upload_file(source.buffer(), prefix=settings.storage_prefix, image=source.array)
+    )
 
 
 async def get_context(
-        image_source: Annotated[tuple[Image.Image, asyncio.Task, BytesIO], Depends(get_image_source)]
+        image_source: Annotated[tuple[ImageSource, asyncio.Task], Depends(get_image_source)]
 ) -> AsyncGenerator[Context, None]:
     """请求上下文"""
-    image, image_upload_task, image_buffer = image_source
-    context = Context(image=image, image_upload_task=image_upload_task, image_buffer=image_buffer)
+    source, image_upload_task = image_source
+    context = Context(source=source, image_upload_task=image_upload_task)
     context_var.set(context)
     yield context
 
 
-async def get_queue() -> AsyncGenerator[Queue, None]:
-    """限流"""
+@asynccontextmanager
+async def idle_slot() -> AsyncGenerator[Queue, None]:
+    """占用一个并发名额，可在接口内部按需使用"""
+    if idle_queue.qsize() == 0:
+        logger.warning(f'idle queue is empty, wait for idle queue...')
+    await idle_queue.get()
     try:
-        if idle_queue.qsize() == 0:
-            logger.warning(f'idle queue is empty, wait for idle queue...')
-        await idle_queue.get()
         logger.info(f'require idle queue success， idle queue size: {idle_queue.qsize()}')
         yield idle_queue
     finally:
         idle_queue.put_nowait(True)
+
+
+async def get_queue() -> AsyncGenerator[Queue, None]:
+    """限流"""
+    async with idle_slot() as queue:
+        yield queue
@@ -4,13 +4,20 @@
 # @Email : aidenmo@tencent.com
 # @Time : 2025/12/25 20:13
 
+from typing import Literal
+
 from pydantic import BaseModel, Field
 
 from config import settings
 from util.timer import TimerRecorder
 
 
+PresetType = Literal['fast', 'balanced', 'accurate']
+
+
 class OCRParams(BaseModel):
+    engine: Literal['server', 'mobile'] = Field(default='server', description="OCR 模型，mobile 速度更快")
+    tile: bool = Field(default=settings.ocr_tile_config.enable, description="长截图/高分辨率截图是否分块并行识别")
     text_det_thresh: float | None = Field(
         default=settings.ocr_config.text_det_thresh, description="文本检测二值化阈值")
     text_det_box_thresh: float | None = Field(
@@ -28,15 +35,59 @@ class OCRParams(BaseModel):
 class IconDetectParams(BaseModel):
     conf: float = Field(default=settings.yolo_config.conf, description="置信度阈值")
     iou: float = Field(default=settings.yolo_config.iou, description="IoU 阈值")
+    imgsz: int | None = Field(default=None, description="模型输入尺寸，默认使用模型训练尺寸")
 
 
 class OverlayDetectParams(BaseModel):
+    enable: bool = Field(default=True, description="是否进行弹窗/加载中检测")
     conf: float = Field(default=settings.overlay_yolo_config.conf, description="弹窗检测置信度阈值")
     iou: float = Field(default=settings.overlay_yolo_config.iou, description="弹窗检测 IoU 阈值")
+    imgsz: int | None = Field(default=None, description="模型输入尺寸，默认使用模型训练尺寸")
 
 
 class IconCaptionParams(BaseModel):
+    mode: Literal['eager', 'lazy', 'skip'] = Field(
+        default='eager',
+        description="图标识别方式：eager 解析时识别全部图标；lazy 图标内容为空并返回 parse_id，"
+                    "由 /omni/caption/ 按需识别；skip 表示不识别图标")
     batch_size: int = Field(default=settings.caption_config.batch_size, description="批处理大小")
+    engine: Literal['florence', 'clip', 'hybrid'] = Field(
+        default=settings.caption_config.engine,
+        description="识别引擎：florence 生成式描述；clip 嵌入分类，速度快；hybrid 先分类，置信度低时使用 florence")
+    threshold: float = Field(
+        default=settings.icon_classifier_config.threshold, description="hybrid 模式下使用 florence 的分类置信度阈值")
+
+
+class LoadingCheckParams(BaseModel):
+    enable: bool = Field(default=settings.loading_check_config.enable, description="是否进行加载中/空白页快速检测")
+    blank_threshold: float = Field(
+        default=settings.loading_check_config.blank_threshold, description="判定为空白页的单一颜色占比阈值")
+    blank_edge_ratio: float = Field(
+        default=settings.loading_check_config.blank_edge_ratio, description="判定为空白页的边缘像素占比上限")
+    dominance_threshold: float = Field(
+        default=settings.loading_check_config.dominance_threshold, description="判定为疑似加载页的单一颜色占比阈值")
+    use_overlay: bool = Field(
+        default=settings.loading_check_config.use_overlay, description="疑似加载页时是否使用弹窗模型确认")
+    overlay_conf: float = Field(
+        default=settings.loading_check_config.overlay_conf, description="页面加载中置信度阈值")
+
+
+# 预设对应的参数，仅覆盖请求中未显式传入的参数
+PRESETS: dict[PresetType, dict[str, dict]] = {
+    # 轻量 OCR 模型 + 降低检测输入尺寸 + 跳过图标识别
+    'fast': {
+        'ocr': {'engine': 'mobile', 'text_det_limit_side_len': 640},
+        'icon_detect': {'imgsz': 640},
+        'overlay_detect': {'imgsz': 640},
+        'icon_caption': {'mode': 'skip'},
+    },
+    # 默认参数
+    'balanced': {},
+    # 提高 OCR 输入分辨率，适合定位失败后的重试
+    'accurate': {
+        'ocr': {'text_det_limit_side_len': 1920},
+    },
+}
 
 
 class ImgCacheParams(BaseModel):
@@ -44,9 +95,38 @@ class ImgCacheParams(BaseModel):
     within_days: int = Field(default=1, description="获取缓存最近天数")
 
 
+ElementField = Literal[
+    'type', 'bbox', 'interactivity', 'content', 'score', 'source',
+    'left_elem_ids', 'top_elem_ids', 'right_elem_ids', 'bottom_elem_ids'
+]
+
+
+class CaptionParams(BaseModel):
+    parse_id: str = Field(description="lazy 模式解析返回的 parse_id")
+    ids: list[int] = Field(description="需要识别的图标元素 id")
+    batch_size: int | None = Field(default=None, description="批处理大小，默认使用解析请求的参数")
+
+
+class CaptionResponse(BaseModel):
+    parse_id: str
+    captions: dict[int, str]  # 元素 id -> 图标描述，非待识别图标的 id 不返回
+
+
+class RelationsParams(BaseModel):
+    bboxes: list[tuple[float, float, float, float]] = Field(description="全部元素坐标 [x1, y1, x2, y2] (归一化坐标)，下标即元素 id")
+    ids: list[int] | None = Field(default=None, description="需要计算空间关系的元素 id，为空时计算全部元素")
+
+
+class RelationsResponse(BaseModel):
+    elements: list[dict]  # 每个请求元素的 id 及空间关系字段
+
+
 class ParsedResponse(BaseModel):
     parsed_content_list: list
+    parsed_content_columns: dict | None = None  # response_format 为 columnar 时返回，下标即元素 id
     labeled_image_url: str
     image_url: str
     visualize: str | None = None
+    is_loading: bool = False
+    parse_id: str | None = None  # 图标按需识别(lazy)时返回，与元素 id 组成元素的稳定标识
     timer: TimerRecorder | None = None
@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/20 03:40
+from util.benchmark import compare_baseline, summarize
+
+
+def test_summarize():
+    assert summarize([0.001, 0.002, 0.003]) == {'p50': 2.0, 'p95': 2.9, 'mean': 2.0, 'min': 1.0}
+
+
+def test_compare_baseline():
+    baseline = {'meta': {'images': 4}, 'stages': {'ocr': {'p50': 100.0, 'mean': 100.0}, 'sort': {'p50': 0.5}},
+                'concurrency': {'1': {'p50': 400.0, 'peak_rss_mb': 2000.0}}}
+    results = {'meta': {'images': 8}, 'stages': {'ocr': {'p50': 130.0, 'mean': 200.0}, 'sort': {'p50': 1.5}},
+               'concurrency': {'1': {'p50': 410.0, 'peak_rss_mb': 2600.0}}}
+    assert compare_baseline(results, baseline, threshold=20) == ['stages.ocr.p50: 100.0 -> 130.0 (+30.0%)',
+                                                                 'stages.sort.p50: 0.5 -> 1.5 (+200.0%)']
+    # 亚毫秒级指标的抖动不算退化
+    assert compare_baseline(results, baseline, threshold=20, min_delta=2) == ['stages.ocr.p50: 100.0 -> 130.0 (+30.0%)']
+    assert compare_baseline(results, baseline, threshold=20, metrics=('peak_rss_mb',), sections=('concurrency',)) == [
+        'concurrency.1.peak_rss_mb: 2000.0 -> 2600.0 (+30.0%)']
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/20 00:50
+import random
+
+import numpy as np
+from PIL import Image
+
+from util.cache_bundle import BundleRecord, CacheBundle, hamming_many, write_bundle
+from util.perceptual_hash import dhash, hamming, thumbnail
+
+
+def make_record(image: Image.Image, preset: str = 'balanced', text: str = 'ok') -> BundleRecord:
+    return BundleRecord(
+        dhash=dhash(image),
+        thumb=thumbnail(image),
+        vector=np.random.default_rng(0).random(512, dtype=np.float32),
+        preset=preset,
+        timestamp=1760000000,
+        elements=[{'type': 'text', 'bbox': [0.1, 0.1, 0.2, 0.2], 'content': text}],
+        labeled_url='https://example.com/labeled.png',
+        image_url='https://example.com/image.png',
+    )
+
+
+def test_hamming_many():
+    rng = random.Random(0)
+    keys = [rng.getrandbits(64) for _ in range(1000)]
+    query = rng.getrandbits(64)
+    assert hamming_many(np.array(keys, dtype=np.uint64), query).tolist() == [hamming(query, key) for key in keys]
+
+
+def test_bundle_round_trip(tmp_path):
+    rng = np.random.default_rng(1)
+    images = [Image.fromarray(rng.integers(0, 256, (200, 100, 3), dtype=np.uint8)) for _ in range(3)]
+    path = tmp_path / 'cache.opcb'
+    assert write_bundle(path, [make_record(image, text=str(i)) for i, image in enumerate(images)]) == 3
+
+    bundle = CacheBundle(path)
+    try:
+        assert len(bundle) == 3
+        hit = bundle.lookup(dhash(images[1]), thumbnail(images[1]), 'balanced')
+        assert hit['elements'][0]['content'] == '1'
+        assert hit['labeled_url'] == 'https://example.com/labeled.png'
+        # 预设不同或画面不同时不命中
+        assert bundle.lookup(dhash(images[1]), thumbnail(images[1]), 'fast') is None
+        other = Image.fromarray(rng.integers(0, 256, (200, 100, 3), dtype=np.uint8))
+        assert bundle.lookup(dhash(other), thumbnail(other), 'balanced') is None
+        assert bundle.metrics.hits == 1
+
+        records = list(bundle.records())
+        assert [record.elements[0]['content'] for record in records] == ['0', '1', '2']
+        assert np.array_equal(records[2].thumb, thumbnail(images[2]))
+    finally:
+        bundle.close()
+
+    write_bundle(path, [])
+    empty = CacheBundle(path)
+    assert len(empty) == 0 and empty.lookup(0, thumbnail(images[0]), 'balanced') is None
+    empty.close()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/20 01:50
+import asyncio
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import orjson
+import pytest
+
+from core.columns import ElementColumns
+from util import frame_protocol as fp
+
+
+def test_encode_columns():
+    columns = ElementColumns(
+        bbox=np.array([[0.1, 0.2, 0.3, 0.4], [0.5, 0.5, 0.6, 0.7]]), score=np.array([0.9, 1.0]),
+        source=np.array([0, 2]), content=['确定', None],
+        neighbors={name: [[1], []] for name in ('left_elem_ids', 'top_elem_ids', 'right_elem_ids', 'bottom_elem_ids')},
+    )
+    meta, body = fp.encode_columns(columns.to_columnar(['bbox', 'content', 'left_elem_ids']))
+    assert meta['fields'] == ['bbox', 'content', 'left_elem_ids']
+    assert meta['content'] == ['确定', None]
+    assert [name for name, _, _ in meta['sections']] == ['bbox', 'left_elem_ids.offsets', 'left_elem_ids']
+
+    bbox = np.frombuffer(body, dtype='<f4', count=8).reshape(2, 4)
+    assert np.allclose(bbox, columns.bbox)
+    offsets = np.frombuffer(body, dtype='<u4', count=3, offset=32)
+    ids = np.frombuffer(body, dtype='<u4', offset=44)
+    assert offsets.tolist() == [0, 1, 1] and ids.tolist() == [1]
+
+
+@pytest.mark.asyncio
+async def test_frame_server():
+    async def handler(frame: fp.Frame):
+        if frame.type != fp.PARSE:
+            return 404, {'msg': 'unknown'}, b''
+        return 200, {'size': [frame.width, frame.height, frame.channels], 'name': frame.meta['name']}, frame.body[::-1]
+
+    path = Path(tempfile.mkdtemp()) / 'omni.sock'
+    server = fp.FrameServer(path, handler, max_bytes=1024)
+    await server.start()
+
+    async def request(msg_type: int, meta: dict, body: bytes) -> tuple[int, dict, bytes]:
+        meta_bytes = orjson.dumps(meta)
+        writer.write(fp.REQUEST.pack(fp.MAGIC, msg_type, fp.RAW, 3, 2, 1, len(meta_bytes), len(body)) + meta_bytes + body)
+        _, status, meta_len, body_len = fp.RESPONSE.unpack(await reader.readexactly(fp.RESPONSE.size))
+        return status, orjson.loads(await reader.readexactly(meta_len)), await reader.readexactly(body_len)
+
+    reader, writer = await asyncio.open_unix_connection(str(path))
+    try:
+        # 同一连接顺序发送多个请求
+        assert await request(fp.PARSE, {'name': 'a.png'}, b'abcdef') == (200, {'size': [2, 1, 3], 'name': 'a.png'},
+                                                                         b'fedcba')
+        assert (await request(fp.CAPTION, {}, b''))[0] == 404
+        status, meta, _ = await request(fp.PARSE, {'name': 'b.png'}, bytes(2048))
+        assert status == 400 and 'too large' in meta['msg']
+    finally:
+        writer.close()
+        await server.close()
+    assert not path.exists()
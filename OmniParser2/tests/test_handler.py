@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/19 17:40
+import numpy as np
+
+from core.columns import ElementColumns, SOURCE_OCR, SOURCE_YOLO
+from core.handler import BoxesHandler
+
+
+def test_remove_overlap():
+    icon_columns = ElementColumns.create(
+        np.array([
+            [0.10, 0.10, 0.30, 0.15],  # 包含文本 "确定"
+            [0.11, 0.10, 0.30, 0.15],  # 与上一个图标重叠且面积更小，保留该图标
+            [0.50, 0.50, 0.52, 0.52],  # 落在文本 "长文本" 内，丢弃
+            [0.80, 0.80, 0.90, 0.90],  # 纯图标
+        ]),
+        [0.9, 0.8, 0.7, 0.6],
+        SOURCE_YOLO
+    )
+    ocr_columns = ElementColumns.create(
+        np.array([[0.12, 0.11, 0.20, 0.14], [0.40, 0.49, 0.70, 0.53]]),
+        [0.99, 0.98],
+        SOURCE_OCR,
+        ['确定', '长文本']
+    )
+
+    icon_columns, ocr_columns = BoxesHandler.remove_overlap(icon_columns, ocr_columns, iou_threshold=0.7)
+
+    assert icon_columns.bbox.tolist() == [[0.80, 0.80, 0.90, 0.90]]
+    assert ocr_columns.content == ['长文本', '确定']
+    assert ocr_columns.sources == ['box_ocr_content_ocr', 'box_yolo_content_ocr']
+    assert ocr_columns.bbox[1].tolist() == [0.11, 0.10, 0.30, 0.15]
+
+
+def test_sort_elements_spatially():
+    columns = ElementColumns.create(
+        np.array([
+            [0.60, 0.30, 0.90, 0.34],  # 第二行右侧
+            [0.10, 0.10, 0.40, 0.14],  # 第一行
+            [0.10, 0.31, 0.40, 0.35],  # 第二行左侧
+        ]),
+        [1, 1, 1],
+        SOURCE_OCR,
+        ['c', 'a', 'b']
+    )
+
+    elements = BoxesHandler.sort_elements_spatially(columns).to_elements()
+
+    assert [el.content for el in elements] == ['a', 'b', 'c']
+    assert [el.id for el in elements] == [0, 1, 2]
+    assert elements[0].bottom_elem_ids == [1]
+    assert elements[1].top_elem_ids == [0] and elements[1].right_elem_ids == [2]
+    assert elements[2].left_elem_ids == [1] and elements[2].top_elem_ids == []
+
+
+def test_spatial_relations_ids():
+    bbox = np.array([[0.10, 0.10, 0.40, 0.14], [0.10, 0.31, 0.40, 0.35], [0.60, 0.30, 0.90, 0.34]])
+    order, row_starts = BoxesHandler.group_rows(bbox)
+    full = BoxesHandler.spatial_relations(bbox[order], row_starts)
+
+    # 只计算指定元素，其余元素为空列表
+    partial = BoxesHandler.spatial_relations(bbox[order], row_starts, ids=[1])
+    assert partial['top_elem_ids'][1] == full['top_elem_ids'][1] == [0]
+    assert partial['right_elem_ids'][1] == full['right_elem_ids'][1] == [2]
+    assert partial['bottom_elem_ids'][0] == [] and full['bottom_elem_ids'][0] == [1]
+
+    # 关闭空间关系时仅排序
+    columns = ElementColumns.create(bbox, [1, 1, 1], SOURCE_OCR)
+    assert BoxesHandler.sort_elements_spatially(columns, relations=False).neighbors is None
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/19 10:20
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from config import settings
+from util.image import ImageUtil, ImageSource
+
+
+def test_dominant_color_of_array():
+    image_np = np.full((320, 144, 3), 255, dtype=np.uint8)
+    image_np[100:110, 60:70] = [30, 30, 30]
+
+    rgb, ratio = ImageUtil.dominant_color_of_array(image_np, color_bits_to_reduce=6)
+
+    assert rgb == (252, 252, 252)
+    assert ratio == 1 - 100 / (320 * 144)
+
+
+def test_is_loading_screen():
+    blank = Image.new('RGB', (1440, 3200), 'white')
+    assert ImageUtil(blank).is_loading_screen()
+
+    image_path = settings.root_path / 'tests' / 'images' / 'ocr_01.png'
+    with ImageUtil(image_path) as util:
+        _, ratio = util.dominant_color()
+        # 白色背景约占 19%，远低于空白页阈值
+        assert 0.15 < ratio < 0.25 < settings.loading_check_config.blank_threshold
+
+
+def test_sparse_screen_is_not_blank():
+    config = settings.loading_check_config
+    blank = np.full((3200, 1440, 3), 255, dtype=np.uint8)
+    assert ImageSource(blank).edge_ratio(config.edge_threshold, sample_size=config.sample_size) == 0
+
+    # 空状态页：标题栏分割线、搜索框与灰色提示文字，颜色占比超过空白页阈值，但存在边缘
+    sparse = blank.copy()
+    sparse[200:204] = 220
+    sparse[260:340, 60:1380] = 240
+    sparse[1600:1640, 560:880] = 153
+    source = ImageSource(sparse)
+    _, ratio = source.dominant_color(config.color_bits_to_reduce, sample_size=config.sample_size)
+    assert ratio >= config.blank_threshold
+    assert source.edge_ratio(config.edge_threshold, sample_size=config.sample_size) > config.blank_edge_ratio
+
+
+def test_image_source():
+    image = Image.new('RGBA', (144, 320), 'white')
+    image.paste((30, 30, 30, 255), (60, 100, 70, 110))
+    buffer = BytesIO()
+    image.save(buffer, 'png')
+
+    source = ImageSource.decode(buffer.getvalue(), 'blank.png')
+    assert source.size == (144, 320) and source.array.shape == (320, 144, 3)
+    assert not source.array.flags.writeable
+    assert source.crop((60, 100, 70, 110)).array.base is not None
+    assert source.buffer().getvalue() is source.raw
+
+    # 与基于 PIL 的实现结果一致，采样位置不同允许占比有微小差异
+    rgb, ratio = source.dominant_color()
+    expected_rgb, expected_ratio = ImageUtil(source.image).dominant_color()
+    assert rgb == expected_rgb and abs(ratio - expected_ratio) < 0.01
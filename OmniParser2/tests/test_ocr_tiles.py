@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/19 14:50
+import numpy as np
+
+from core.tiles import TileHandler
+
+WIDTH, HEIGHT, TILE_SIZE, OVERLAP = 1440, 12000, 1536, 128
+EMPTY = (np.empty((0, 4)), [], [])
+
+
+def test_split_tiles():
+    tiles = TileHandler.split_tiles(WIDTH, HEIGHT, TILE_SIZE, OVERLAP)
+
+    assert len(tiles) == 8
+    assert tiles[0][1] == 0 and tiles[-1][3] == HEIGHT
+    for (_, _, _, y2), (_, y1, _, _) in zip(tiles, tiles[1:]):
+        assert y2 - y1 == OVERLAP
+
+    # 普通截图不超过分块边长时只有一个分块
+    assert TileHandler.split_tiles(1440, 1500, TILE_SIZE, OVERLAP) == [(0, 0, 1440, 1500)]
+
+
+def test_merge_ocr_results():
+    tiles = TileHandler.split_tiles(WIDTH, HEIGHT, TILE_SIZE, OVERLAP)
+    (_, t0_y1, _, t0_y2), (_, t1_y1, _, _) = tiles[:2]
+
+    # 跨越切割边的文字：分块 0 中被截断，分块 1 中完整
+    cut_y1 = t0_y2 - 40
+    tile0 = (np.array([[100, cut_y1 - t0_y1, 500, t0_y2 - t0_y1], [100, 100, 300, 140]]), ['被截断', 'a'], [0.9, 0.95])
+    tile1 = (np.array([[100, cut_y1 - t1_y1, 500, t0_y2 + 10 - t1_y1]]), ['完整'], [0.8])
+    boxes, texts, scores = TileHandler.merge_ocr_results(
+        tiles, [tile0, tile1] + [EMPTY] * (len(tiles) - 2), WIDTH, HEIGHT, OVERLAP)
+    assert texts == ['a', '完整']
+    assert boxes[1].tolist() == [100, cut_y1, 500, t0_y2 + 10]
+
+    # 完全落在重叠区域内的文字在两个分块中重复出现，保留分数高的
+    dup_y1 = t0_y2 - 80
+    tile0 = (np.array([[100, dup_y1 - t0_y1, 500, dup_y1 + 30 - t0_y1]]), ['重复'], [0.9])
+    tile1 = (np.array([[100, dup_y1 - t1_y1, 500, dup_y1 + 30 - t1_y1]]), ['重复'], [0.95])
+    boxes, texts, scores = TileHandler.merge_ocr_results(
+        tiles, [tile0, tile1] + [EMPTY] * (len(tiles) - 2), WIDTH, HEIGHT, OVERLAP)
+    assert texts == ['重复'] and scores == [0.95]
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/19 22:40
+import random
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from util.perceptual_hash import BKTree, PerceptualIndex, HashEntry, dhash, thumbnail, hamming
+
+
+def test_bk_tree_search():
+    rng = random.Random(0)
+    keys = [rng.getrandbits(64) for _ in range(5000)]
+    tree = BKTree()
+    for i, key in enumerate(keys):
+        tree.add(key, i)
+
+    query = keys[123] ^ 0b101  # 距离为 2
+    expected = sorted((hamming(query, key), i) for i, key in enumerate(keys) if hamming(query, key) <= 8)
+    assert sorted((distance, i) for distance, _, i in tree.search(query, 8)) == expected
+    assert len(tree) == 5000
+
+
+def test_perceptual_index_tiers():
+    image = Image.new('RGB', (360, 800), 'white')
+    draw = ImageDraw.Draw(image)
+    for y in range(0, 800, 80):
+        draw.rectangle((20, y + 10, 340, y + 60), fill=(y % 255, 120, 200))
+    other = Image.fromarray(np.random.default_rng(0).integers(0, 255, (800, 360, 3), dtype=np.uint8))
+
+    index = PerceptualIndex(hit_distance=2, miss_distance=12, thumb_threshold=2.0, max_entries=10)
+    index.add(dhash(image), HashEntry(id=1, preset='balanced', timestamp=100, thumb=thumbnail(image)))
+
+    # 重新编码后的相同画面直接命中
+    noisy = Image.fromarray(np.clip(np.asarray(image, dtype=np.int16) + 1, 0, 255).astype(np.uint8))
+    st = time.perf_counter()
+    lookup = index.lookup(dhash(noisy), thumbnail(noisy), 'balanced')
+    assert lookup.state == 'hit' and lookup.entry.id == 1
+    assert time.perf_counter() - st < 0.05
+
+    # 预设或时间不匹配时不命中；索引不完整时无法排除未命中
+    assert index.lookup(dhash(image), thumbnail(image), 'fast').state == 'ambiguous'
+    assert index.lookup(dhash(image), thumbnail(image), 'balanced', since=200).state == 'ambiguous'
+    index.complete = True
+    assert index.lookup(dhash(other), thumbnail(other), 'balanced').state == 'miss'
+
+    index.prune(lambda entry: entry.timestamp >= 200)
+    assert len(index) == 0
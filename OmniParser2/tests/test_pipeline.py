@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/19 21:30
+import asyncio
+import time
+
+import pytest
+
+from core.pipeline import Node, PipelineScheduler
+
+
+@pytest.mark.asyncio
+async def test_pipeline_dag():
+    scheduler = PipelineScheduler({'ocr': 1, 'detect': 1, 'merge': 2}, queue_size=1)
+
+    def work(value):
+        time.sleep(0.05)
+        return value
+
+    results = await scheduler.run_dag([
+        Node('ocr', lambda: work('text')),
+        Node('detect', lambda: work('icon')),
+        Node('merge', lambda ocr, detect: [ocr, detect], deps=('ocr', 'detect')),
+    ])
+    assert results['merge'] == ['text', 'icon']
+
+    # 单线程 + 1 个排队名额，其余提交方等待入队
+    assert await asyncio.gather(*(scheduler.submit('ocr', work, i) for i in range(4))) == [0, 1, 2, 3]
+    snapshot = scheduler.snapshot()
+    assert snapshot['ocr']['completed'] == 5
+    assert snapshot['ocr']['backpressure_seconds'] > 0
+
+    with pytest.raises(ValueError):
+        await scheduler.run_dag([Node('merge', lambda ocr: ocr, deps=('ocr',))])
+    scheduler.close()
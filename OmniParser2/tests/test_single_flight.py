@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/19 19:50
+import asyncio
+
+import pytest
+
+from util.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_single_flight():
+    flight = SingleFlight()
+    calls = []
+
+    async def work(value):
+        calls.append(value)
+        await asyncio.sleep(0.05)
+        return value
+
+    results = await asyncio.gather(*(flight.do('a', lambda: work(1)) for _ in range(3)), flight.do('b', lambda: work(2)))
+
+    assert calls == [1, 2]
+    assert [result for result, _ in results] == [1, 1, 1, 2]
+    assert [shared for _, shared in results] == [False, True, True, False]
+    assert len(flight) == 0
+
+    # 调用结束后相同 key 重新执行
+    assert await flight.do('a', lambda: work(3)) == (3, False)
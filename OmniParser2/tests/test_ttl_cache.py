@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/19 18:40
+import time
+
+from util.ttl_cache import TTLCache
+
+
+def test_ttl_cache():
+    cache = TTLCache(maxsize=2, ttl=0.2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    # 超出容量淘汰最久未访问的 b
+    cache.set('c', 3)
+    assert cache.get('b') is None and cache.get('a') == 1 and len(cache) == 2
+
+    time.sleep(0.25)
+    assert cache.get('a') is None and 'c' not in cache
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/20 21:10
+import asyncio
+import os
+import signal
+import time
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from core.worker import ParseWorkerPool
+from util.image import ImageSource
+from util.timer import TimerRecorder
+
+
+class FakeParser:
+    def __init__(self, source: ImageSource, params):
+        self.source = source
+        self.params = params
+
+    def parse(self):
+        if isinstance(self.params, Path):
+            # 记录 pid 后阻塞，模拟处理中的进程
+            self.params.write_text(str(os.getpid()))
+            time.sleep(60)
+        return f'{self.params}:{self.source.array.shape}'
+
+
+def failing_warmup():
+    raise ValueError('warmup failed')
+
+
+def create_source() -> ImageSource:
+    buffer = BytesIO()
+    Image.new('RGB', (32, 64), 'white').save(buffer, 'png')
+    return ImageSource.decode(buffer.getvalue(), 'blank.png')
+
+
+async def wait_until(predicate, timeout: float = 10):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        await asyncio.sleep(0.05)
+
+
+@pytest.mark.asyncio
+async def test_worker_killed(tmp_path):
+    pool = ParseWorkerPool(2, FakeParser, torch_threads=1)
+    pool.start()
+    try:
+        await asyncio.wait_for(pool.wait_ready(), 30)
+        source = create_source()
+        assert await pool.submit(source, 'a', TimerRecorder(), timeout=10) == 'a:(64, 32, 3)'
+
+        # 空闲进程被强制结束，不影响后续任务
+        os.kill(pool.pids[0], signal.SIGKILL)
+        results = await asyncio.gather(*(pool.submit(source, str(i), TimerRecorder(), timeout=10) for i in range(4)))
+        assert results == [f'{i}:(64, 32, 3)' for i in range(4)]
+
+        # 处理中的进程被强制结束，其任务立即失败，后续任务正常完成
+        pid_file = tmp_path / 'pid'
+        busy = asyncio.create_task(pool.submit(source, pid_file, TimerRecorder(), timeout=30))
+        await wait_until(pid_file.exists)
+        await asyncio.sleep(0.1)
+        os.kill(int(pid_file.read_text()), signal.SIGKILL)
+        with pytest.raises(RuntimeError, match='exited'):
+            await asyncio.wait_for(busy, 5)
+        assert await pool.submit(source, 'b', TimerRecorder(), timeout=10) == 'b:(64, 32, 3)'
+
+        await wait_until(lambda: pool.snapshot()['ready'] == 2)
+        assert pool.restarts == 2
+    finally:
+        pool.close()
+
+
+@pytest.mark.asyncio
+async def test_worker_warmup_failed():
+    failures = []
+    pool = ParseWorkerPool(1, FakeParser, torch_threads=1, warmup=failing_warmup, max_failures=2,
+                           on_failure=failures.append)
+    pool.start()
+    try:
+        with pytest.raises(RuntimeError, match='warmup failed'):
+            await asyncio.wait_for(pool.wait_ready(), 30)
+        # 达到次数上限后不再重启，请求立即失败
+        assert pool.restarts == 1 and pool.available == 0 and len(failures) == 1
+        with pytest.raises(RuntimeError, match='no parse worker available'):
+            await pool.submit(create_source(), 'a', TimerRecorder(), timeout=10)
+    finally:
+        pool.close()
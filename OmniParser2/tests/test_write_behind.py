@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/19 22:00
+import asyncio
+
+import pytest
+
+from util.write_behind import WriteBehindBuffer
+
+
+@pytest.mark.asyncio
+async def test_write_behind_buffer():
+    batches = []
+
+    async def flush(batch):
+        batches.append(batch)
+
+    buffer = WriteBehindBuffer(flush, batch_size=3, flush_interval=0.05, max_pending=4)
+    assert not buffer.put(0)  # 未启动时丢弃
+    buffer.start()
+
+    # 达到批大小立即写入，不足一批时等待攒批时间
+    assert all(buffer.put(i) for i in range(1, 5))
+    await asyncio.sleep(0.1)
+    assert batches == [[1, 2, 3], [4]]
+
+    # 超出缓冲上限时丢弃，关闭时写入剩余条目
+    results = [buffer.put(i) for i in range(5, 11)]
+    assert results == [True] * 4 + [False] * 2
+    await buffer.close()
+    assert sum(batches, []) == list(range(1, 9))
+    assert buffer.snapshot() == {'enqueued': 8, 'dropped': 3, 'flushed': 8, 'failed': 0, 'batches': 4, 'pending': 0}
+    assert not buffer.put(11)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/20 03:00
+"""基准测试的耗时统计、结果记录与基线比较"""
+import json
+import math
+import os
+import platform
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+def summarize(values: list[float], scale: float = 1000) -> dict[str, float]:
+    """
+    耗时统计
+
+    Args:
+        values: 耗时(秒)
+        scale: 换算倍数，默认换算为毫秒
+    """
+    array = np.asarray(values, dtype=np.float64) * scale
+    return {
+        'p50': round(float(np.percentile(array, 50)), 3),
+        'p95': round(float(np.percentile(array, 95)), 3),
+        'mean': round(float(array.mean()), 3),
+        'min': round(float(array.min()), 3),
+    }
+
+
+def environment() -> dict:
+    """运行环境，基线只在相同环境下可比"""
+    return {
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def flatten(data: dict, prefix: str = '') -> dict[str, float]:
+    """数值叶子节点展开为 {a.b.c: value}"""
+    result = {}
+    for key, value in data.items():
+        path = f'{prefix}{key}'
+        if isinstance(value, dict):
+            result.update(flatten(value, f'{path}.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            result[path] = value
+    return result
+
+
+def compare_baseline(
+        results: dict,
+        baseline: dict,
+        threshold: float,
+        metrics: tuple[str, ...] = ('p50',),
+        sections: tuple[str, ...] | None = None,
+        min_delta: float = 0
+) -> list[str]:
+    """
+    与基线比较，返回超过阈值的退化指标
+
+    Args:
+        results: 本次结果
+        baseline: 基线结果
+        threshold: 允许的增幅(百分比)
+        metrics: 参与比较的指标名，即展开路径的最后一段
+        sections: 参与比较的顶层字段，为空时比较全部
+        min_delta: 绝对增量下限，避免亚毫秒级指标的抖动误报
+
+    Returns:
+        退化说明，如 'stages.ocr.p50: 120.0 -> 150.0 (+25.0%)'
+    """
+    current, base = flatten(results), flatten(baseline)
+    regressions = []
+    for key, value in current.items():
+        if key.rsplit('.', 1)[-1] not in metrics or key not in base:
+            continue
+        if sections is not None and key.split('.', 1)[0] not in sections:
+            continue
+        expected = base[key]
+        if value > expected * (1 + threshold / 100) and value - expected > min_delta:
+            increase = (value / expected - 1) * 100 if expected else math.inf
+            regressions.append(f'{key}: {expected} -> {value} (+{increase:.1f}%)')
+    return regressions
+
+
+def load_json(path: Path) -> dict:
+    return json.loads(path.read_text(encoding='utf-8'))
+
+
+def save_json(path: Path, data: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
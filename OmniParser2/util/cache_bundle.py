@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/20 00:10
+"""
+截图缓存离线包：感知哈希、缩略图、CLIP 向量与压缩后的解析结果写入单个文件，只读内存映射打开
+
+文件结构::
+
+    magic(4B) | version(u32) | meta 长度(u32) | meta(JSON) | 各数组段(64 字节对齐)
+
+meta 记录记录数、预设列表、向量维度与各数组段的偏移、类型和形状；解析结果段为逐条 zlib 压缩的 JSON，
+由 offsets 段定位。打开时只解析 meta，数组段按需从页缓存读取，大文件同样秒级可用
+"""
+import mmap
+import os
+import struct
+import time
+import zlib
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+import orjson
+
+from util.perceptual_hash import THUMB_SIZE, thumb_distance
+
+MAGIC = b'OPCB'
+VERSION = 1
+ALIGNMENT = 64
+_HEADER = struct.Struct('<4sII')
+
+# 单字节 popcount 查找表，按字节计算 64 位哈希的汉明距离(numpy<2 没有 bitwise_count)
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+@dataclass
+class BundleRecord:
+    """一条缓存记录"""
+    dhash: int  # 无符号 64 位感知哈希
+    thumb: np.ndarray  # 32x32 灰度缩略图
+    vector: np.ndarray  # CLIP 向量
+    preset: str
+    timestamp: int
+    elements: list[dict]
+    labeled_url: str = ''
+    image_url: str = ''
+    key: str = ''
+
+
+@dataclass
+class BundleMetrics:
+    lookups: int = 0
+    hits: int = 0
+
+    def snapshot(self) -> dict:
+        return {**asdict(self), 'hit_ratio': round(self.hits / max(self.lookups, 1), 4)}
+
+
+def hamming_many(hashes: np.ndarray, key: int) -> np.ndarray:
+    """key 与 uint64 数组中每个哈希的汉明距离"""
+    xor = np.bitwise_xor(hashes, np.uint64(key))
+    return _POPCOUNT[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_bundle(path: str | Path, records: Iterable[BundleRecord], model_name: str = 'ViT-B/32') -> int:
+    """
+    写入缓存离线包，先写临时文件再重命名，读取中的旧文件不受影响
+
+    Returns:
+        写入的记录数
+    """
+    records = list(records)
+    presets = sorted({record.preset for record in records})
+    preset_codes = {preset: i for i, preset in enumerate(presets)}
+    dim = len(records[0].vector) if records else 0
+    blobs = [zlib.compress(orjson.dumps({
+        'elements': record.elements,
+        'labeled_url': record.labeled_url,
+        'image_url': record.image_url,
+        'key': record.key,
+    }, option=orjson.OPT_SERIALIZE_NUMPY)) for record in records]
+
+    arrays = {
+        'hashes': np.array([record.dhash for record in records], dtype=np.uint64),
+        'presets': np.array([preset_codes[record.preset] for record in records], dtype=np.uint8),
+        'timestamps': np.array([record.timestamp for record in records], dtype=np.int64),
+        'thumbs': np.stack([record.thumb for record in records]).astype(np.uint8) if records
+        else np.empty((0, THUMB_SIZE, THUMB_SIZE), dtype=np.uint8),
+        # 半精度存储，文件体积减半，余弦相似度精度足够
+        'vectors': np.stack([np.asarray(record.vector, dtype=np.float16) for record in records]) if records
+        else np.empty((0, dim), dtype=np.float16),
+        'offsets': np.cumsum([0] + [len(blob) for blob in blobs], dtype=np.uint64),
+    }
+    meta = {
+        'count': len(records),
+        'presets': presets,
+        'model_name': model_name,
+        'vector_dim': dim,
+        'created': int(time.time()),
+        'sections': {},
+    }
+    # 各段偏移依赖 meta 长度，先以占位偏移估算长度，偏移位数增加时重新计算
+    meta_len = 0
+    while True:
+        offset = _align(_HEADER.size + meta_len)
+        for name, array in arrays.items():
+            meta['sections'][name] = [offset, array.dtype.str, list(array.shape)]
+            offset = _align(offset + array.nbytes)
+        meta['sections']['blobs'] = [offset, '|u1', [sum(len(blob) for blob in blobs)]]
+        encoded = orjson.dumps(meta)
+        if len(encoded) == meta_len:
+            break
+        meta_len = len(encoded)
+
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with tmp_path.open('wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, meta_len))
+        f.write(encoded)
+        for name, array in arrays.items():
+            f.seek(meta['sections'][name][0])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.seek(meta['sections']['blobs'][0])
+        for blob in blobs:
+            f.write(blob)
+        # 空数组段只有偏移没有数据，补齐文件长度保证各段偏移都在文件内
+        f.truncate(meta['sections']['blobs'][0] + meta['sections']['blobs'][2][0])
+    os.replace(tmp_path, path)
+    return len(records)
+
+
+class CacheBundle:
+    """
+    只读内存映射的截图缓存离线包，作为缓存查询的额外一级，不依赖向量数据库
+
+    查询按感知哈希全量扫描(向量化按字节计算汉明距离)，距离不超过 hit_distance 且缩略图差异不超过
+    thumb_threshold 时命中；离线包是固定快照，不按请求的缓存天数过滤
+    """
+
+    def __init__(self, path: str | Path, hit_distance: int = 2, thumb_threshold: float = 1.0):
+        self.path = Path(path)
+        self.hit_distance = hit_distance
+        self.thumb_threshold = thumb_threshold
+        self.metrics = BundleMetrics()
+
+        with self.path.open('rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, meta_len = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError(f'{self.path} is not a cache bundle (version {VERSION})')
+        self.meta: dict = orjson.loads(self._mmap[_HEADER.size:_HEADER.size + meta_len])
+        self.presets: list[str] = self.meta['presets']
+        sections = {
+            name: np.frombuffer(self._mmap, dtype=np.dtype(dtype), count=int(np.prod(shape)), offset=offset)
+            .reshape(shape)
+            for name, (offset, dtype, shape) in self.meta['sections'].items()
+        }
+        self.hashes: np.ndarray = sections['hashes']
+        self.preset_codes: np.ndarray = sections['presets']
+        self.timestamps: np.ndarray = sections['timestamps']
+        self.thumbs: np.ndarray = sections['thumbs']
+        self.vectors: np.ndarray = sections['vectors']
+        self.offsets: np.ndarray = sections['offsets']
+        self.blobs: np.ndarray = sections['blobs']
+
+    def __len__(self) -> int:
+        return self.meta['count']
+
+    def record(self, i: int) -> dict:
+        """第 i 条记录的解析结果，格式与向量数据库查询结果一致"""
+        data = orjson.loads(zlib.decompress(self.blobs[int(self.offsets[i]):int(self.offsets[i + 1])]))
+        return {**data, 'timestamp': int(self.timestamps[i]), 'preset': self.presets[self.preset_codes[i]]}
+
+    def records(self) -> Iterable[BundleRecord]:
+        for i in range(len(self)):
+            record = self.record(i)
+            yield BundleRecord(
+                dhash=int(self.hashes[i]),
+                thumb=self.thumbs[i].copy(),
+                vector=self.vectors[i].astype(np.float32),
+                preset=record['preset'],
+                timestamp=record['timestamp'],
+                elements=record['elements'],
+                labeled_url=record['labeled_url'],
+                image_url=record['image_url'],
+                key=record['key'],
+            )
+
+    def lookup(self, key: int, thumb: np.ndarray, preset: str) -> dict | None:
+        """
+        Args:
+            key: 查询截图的 dHash
+            thumb: 查询截图的缩略图
+            preset: 只匹配相同预设的记录
+        """
+        self.metrics.lookups += 1
+        if preset not in self.presets or not len(self):
+            return None
+        distances = hamming_many(self.hashes, key)
+        preset_code = self.presets.index(preset)
+        candidates = np.flatnonzero((distances <= self.hit_distance) & (self.preset_codes == preset_code))
+        for i in candidates[np.argsort(distances[candidates], kind='stable')]:
+            if thumb_distance(self.thumbs[i], thumb) <= self.thumb_threshold:
+                self.metrics.hits += 1
+                return self.record(i)
+        return None
+
+    def snapshot(self) -> dict:
+        return {'path': str(self.path), 'entries': len(self), 'created': self.meta['created'],
+                **self.metrics.snapshot()}
+
+    def close(self):
+        # 数组引用映射内存，先释放再关闭
+        self.hashes = self.preset_codes = self.timestamps = self.thumbs = None
+        self.vectors = self.offsets = self.blobs = None
+        self._mmap.close()
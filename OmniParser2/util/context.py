@@ -1,11 +1,11 @@
 from asyncio.tasks import Task
 from contextvars import ContextVar
-from io import BytesIO
 from typing import Optional
 
 from PIL import Image
 from pydantic import BaseModel, Field, ConfigDict
 
+from util.image import ImageSource
 from util.timer import TimerRecorder
 
 trace_id_var: ContextVar[str] = ContextVar('trace_id')
@@ -14,8 +14,11 @@ context_var: ContextVar[Optional['Context']] = ContextVar('context', default=Non
 
 class Context(BaseModel):
     model_config = ConfigDict(arbitrary_types_allowed=True)
-    image: Image.Image = None
+    source: ImageSource | None = Field(default=None, description='一次解码、各阶段共享的请求图片')
     image_upload_task: Task | None = None
-    image_buffer: BytesIO | None = None
     qsize: int = 0
     timer_recorder: TimerRecorder = Field(default_factory=TimerRecorder, description='耗时记录器')
+
+    @property
+    def image(self) -> Image.Image | None:
+        return self.source.image if self.source else None
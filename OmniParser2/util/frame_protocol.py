@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/20 01:10
+"""
+同机部署时 agent 与解析服务之间的二进制帧协议(Unix domain socket)
+
+请求帧::
+
+    magic(4B) | 消息类型(u8) | 图片格式(u8) | 通道数(u8) | 保留(1B) | 宽(u32) | 高(u32) | meta 长度(u32) | body 长度(u64)
+    meta: JSON，解析请求为 {"params": {...}, "trace_id": "...", "name": "..."}
+    body: 编码后的图片字节(PNG/WebP/JPEG)或 HxWxC 的原始像素(RGB/RGBA)
+
+响应帧::
+
+    magic(4B) | 状态码(u16，与 HTTP 状态码一致) | 保留(2B) | meta 长度(u32) | body 长度(u64)
+    meta: JSON，解析结果除元素外的字段；出错时为 {"msg": "..."}
+    body: 元素的二进制列式数据，见 encode_columns
+
+同一连接可顺序发送多个请求，整数均为小端序
+"""
+import asyncio
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import numpy as np
+import orjson
+from loguru import logger
+
+MAGIC = b'OPF1'
+REQUEST = struct.Struct('<4sBBBxIIIQ')
+RESPONSE = struct.Struct('<4sHxxIQ')
+
+# 消息类型
+PARSE = 1
+CAPTION = 2
+
+# 图片格式
+ENCODED = 0  # PNG/WebP/JPEG 等编码后的图片
+RAW = 1  # 原始像素，通道数为 3(RGB) 或 4(RGBA)
+
+# 二进制列的类型码，与 Python array 模块一致，客户端无需 NumPy 即可解码
+TYPECODES = {'f': '<f4', 'B': 'u1', 'b': 'i1', 'I': '<u4'}
+
+
+class FrameError(Exception):
+    """帧格式错误，连接无法继续使用"""
+
+
+@dataclass
+class Frame:
+    """一个请求帧"""
+    type: int
+    image_format: int
+    channels: int
+    width: int
+    height: int
+    meta: dict
+    body: bytes
+
+
+# 请求处理函数：返回 (状态码, meta, body)
+FrameHandler = Callable[[Frame], Awaitable[tuple[int, dict, bytes]]]
+
+
+async def read_request(reader: asyncio.StreamReader, max_bytes: int) -> Frame:
+    """读取一个请求帧，连接正常关闭时抛出 asyncio.IncompleteReadError"""
+    header = await reader.readexactly(REQUEST.size)
+    magic, msg_type, image_format, channels, width, height, meta_len, body_len = REQUEST.unpack(header)
+    if magic != MAGIC:
+        raise FrameError(f'bad magic: {magic!r}')
+    if meta_len + body_len > max_bytes:
+        raise FrameError(f'frame too large: {meta_len + body_len} bytes')
+    meta = orjson.loads(await reader.readexactly(meta_len)) if meta_len else {}
+    body = await reader.readexactly(body_len) if body_len else b''
+    return Frame(msg_type, image_format, channels, width, height, meta, body)
+
+
+def write_response(writer: asyncio.StreamWriter, status: int, meta: dict, body: bytes = b''):
+    meta_bytes = orjson.dumps(meta, option=orjson.OPT_SERIALIZE_NUMPY)
+    writer.writelines([RESPONSE.pack(MAGIC, status, len(meta_bytes), len(body)), meta_bytes, body])
+
+
+def encode_columns(data: dict) -> tuple[dict, bytes]:
+    """
+    ElementColumns.to_columnar 的结果编码为二进制段
+
+    - bbox、score 为 float32，type、interactivity 为 uint8，source 为 int8
+    - 空间关系为 CSR：{name}.offsets(n+1 个 uint32) 与 {name}(uint32 元素 id)
+    - content、legend 等文本保留在 meta 中
+
+    Returns:
+        (meta, body)，meta['fields'] 为字段顺序，meta['sections'] 为 [段名, 类型码, 个数]
+    """
+    count = data['count']
+    meta = {'count': count, 'fields': [], 'sections': []}
+    chunks = []
+
+    def add(name: str, typecode: str, values):
+        array = np.ascontiguousarray(values, dtype=TYPECODES[typecode]).reshape(-1)
+        meta['sections'].append([name, typecode, len(array)])
+        chunks.append(array.tobytes())
+
+    for name, values in data.items():
+        if name in ('count', 'legend'):
+            continue
+        meta['fields'].append(name)
+        if name in ('bbox', 'score'):
+            add(name, 'f', values)
+        elif name in ('type', 'interactivity'):
+            add(name, 'B', values)
+        elif name == 'source':
+            add(name, 'b', values)
+        elif name == 'content':
+            meta['content'] = values
+        else:
+            add(f'{name}.offsets', 'I', np.cumsum([0] + [len(ids) for ids in values]))
+            add(name, 'I', [i for ids in values for i in ids])
+    if 'legend' in data:
+        meta['legend'] = data['legend']
+    return meta, b''.join(chunks)
+
+
+class FrameServer:
+    """Unix domain socket 帧协议服务，每个连接顺序处理请求，不同连接并发"""
+
+    def __init__(self, path: str | Path, handler: FrameHandler, max_bytes: int = 64 << 20):
+        self.path = Path(path)
+        self.handler = handler
+        self.max_bytes = max_bytes
+        self._server: asyncio.Server | None = None
+        self._writers: set[asyncio.StreamWriter] = set()
+
+    async def start(self):
+        # 上次异常退出残留的 socket 文件
+        self.path.unlink(missing_ok=True)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._server = await asyncio.start_unix_server(self._serve, path=str(self.path))
+        logger.info(f'frame server listening on unix://{self.path}')
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._writers.add(writer)
+        try:
+            while True:
+                try:
+                    frame = await read_request(reader, self.max_bytes)
+                except asyncio.IncompleteReadError:
+                    break
+                except FrameError as e:
+                    write_response(writer, 400, {'msg': str(e)})
+                    await writer.drain()
+                    break
+                status, meta, body = await self.handler(frame)
+                write_response(writer, status, meta, body)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def close(self):
+        if self._server is None:
+            return
+        self._server.close()
+        # 客户端保持的空闲连接不会自行关闭，wait_closed 会一直等待
+        for writer in list(self._writers):
+            writer.close()
+        await self._server.wait_closed()
+        self.path.unlink(missing_ok=True)
@@ -5,11 +5,13 @@
 # @Time : 2025/9/17 20:19
 import math
 import os
+from functools import cached_property
+from io import BytesIO
 from typing import Union, IO, List, Optional
 
 import numpy as np
 import torch
-from PIL import Image, ImageOps
+from PIL import Image
 from loguru import logger
 import cv2
 
@@ -31,86 +33,140 @@ class ImageUtil:
             self,
             dominance_threshold: float = 0.9,
             color_bits_to_reduce: int = 6,
-            crop_padding: tuple[float, float, float, float] | None = None) -> bool:
+            crop_padding: tuple[float, float, float, float] | None = None,
+            sample_size: int = 256) -> bool:
         """
         通过分析图像像素的颜色分布来判断截图是否为加载中或空白页面。
 
         主要逻辑是：如果图像中绝大多数像素点是同一种或非常相似的颜色，那么我们认为它是一个加载中/空白页面。
 
         :param crop_padding: left, upper, right, and lower pixel ratios to crop from the image.
-        :param dominance_threshold: 单一颜色占比的阈值，超过这个值则认为是加载页。默认为 0.95 (95%)。
+        :param dominance_threshold: 单一颜色占比的阈值，超过这个值则认为是加载页。默认为 0.9 (90%)。
         :param color_bits_to_reduce: 颜色通道的位数，用于合并相似颜色。值越小，颜色种类越少。
-                                     例如，4 表示每个通道有 2^4=16 个色阶。默认为 4。
+                                     例如，4 表示每个通道有 2^4=16 个色阶。默认为 6。
+        :param sample_size: 统计前将图像缩小到该边长以内，颜色占比对采样不敏感
         :return: 如果判断为加载页面，返回 True；否则返回 False。
         """
+        dominant_color_rgb, dominance_ratio = self.dominant_color(color_bits_to_reduce, crop_padding, sample_size)
+        is_loading = dominance_ratio >= dominance_threshold
+
+        logger.info(f"is loading: {is_loading}, dominance color: {dominant_color_rgb}  ratio: {dominance_ratio}")
+
+        return is_loading
+
+    def dominant_color(
+            self,
+            color_bits_to_reduce: int = 6,
+            crop_padding: tuple[float, float, float, float] | None = None,
+            sample_size: int = 256) -> tuple[tuple[int, int, int], float]:
+        """
+        统计裁剪、降采样后图像中占比最高的颜色
 
-        # 1. 降低颜色深度，将相似的颜色合并
-        # posterize 会将每个颜色通道的位数减少到指定值
-        # 这有助于处理因压缩或微小渐变导致的颜色差异
+        :return: (主要颜色 rgb, 主要颜色占比)
+        """
+        # 降低颜色深度，将相似的颜色合并，有助于处理因压缩或微小渐变导致的颜色差异
         if color_bits_to_reduce < 1 or color_bits_to_reduce > 8:
             raise ValueError("color_bits_to_reduce 必须在 1 到 8 之间")
+        crop_box = self.content_box(self.image.width, self.image.height, crop_padding)
+
+        # 裁剪与降采样在一次 resize 中完成，NEAREST 不混合像素，保持原始颜色
+        crop_w, crop_h = crop_box[2] - crop_box[0], crop_box[3] - crop_box[1]
+        step = max(1, math.ceil(max(crop_w, crop_h) / sample_size))
+        size = (max(1, int(crop_w // step)), max(1, int(crop_h // step)))
+        sample = self.image.resize(size, Image.Resampling.NEAREST, box=crop_box)
+        return self.dominant_color_of_array(np.asarray(sample.convert('RGB')), color_bits_to_reduce)
+
+    @staticmethod
+    def content_box(
+            width: int,
+            height: int,
+            crop_padding: tuple[float, float, float, float] | None = None) -> tuple[float, float, float, float]:
+        """去除状态栏、导航栏等边缘区域后的内容区域 (x1, y1, x2, y2)"""
         if crop_padding is None:
-            if self.image.width > self.image.height:
+            if width > height:
                 # 如果图像宽度大于高度，适用PC
                 crop_padding = (0.12, 0.08, 0.02, 0)
             else:
                 # 如果图像高度大于宽度，适用手机
                 crop_padding = (0, 0.12, 0, 0.08)
 
-        crop_box = (
-            self.image.width * crop_padding[0],
-            self.image.height * crop_padding[1],
-            self.image.width - self.image.width * crop_padding[2],
-            self.image.height - self.image.height * crop_padding[3]
+        return (
+            width * crop_padding[0],
+            height * crop_padding[1],
+            width - width * crop_padding[2],
+            height - height * crop_padding[3]
         )
 
-        # 用于debug
-        # x1, y1, x2, y2 = crop_box
-        # draw = ImageDraw.Draw(self.image)
-        # draw.line([(x1, y1), (x2, y1)], fill='red', width=6)
-        # draw.line([(x2, y1), (x2, y2)], fill='red', width=6)
-        # draw.line([(x2, y2), (x1, y2)], fill='red', width=6)
-        # draw.line([(x1, y2), (x1, y1)], fill='red', width=6)
-        # self.image.show()
-
-        image = self.image.crop(crop_box)
-        image = ImageOps.posterize(image, color_bits_to_reduce)
-        total_pixels = image.width * image.height
-
-        # 2. 高效地获取所有像素的颜色及其数量
-        # getcolors() 返回一个列表，每个元素是 (count, (r, g, b))
-        colors = image.getcolors(maxcolors=total_pixels)
+    @staticmethod
+    def dominant_color_of_array(
+            image_np: np.ndarray,
+            color_bits_to_reduce: int = 6) -> tuple[tuple[int, int, int], float]:
+        """
+        使用直方图统计 RGB 数组中占比最高的颜色，替代 getcolors(maxcolors=total_pixels) 的逐色排序
 
-        # 3. 找到最主要的颜色
-        # getcolors 返回的列表未按数量排序，因此需要手动排序
-        colors.sort(key=lambda item: item[0], reverse=True)
-        dominant_color_count, dominant_color_rgb = colors[0]
+        :param image_np: HxWx3 uint8 数组
+        :param color_bits_to_reduce: 每个颜色通道保留的位数，等价于 ImageOps.posterize
+        :return: (主要颜色 rgb, 主要颜色占比)
+        """
+        bits = color_bits_to_reduce
+        shift = 8 - bits
+        channels = (image_np.reshape(-1, 3) >> shift).astype(np.uint32)
+        # 将三个通道打包成一个整数编码，再做一维直方图
+        codes = (channels[:, 0] << (2 * bits)) | (channels[:, 1] << bits) | channels[:, 2]
+        if codes.size == 0:
+            return (0, 0, 0), 0.0
 
-        # 4. 计算最主要颜色的占比
-        dominance_ratio = dominant_color_count / total_pixels
+        if bits <= 6:
+            # 2^18 个桶以内直接 bincount
+            counts = np.bincount(codes, minlength=1 << (3 * bits))
+            code = int(counts.argmax())
+            count = int(counts[code])
+        else:
+            values, counts = np.unique(codes, return_counts=True)
+            argmax = int(counts.argmax())
+            code, count = int(values[argmax]), int(counts[argmax])
 
-        # 5. 判断占比是否超过阈值
-        is_loading = dominance_ratio >= dominance_threshold
+        mask = (1 << bits) - 1
+        rgb = (
+            ((code >> (2 * bits)) & mask) << shift,
+            ((code >> bits) & mask) << shift,
+            (code & mask) << shift,
+        )
+        return rgb, count / codes.size
 
-        logger.info(f"is loading: {is_loading}, dominance color: {dominant_color_rgb}  ratio: {dominance_ratio}")
+    @staticmethod
+    def edge_ratio_of_array(image_np: np.ndarray, edge_threshold: int = 24) -> float:
+        """
+        统计 RGB 数组中边缘像素的占比，区分纯色空白页与只有少量文字、边框的稀疏页面
 
-        return is_loading
+        :param image_np: HxWx3 uint8 数组
+        :param edge_threshold: 相邻像素任一通道差值达到该值时视为边缘
+        :return: 水平、垂直方向边缘像素数之和与像素总数之比
+        """
+        if image_np.size == 0:
+            return 0.0
+        pixels = image_np.astype(np.int16)
+        dx = np.abs(np.diff(pixels, axis=1)).max(axis=2)
+        dy = np.abs(np.diff(pixels, axis=0)).max(axis=2)
+        edges = int((dx >= edge_threshold).sum()) + int((dy >= edge_threshold).sum())
+        return edges / (image_np.shape[0] * image_np.shape[1])
 
     @staticmethod
     def crop_images(
-            image: Image.Image,
+            image: Image.Image | np.ndarray,
             bboxes: list[list[float]],
     ) -> list[Image.Image]:
         """
         根据边界框裁剪图像
         Args:
-            image (Image.Image): 原始图像。
+            image (Image.Image | np.ndarray): 原始图像，ndarray 为 HxWx3 RGB 数组，仅拷贝裁剪区域。
             bboxes (list[list[float]]): 边界框列表 [x1, y1, x2, y2] (相对坐标)。
 
         Returns:
             list[Image.Image]: 裁剪后的 PIL 图像列表。
         """
-        w, h = image.size
+        is_array = isinstance(image, np.ndarray)
+        h, w = image.shape[:2] if is_array else (image.height, image.width)
         cropped_images = []
         for bbox in bboxes:
             x1, y1, x2, y2 = np.array(bbox, np.float16) * [w, h, w, h]
@@ -118,7 +174,7 @@ class ImageUtil:
             x1, y1 = int(x1), int(y1)
             x2, y2 = min(math.ceil(x2), w), min(math.ceil(y2), h)
 
-            crop = image.crop((x1, y1, x2, y2))
+            crop = Image.fromarray(image[y1:y2, x1:x2]) if is_array else image.crop((x1, y1, x2, y2))
             cropped_images.append(crop)
         return cropped_images
 
@@ -153,3 +209,90 @@ class ImageUtil:
             )
 
         return cv2.cvtColor(gray, cv2.COLOR_GRAY2RGB)
+
+
+class ImageSource:
+    """
+    一次解码、各阶段共享的请求图片
+
+    原始字节只保留一份，像素只解码一次为连续的只读 RGB 数组，
+    OCR、目标检测、裁剪、加载中检测等阶段均使用该数组的视图，不再重复解码或拷贝整图；
+    标注、缓存查询等需要 PIL 图像的阶段共享同一个按需创建的 PIL 图像。
+    """
+
+    def __init__(self, array: np.ndarray, raw: bytes = b'', name: str = '', encoded: bool = True):
+        array.flags.writeable = False  # 各阶段共享，禁止原地修改
+        self.array = array  # HxWx3 RGB uint8
+        self.raw = raw  # 原始图片字节，用于上传
+        self.name = name
+        self.encoded = encoded  # raw 是否为编码后的图片，原始像素帧为 False
+
+    @classmethod
+    def decode(cls, raw: bytes, name: str = '') -> 'ImageSource':
+        with Image.open(BytesIO(raw)) as image:
+            # 保持所有图片 3 channels
+            array = np.asarray(image if image.mode == 'RGB' else image.convert('RGB'))
+        return cls(array, raw=raw, name=name)
+
+    @classmethod
+    def from_pixels(cls, pixels: bytes, width: int, height: int, channels: int = 3, name: str = '') -> 'ImageSource':
+        """
+        原始像素帧(HxWxC RGB/RGBA)，RGB 直接引用像素字节不解码不拷贝
+
+        raw 为像素字节(内容哈希、上传去重使用)，上传时由像素数组编码为 WebP
+        """
+        if channels not in (3, 4) or len(pixels) != width * height * channels:
+            raise ValueError(f'invalid pixel frame: {width}x{height}x{channels}, {len(pixels)} bytes')
+        array = np.frombuffer(pixels, dtype=np.uint8).reshape(height, width, channels)
+        if channels == 4:
+            array = np.ascontiguousarray(array[..., :3])
+        return cls(array, raw=pixels, name=name, encoded=False)
+
+    @property
+    def size(self) -> tuple[int, int]:
+        """(width, height)，与 PIL Image.size 一致"""
+        h, w = self.array.shape[:2]
+        return w, h
+
+    @cached_property
+    def image(self) -> Image.Image:
+        """PIL 图像，首次访问时创建并在各阶段间共享，使用方不应原地修改"""
+        return Image.fromarray(self.array)
+
+    def buffer(self) -> BytesIO:
+        """原始图片字节的只读文件对象，BytesIO(bytes) 在写入前不拷贝数据"""
+        buffer = BytesIO(self.raw)
+        buffer.name = self.name
+        return buffer
+
+    def crop(self, box: tuple[int, int, int, int]) -> 'ImageSource':
+        """裁剪区域 (x1, y1, x2, y2)，返回共享像素的视图"""
+        x1, y1, x2, y2 = box
+        return ImageSource(self.array[y1:y2, x1:x2], name=self.name)
+
+    def dominant_color(
+            self,
+            color_bits_to_reduce: int = 6,
+            crop_padding: tuple[float, float, float, float] | None = None,
+            sample_size: int = 256) -> tuple[tuple[int, int, int], float]:
+        """与 ImageUtil.dominant_color 相同，使用步长切片在数组视图上完成裁剪与降采样"""
+        if color_bits_to_reduce < 1 or color_bits_to_reduce > 8:
+            raise ValueError("color_bits_to_reduce 必须在 1 到 8 之间")
+        return ImageUtil.dominant_color_of_array(self.sample(crop_padding, sample_size), color_bits_to_reduce)
+
+    def edge_ratio(
+            self,
+            edge_threshold: int = 24,
+            crop_padding: tuple[float, float, float, float] | None = None,
+            sample_size: int = 256) -> float:
+        """在与 dominant_color 相同的降采样图像上统计边缘像素占比，见 ImageUtil.edge_ratio_of_array"""
+        return ImageUtil.edge_ratio_of_array(self.sample(crop_padding, sample_size), edge_threshold)
+
+    def sample(
+            self,
+            crop_padding: tuple[float, float, float, float] | None = None,
+            sample_size: int = 256) -> np.ndarray:
+        """裁剪并以步长切片降采样到 sample_size 边长以内，返回数组视图"""
+        x1, y1, x2, y2 = ImageUtil.content_box(*self.size, crop_padding)
+        step = max(1, math.ceil(max(x2 - x1, y2 - y1) / sample_size))
+        return self.array[int(y1):int(y2):step, int(x1):int(x2):step]
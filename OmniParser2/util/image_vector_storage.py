@@ -6,23 +6,77 @@
 @description: 异步版本的图像向量存储工具类
 """
 import asyncio
+import base64
 import io
-import json
 import time
+import zlib
+from dataclasses import dataclass, field, asdict
 from datetime import datetime, timedelta
 from typing import List, Optional
 
 import clip
 import numpy as np
+import orjson
 import torch
 from PIL import Image
 from loguru import logger
+from pydantic import BaseModel
 from pymilvus import MilvusClient, DataType, AsyncMilvusClient
 
 from util.context import context_var
 from config import settings
 from util.cos import download_file
 from util.image_similarity import most_similar_images, SimilarImage
+from util.perceptual_hash import PerceptualIndex, HashEntry, dhash, thumbnail, to_signed, to_unsigned
+
+
+# 元素数据压缩后 base64 编码存入 VARCHAR 字段(Milvus 无二进制标量类型)，超出长度上限的结果不缓存
+PAYLOAD_MAX_LENGTH = 65535
+
+
+def encode_elements(elements: list[dict]) -> str:
+    return base64.b64encode(zlib.compress(orjson.dumps(elements, option=orjson.OPT_SERIALIZE_NUMPY))).decode('ascii')
+
+
+def decode_elements(payload: str) -> list[dict]:
+    return orjson.loads(zlib.decompress(base64.b64decode(payload)))
+
+
+def partition_name(timestamp: int) -> str:
+    """按自然日分区，过期数据整个分区删除，查询只搜索时间范围内的分区"""
+    return f'd{datetime.fromtimestamp(timestamp):%Y%m%d}'
+
+
+@dataclass
+class CacheEntry:
+    """待写入的解析结果"""
+    image: Image.Image
+    elements: list[dict | BaseModel]  # 元素对象在写入时才序列化，不占用请求耗时
+    labeled_url: str = ""
+    key: str = ""
+    image_url: str = ""
+    preset: str = "balanced"
+    timestamp: int = field(default_factory=lambda: int(time.time()))
+
+
+@dataclass
+class LookupMetrics:
+    """两级缓存查询的命中统计"""
+    lookups: int = 0
+    hash_hits: int = 0  # 感知哈希直接命中
+    hash_misses: int = 0  # 感知哈希确定未命中，跳过 CLIP
+    vector_searches: int = 0  # 进入 CLIP 向量检索
+    vector_hits: int = 0
+
+    def snapshot(self) -> dict:
+        lookups = max(self.lookups, 1)
+        return {
+            **asdict(self),
+            'hash_hit_ratio': round(self.hash_hits / lookups, 4),
+            'hash_miss_ratio': round(self.hash_misses / lookups, 4),
+            'vector_search_ratio': round(self.vector_searches / lookups, 4),
+            'hit_ratio': round((self.hash_hits + self.vector_hits) / lookups, 4),
+        }
 
 
 class AsyncImageVectorStorage:
@@ -41,8 +95,8 @@ class AsyncImageVectorStorage:
         'RN50x64': 1024,
     }
 
-    def __init__(self, host='localhost', port='19530', collection_name='image_info_dynamic',
-                 model=None, preprocess=None, vector_dim=None, device=None):
+    def __init__(self, host='localhost', port='19530', collection_name='image_cache_v2',
+                 model=None, preprocess=None, vector_dim=None, device=None, partitions=None, hash_index=None):
         """
         初始化异步图像向量存储系统
 
@@ -56,6 +110,8 @@ class AsyncImageVectorStorage:
             preprocess: CLIP预处理函数
             vector_dim: 向量维度
             device: 设备类型
+            partitions: 已存在的日期分区
+            hash_index: 第一级感知哈希索引，为 None 时每次查询都使用 CLIP 向量检索
         """
         # 创建异步客户端连接
         self.client = AsyncMilvusClient(uri=f"http://{host}:{port}")
@@ -73,16 +129,27 @@ class AsyncImageVectorStorage:
         self.vector_dim = vector_dim
         self.device = device
 
+        # 已存在的日期分区，新建分区时顺带删除过期分区；其他副本、预热缓存或离线包导入新建的分区定期重新列出
+        self.partitions: set[str] = set(partitions or [])
+        self._partition_lock = asyncio.Lock()
+        self._partitions_listed_at = time.monotonic()
+        # AsyncMilvusClient 没有 list_partitions，使用同步客户端在线程中列出分区
+        self._sync_client: MilvusClient | None = None
+
+        self.hash_index: PerceptualIndex | None = hash_index
+        self.lookup_metrics = LookupMetrics()
+
         if self.model:
             self.model.eval()
 
     @classmethod
-    async def create_instance(cls, host='localhost', port='19530', collection_name='image_info_dynamic',
+    async def create_instance(cls, host='localhost', port='19530', collection_name='image_cache_v2',
                               model_name='ViT-B/32'):
         """
         创建AsyncImageVectorStorage实例的工厂方法
 
         **注意**：更换模型时，若模型输出的维度发生变化，程序将重建collection，请注意备份数据避免数据丢失。
+        旧版本以 JSON 字符串数组存储元素的集合(image_info_dynamic)不再读写，可直接删除。
 
         Args:
             host: Milvus服务器地址
@@ -94,23 +161,9 @@ class AsyncImageVectorStorage:
         Returns:
             AsyncImageVectorStorage实例
         """
-        # 1. 初始化CLIP模型
-        model, preprocess = clip.load(model_name, device=settings.device)
-
-        # 获取特征向量维度
-        vector_dim = cls.model_dim_map[model_name]
-
-        # 2. 使用同步客户端完成初始化操作
-        sync_client = MilvusClient(uri=f"http://{host}:{port}")
-
-        try:
-            # 初始化Collection
-            await cls._init_collection_sync(sync_client, collection_name, vector_dim)
-
-        finally:
-            # 关闭同步客户端连接
-            if hasattr(sync_client, 'close'):
-                sync_client.close()
+        # 1-2. CLIP 模型加载与集合初始化均为阻塞操作，在线程中执行，不阻塞事件循环(启动期间 /health 仍可响应)
+        model, preprocess, vector_dim, partitions, hash_index = await asyncio.to_thread(
+            cls._setup_sync, host, port, collection_name, model_name)
 
         # 3. 创建异步实例
         instance = cls(
@@ -120,7 +173,9 @@ class AsyncImageVectorStorage:
             model=model,
             preprocess=preprocess,
             vector_dim=vector_dim,
-            device=settings.device
+            device=settings.device,
+            partitions=partitions,
+            hash_index=hash_index
         )
 
         # 4. 使用异步客户端加载Collection到内存
@@ -129,8 +184,38 @@ class AsyncImageVectorStorage:
         logger.info(f"异步图像向量存储实例创建成功，使用模型: {model_name}")
         return instance
 
+    @classmethod
+    def _setup_sync(cls, host, port, collection_name: str, model_name: str):
+        """
+        加载 CLIP 模型并使用同步客户端初始化集合
+
+        Returns:
+            (模型, 预处理函数, 向量维度, 保留的日期分区, 感知哈希索引)
+        """
+        # 1. 初始化CLIP模型
+        model, preprocess = clip.load(model_name, device=settings.device)
+
+        # 获取特征向量维度
+        vector_dim = cls.model_dim_map[model_name]
+
+        # 2. 使用同步客户端完成初始化操作
+        sync_client = MilvusClient(uri=f"http://{host}:{port}")
+
+        try:
+            # 初始化Collection
+            cls._init_collection_sync(sync_client, collection_name, vector_dim)
+            partitions = cls._drop_expired_partitions_sync(sync_client, collection_name)
+            hash_index = cls._load_hash_index_sync(sync_client, collection_name) \
+                if settings.milvus_config.hash_tier else None
+
+        finally:
+            # 关闭同步客户端连接
+            if hasattr(sync_client, 'close'):
+                sync_client.close()
+        return model, preprocess, vector_dim, partitions, hash_index
+
     @staticmethod
-    async def _init_collection_sync(sync_client: MilvusClient, collection_name: str, vector_dim: int):
+    def _init_collection_sync(sync_client: MilvusClient, collection_name: str, vector_dim: int):
         """使用同步客户端初始化Collection"""
         if sync_client.has_collection(collection_name):
             # 检查现有集合的schema
@@ -138,10 +223,24 @@ class AsyncImageVectorStorage:
 
             # 检查向量维度是否匹配（如更换模型，数据库将重建，请注意备份数据）
             vector_field = next((f for f in collection_info['fields'] if f['name'] == "vector"), None)
-            if vector_field and vector_field.get('params', {}).get('dim') != vector_dim:
-                logger.info(f"检测到向量维度不匹配，重建collection...")
+            field_names = {f['name'] for f in collection_info['fields']}
+            if (vector_field and vector_field.get('params', {}).get('dim') != vector_dim
+                    or not {'payload', 'dhash'} <= field_names):
+                logger.info(f"检测到向量维度或schema不匹配，重建collection...")
                 sync_client.drop_collection(collection_name)
                 AsyncImageVectorStorage._create_collection_sync(sync_client, collection_name, vector_dim)
+                return
+
+            # 索引类型与配置不一致时重建向量索引
+            config = settings.milvus_config
+            index_info = sync_client.describe_index(collection_name, index_name="vector")
+            if index_info.get('index_type') != config.index_type:
+                logger.info(f"向量索引 {index_info.get('index_type')} 与配置 {config.index_type} 不一致，重建索引...")
+                sync_client.release_collection(collection_name)
+                sync_client.drop_index(collection_name, index_name="vector")
+                index_params = sync_client.prepare_index_params()
+                AsyncImageVectorStorage._add_vector_index(index_params)
+                sync_client.create_index(collection_name, index_params)
         else:
             AsyncImageVectorStorage._create_collection_sync(sync_client, collection_name, vector_dim)
 
@@ -156,26 +255,19 @@ class AsyncImageVectorStorage:
 
         # 添加字段
         schema.add_field(field_name="id", datatype=DataType.INT64, is_primary=True)  # 主键，自增
-        schema.add_field(  # 元素数据字段，使用ARRAY类型存储JSON字符串
-            field_name="element_data",
-            datatype=DataType.ARRAY,
-            element_type=DataType.VARCHAR,
-            max_capacity=1000,
-            max_length=65535
-        )
+        # 元素数据字段，元素列表 JSON 压缩后的 base64 字符串，不限元素个数
+        schema.add_field(field_name="payload", datatype=DataType.VARCHAR, max_length=PAYLOAD_MAX_LENGTH)
         schema.add_field(field_name="labeled_url", datatype=DataType.VARCHAR, max_length=1000)  # 标注后的图片URL
+        schema.add_field(field_name="image_url", datatype=DataType.VARCHAR, max_length=1000)  # 原始图片URL
         schema.add_field(field_name="vector", datatype=DataType.FLOAT_VECTOR, dim=vector_dim)  # 图片转换的向量字段
         schema.add_field(field_name="timestamp", datatype=DataType.INT64)  # 时间戳
         schema.add_field(field_name="key", datatype=DataType.VARCHAR, max_length=100)  # 来源key
+        schema.add_field(field_name="preset", datatype=DataType.VARCHAR, max_length=32)  # 速度/精度预设
+        schema.add_field(field_name="dhash", datatype=DataType.INT64)  # 64 位感知哈希，启动时加载到内存索引
 
         # 创建索引参数
         index_params = sync_client.prepare_index_params()
-        index_params.add_index(
-            field_name="vector",
-            index_type="IVF_FLAT",  # 使用IVF_FLAT索引
-            metric_type="COSINE",  # 使用余弦相似度
-            params={"nlist": 128}
-        )
+        AsyncImageVectorStorage._add_vector_index(index_params)
         # 为timestamp字段添加索引
         index_params.add_index(
             field_name="timestamp",
@@ -191,18 +283,144 @@ class AsyncImageVectorStorage:
 
         logger.info(f"成功创建集合: {collection_name}")
 
-    def _image_to_vector(self, image: io.BytesIO) -> np.ndarray:
+    @staticmethod
+    def _add_vector_index(index_params):
+        """按配置添加向量索引：HNSW 查询耗时随数据量近似对数增长；IVF 需按数据量调整 nlist 与 nprobe"""
+        config = settings.milvus_config
+        if config.index_type == 'HNSW':
+            params = {"M": config.hnsw_m, "efConstruction": config.hnsw_ef_construction}
+        else:
+            params = {"nlist": config.ivf_nlist}
+        index_params.add_index(
+            field_name="vector",
+            index_name="vector",
+            index_type=config.index_type,
+            metric_type="COSINE",  # 使用余弦相似度
+            params=params
+        )
+
+    @staticmethod
+    def _search_params(limit: int) -> dict:
+        config = settings.milvus_config
+        if config.index_type == 'HNSW':
+            # ef 不能小于返回条数
+            return {"metric_type": "COSINE", "params": {"ef": max(config.hnsw_ef, limit)}}
+        return {"metric_type": "COSINE", "params": {"nprobe": config.ivf_nprobe}}
+
+    @staticmethod
+    def _expired_before() -> str:
+        """早于该名称的日期分区已过期"""
+        return partition_name(int((datetime.now() - timedelta(days=settings.milvus_config.retention_days)).timestamp()))
+
+    @staticmethod
+    def _drop_expired_partitions_sync(sync_client: MilvusClient, collection_name: str) -> list[str]:
+        """删除过期的日期分区，返回保留的日期分区"""
+        expired_before = AsyncImageVectorStorage._expired_before()
+        partitions = []
+        for name in sync_client.list_partitions(collection_name):
+            if not name.startswith('d'):
+                continue  # _default 分区
+            if name < expired_before:
+                sync_client.release_partitions(collection_name, [name])
+                sync_client.drop_partition(collection_name, name)
+                logger.info(f"删除过期分区: {name}")
+            else:
+                partitions.append(name)
+        return partitions
+
+    @staticmethod
+    def _load_hash_index_sync(sync_client: MilvusClient, collection_name: str) -> PerceptualIndex:
+        """加载保留期内全部记录的感知哈希，记录数不超过上限时索引完整，可据此排除未命中"""
+        config = settings.milvus_config
+        index = PerceptualIndex(
+            hit_distance=config.hash_hit_distance,
+            miss_distance=config.hash_miss_distance,
+            thumb_threshold=config.hash_thumb_threshold,
+            max_entries=config.hash_max_entries,
+        )
+        st = time.perf_counter()
+        since = int((datetime.now() - timedelta(days=config.retention_days)).timestamp())
+        sync_client.load_collection(collection_name)
+        iterator = sync_client.query_iterator(
+            collection_name,
+            batch_size=10000,
+            filter=f"timestamp >= {since}",
+            output_fields=["dhash", "preset", "timestamp"]
+        )
+        index.complete = config.hash_rule_out_misses
+        try:
+            while rows := iterator.next():
+                for row in rows:
+                    index.add(to_unsigned(row['dhash']),
+                              HashEntry(id=row['id'], preset=row['preset'], timestamp=row['timestamp']))
+        finally:
+            iterator.close()
+        logger.info(f"加载感知哈希索引: {len(index)} 条，完整: {index.complete}，耗时: {time.perf_counter() - st:.2f}s")
+        return index
+
+    async def _ensure_partition(self, name: str):
+        """按需创建日期分区，每天首次写入时删除过期分区"""
+        if name in self.partitions:
+            return
+        async with self._partition_lock:
+            if name in self.partitions:
+                return
+            await self.client.create_partition(self.collection_name, name)
+            await self.client.load_partitions(self.collection_name, [name])
+            self.partitions.add(name)
+            logger.info(f"创建分区: {name}")
+
+            expired_before = self._expired_before()
+            for expired in sorted(p for p in self.partitions if p < expired_before):
+                try:
+                    await self.client.release_partitions(self.collection_name, [expired])
+                    await self.client.drop_partition(self.collection_name, expired)
+                    self.partitions.discard(expired)
+                    logger.info(f"删除过期分区: {expired}")
+                except Exception as e:
+                    logger.error(f"删除过期分区 {expired} 失败: {e}")
+            if self.hash_index is not None:
+                since = int((datetime.now() - timedelta(days=settings.milvus_config.retention_days)).timestamp())
+                await asyncio.to_thread(self.hash_index.prune, lambda entry: entry.timestamp >= since)
+
+    async def _recent_partitions(self, days_filter: Optional[int]) -> Optional[list[str]]:
+        """最近 N 天的分区，不过滤时返回 None 表示全部分区"""
+        if not days_filter or days_filter <= 0:
+            return None
+        await self._refresh_partitions()
+        since = partition_name(int((datetime.now() - timedelta(days=days_filter)).timestamp()))
+        return sorted(p for p in self.partitions if p >= since)
+
+    async def _refresh_partitions(self):
+        """距上次列出超过 partition_refresh_interval 时重新列出日期分区，失败时沿用已知分区"""
+        now = time.monotonic()
+        if now - self._partitions_listed_at < settings.milvus_config.partition_refresh_interval:
+            return
+        self._partitions_listed_at = now
+        try:
+            names = await asyncio.to_thread(self._list_partitions_sync)
+        except Exception as e:
+            logger.warning(f"列出分区失败: {e!r}")
+            return
+        self.partitions.update(name for name in names if name.startswith('d'))
+
+    def _list_partitions_sync(self) -> list[str]:
+        if self._sync_client is None:
+            self._sync_client = MilvusClient(uri=f"http://{self.host}:{self.port}")
+        return self._sync_client.list_partitions(self.collection_name)
+
+    def _image_to_vector(self, image: io.BytesIO | Image.Image) -> np.ndarray:
         """
         将图像转换为CLIP特征向量
 
         Args:
-            image: io.BytesIO对象,包含图像数据
+            image: io.BytesIO对象(包含图像数据)，或已解码的 PIL 图像
 
         Returns:
             归一化的特征向量
         """
-        # 从BytesIO对象读取图像
-        img = Image.open(image).convert('RGB')
+        # 已解码的图像直接使用，避免重复解码
+        img = image if isinstance(image, Image.Image) else Image.open(image).convert('RGB')
         # 预处理图像
         image_input = self.preprocess(img).unsqueeze(0).to(self.device)
 
@@ -221,96 +439,248 @@ class AsyncImageVectorStorage:
 
         return image_features_np
 
+    def _images_to_vectors(self, images: list[Image.Image]) -> np.ndarray:
+        """批量将图像转换为CLIP特征向量，批量写入时一次前向计算"""
+        image_input = torch.stack([self.preprocess(img) for img in images]).to(self.device)
+        with torch.no_grad():
+            image_features = self.model.encode_image(image_input).cpu().numpy()
+        del image_input
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        return image_features
+
+    @staticmethod
+    def _entry_row(entry: CacheEntry, vector: np.ndarray) -> dict | None:
+        """构建写入行，元素数据压缩后超出字段长度时返回 None"""
+        payload = encode_elements([elem if isinstance(elem, dict) else elem.model_dump() for elem in entry.elements])
+        if len(payload) > PAYLOAD_MAX_LENGTH:
+            logger.warning(f"元素数据压缩后长度 {len(payload)} 超出上限 {PAYLOAD_MAX_LENGTH}，不缓存: {entry.image_url}")
+            return None
+        return {
+            "payload": payload,
+            "labeled_url": entry.labeled_url,
+            "image_url": entry.image_url,
+            "vector": vector.tolist(),
+            "timestamp": entry.timestamp,
+            "key": entry.key,
+            "preset": entry.preset,
+            "dhash": to_signed(dhash(entry.image)),
+        }
+
+    def images_to_vectors(self, images: list[Image.Image]) -> np.ndarray:
+        """批量计算图片向量，供批量查重后写入时复用"""
+        return self._images_to_vectors(images)
+
+    async def find_duplicates(
+            self,
+            vectors: np.ndarray,
+            presets: list[str],
+            days_filter: Optional[int] = 1
+    ) -> list[bool]:
+        """
+        按向量相似度阈值判断是否重复：与同批次之前的图片重复，或最近 days_filter 天内已存在
+
+        只比较向量，不下载原图做像素比对，一次 search 检查整批
+
+        Args:
+            vectors: 图片向量
+            presets: 各图片的解析预设，只与相同预设的结果比较
+            days_filter: 检查的天数，为 None 或 0 时检查全部记录
+        """
+        threshold = settings.milvus_config.threshold
+        normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True).clip(min=1e-12)
+        similarity = normalized @ normalized.T
+        presets = np.array(presets)
+        duplicates = [
+            bool(((similarity[i, :i] >= threshold) & (presets[:i] == presets[i])).any()) for i in range(len(vectors))
+        ]
+
+        partitions = await self._recent_partitions(days_filter)
+        if partitions is not None and not partitions:
+            return duplicates
+        for preset in set(presets.tolist()):
+            indices = [i for i in range(len(vectors)) if presets[i] == preset and not duplicates[i]]
+            if not indices:
+                continue
+            results = await self.client.search(
+                collection_name=self.collection_name,
+                data=vectors[indices].tolist(),
+                limit=1,
+                search_params=self._search_params(1),
+                partition_names=partitions,
+                filter=f'preset == "{preset}"'
+            )
+            for i, hits in zip(indices, results):
+                duplicates[i] = len(hits) > 0 and hits[0]['distance'] >= threshold
+        return duplicates
+
+    async def store_many(
+            self,
+            entries: list[CacheEntry],
+            vectors: Optional[np.ndarray] = None,
+            check_exist: bool = False
+    ) -> int:
+        """
+        批量存储解析结果，同一日期分区的记录一次 insert 写入
+
+        Args:
+            entries: 待写入的解析结果
+            vectors: 已计算的图片向量，为 None 时批量计算
+            check_exist: 是否跳过重复的结果
+
+        Returns:
+            实际写入的条数
+        """
+        if not entries:
+            return 0
+        if vectors is None:
+            vectors = await asyncio.to_thread(self._images_to_vectors, [entry.image for entry in entries])
+        if check_exist:
+            duplicates = await self.find_duplicates(vectors, [entry.preset for entry in entries])
+            if any(duplicates):
+                logger.info(f"跳过 {sum(duplicates)} 条重复的解析结果")
+            entries = [entry for entry, duplicate in zip(entries, duplicates) if not duplicate]
+            vectors = vectors[[not duplicate for duplicate in duplicates]]
+
+        rows = await asyncio.to_thread(lambda: [
+            (self._entry_row(entry, vector), thumbnail(entry.image)) for entry, vector in zip(entries, vectors)
+        ])
+        rows = [(row, thumb) for row, thumb in rows if row is not None]
+        return await self.insert_rows([row for row, _ in rows], [thumb for _, thumb in rows])
+
+    async def insert_rows(self, rows: list[dict], thumbs: Optional[list[np.ndarray]] = None) -> int:
+        """
+        按日期分区批量写入已构建的行(如导入缓存离线包)，不计算向量、不查重
+
+        Args:
+            rows: 与集合字段一致的行
+            thumbs: 各行截图的缩略图，加入感知哈希索引后可直接命中
+
+        Returns:
+            写入的条数
+        """
+        partitions: dict[str, list[tuple[dict, Optional[np.ndarray]]]] = {}
+        for row, thumb in zip(rows, thumbs or [None] * len(rows)):
+            partitions.setdefault(partition_name(row['timestamp']), []).append((row, thumb))
+        for name, items in partitions.items():
+            await self._ensure_partition(name)
+            data = [row for row, _ in items]
+            result = await self.client.insert(collection_name=self.collection_name, data=data, partition_name=name)
+            logger.info(f"成功批量存储 {len(data)} 条解析结果，分区: {name}，插入ID: {result['ids']}")
+            if self.hash_index is not None:
+                for record_id, (row, thumb) in zip(result['ids'], items):
+                    self.hash_index.add(to_unsigned(row['dhash']), HashEntry(
+                        id=record_id, preset=row['preset'], timestamp=row['timestamp'], thumb=thumb))
+        return sum(len(items) for items in partitions.values())
+
     async def store(self,
-                    image: io.BytesIO,
+                    image: io.BytesIO | Image.Image,
                     elements: List[dict],
                     labeled_url: str = "",
                     key: str = "",
                     check_exist: bool = True,
                     custom_timestamp: Optional[int] = None,
-                    image_url: str = ""
+                    image_url: str = "",
+                    preset: str = "balanced"
                     ):
         """
         存储图片和元素信息
 
         Args:
-            image: 图片（io.BytesIO对象，包含图像数据）
+            image: 图片（io.BytesIO对象或已解码的 PIL 图像）
             elements: 元素信息列表，每个元素是一个字典
             labeled_url: 标注后的图片URL
             key: 来源key，用于区分服务调用来源
-            check_exist: 是否按相似度阈值检查重复（true表示只存储不重复的图片）
+            check_exist: 是否检查重复（true表示只存储不重复的图片，最近一天内已存在相似图片时跳过存储）
             custom_timestamp: 自定义时间戳，如果为None则使用当前时间
             image_url: 原始图片URL
+            preset: 解析使用的速度/精度预设，不同预设的结果互不复用
 
         """
+        image = image if isinstance(image, Image.Image) else Image.open(image).convert('RGB')
         # 将截图转换为向量
         vector = self._image_to_vector(image)
 
         # 如果check_exist为True，则先查询是否已存在相似图片
         if check_exist:
             # 先查询是否已存在相似图片
-            exists = await self.query(image, days_filter=1)
+            exists = await self.query(image, days_filter=1, preset=preset, vector=vector)
             if exists:
                 logger.info("图片已存在，跳过存储")
-
-        # 获取时间戳
-        timestamp = custom_timestamp if custom_timestamp is not None else int(time.time())
-
-        # 将元素列表转换为字符串列表（Milvus ARRAY字段要求）
-        element_strings = [json.dumps(elem, ensure_ascii=False) for elem in elements]
-
-        # 准备插入数据
-        data = [{
-            "element_data": element_strings,
-            "labeled_url": labeled_url,
-            "vector": vector.tolist(),
-            "timestamp": timestamp,
-            "key": key,
-            "image_url": image_url,
-        }]
-
-        # 插入数据
-        result = await self.client.insert(
-            collection_name=self.collection_name,
-            data=data
+                return
+
+        entry = CacheEntry(
+            image=image,
+            elements=elements,
+            labeled_url=labeled_url,
+            key=key,
+            image_url=image_url,
+            preset=preset,
         )
+        if custom_timestamp is not None:
+            entry.timestamp = custom_timestamp
+        await self.store_many([entry], vectors=vector[None, :])
 
-        logger.info(f"成功存储解析结果，包含 {len(elements)} 个元素，"
-                    f"标注后图片的URL: {labeled_url}，"
-                    f"插入ID: {result['ids']}, "
-                    f"时间戳: {timestamp}")
-
-    async def query(self, image: io.BytesIO, days_filter: Optional[int] = None) -> Optional[dict]:
+    async def query(self, image: io.BytesIO | Image.Image, days_filter: Optional[int] = None,
+                    preset: str = "balanced", vector: Optional[np.ndarray] = None) -> Optional[dict]:
         """
         查询截图是否已存在，并返回元素信息和标注URL
 
         Args:
-            image: 图片（io.BytesIO对象，包含图像数据）
+            image: 图片（io.BytesIO对象或已解码的 PIL 图像）
             days_filter: 时间过滤，查询最近N天的数据，如果为None或为0则不过滤
+            preset: 解析使用的速度/精度预设，只匹配相同预设的结果
+            vector: 已计算的图片向量，为 None 时根据 image 计算
 
         Returns:
             (是否存在, 包含元素信息和标注URL的字典或None)
             字典格式: {"elements": List[dict], "labeled_url": str}
         """
         context = context_var.get()
-
-        # 将截图转换为向量
-        vector = self._image_to_vector(image)
-
-        # 构建时间过滤表达式
-        filter_expr = None
-        if days_filter is not None and days_filter > 0:
-            # 计算N天前的时间戳
+        image = image if isinstance(image, Image.Image) else Image.open(image).convert('RGB')
+        metrics = self.lookup_metrics
+        metrics.lookups += 1
+
+        # 构建过滤表达式
+        filter_expr = f'preset == "{preset}"'
+        # 只搜索时间范围内的日期分区，查询耗时不随历史数据增长
+        partitions = await self._recent_partitions(days_filter)
+        days_ago = None
+        if partitions is not None:
+            if not partitions:
+                return None
+            # 计算N天前的时间戳，分区按自然日划分，最早的分区需要按时间戳精确过滤
             days_ago = int((datetime.now() - timedelta(days=days_filter)).timestamp())
-            filter_expr = f"timestamp >= {days_ago}"
+            filter_expr = f"timestamp >= {days_ago} and {filter_expr}"
+
+        # 第一级：感知哈希，确定命中或确定未命中时不再计算 CLIP 向量
+        image_hash, image_thumb = None, None
+        if self.hash_index is not None:
+            image_hash, image_thumb, lookup = await asyncio.to_thread(self._hash_lookup, image, preset, days_ago)
+            if lookup.state == 'miss':
+                metrics.hash_misses += 1
+                logger.info("感知哈希未找到相近图片，跳过向量检索")
+                return None
+            if lookup.state == 'hit':
+                cached = await self._get_by_id(lookup.entry.id)
+                if cached is not None:
+                    metrics.hash_hits += 1
+                    logger.info(f"感知哈希命中: 汉明距离 {lookup.distance}，相似图片: {cached.get('image_url')}")
+                    return cached
+
+        # 第二级：CLIP 向量检索
+        metrics.vector_searches += 1
+        if vector is None:
+            vector = self._image_to_vector(image)
 
         # 执行搜索
         results = await self.client.search(
             collection_name=self.collection_name,
             data=[vector.tolist()],
             limit=2,
-            search_params={"metric_type": "COSINE", "params": {"nprobe": 10}},
-            output_fields=["element_data", "labeled_url", "timestamp", "image_url"],
+            search_params=self._search_params(2),
+            output_fields=["payload", "labeled_url", "timestamp", "image_url"],
+            partition_names=partitions,
             filter=filter_expr
         )
 
@@ -328,7 +698,7 @@ class AsyncImageVectorStorage:
                     *[download_file(item['entity']['image_url']) for item in similarities]
                 )
 
-                query_image = Image.open(image)
+                query_image = image if isinstance(image, Image.Image) else Image.open(image)
                 images = [Image.open(io.BytesIO(img)) for img in downloaded_images]
                 similar_results: list[SimilarImage] = (
                     await asyncio.to_thread(most_similar_images, query_image, images)
@@ -336,6 +706,7 @@ class AsyncImageVectorStorage:
                 logger.info(f'图片相似度对比结果: {[item.model_dump() for item in similar_results]}')
 
                 most_similarity = similar_results[0]
+                record_id = similarities[most_similarity.corpus_id]['id']
                 entity = similarities[most_similarity.corpus_id]['entity']
                 logger.info(f"对比图片: {await context.image_upload_task}")
                 logger.info(f"相似图片: {entity['image_url']}")
@@ -343,9 +714,13 @@ class AsyncImageVectorStorage:
                 if most_similarity.score >= settings.milvus_config.similarity_threshold:
                     # 找到相似图片
                     logger.info(f"图片匹配成功: 相似度 {most_similarity.score}")
-                    element_strings = entity['element_data']
-                    # 将字符串列表转换回字典列表
-                    elements = [json.loads(s) for s in element_strings]
+                    # 解压元素数据
+                    elements = decode_elements(entity.pop('payload'))
+                    metrics.vector_hits += 1
+                    if image_hash is not None:
+                        # 记录查询图片的哈希，相同画面再次查询时由第一级直接命中
+                        self.hash_index.add(image_hash, HashEntry(
+                            id=record_id, preset=preset, timestamp=entity['timestamp'], thumb=image_thumb))
 
                     # 清理临时变量
                     del query_image, images, downloaded_images, similar_results
@@ -361,6 +736,24 @@ class AsyncImageVectorStorage:
         # 未找到相似图片
         return None
 
+    def _hash_lookup(self, image: Image.Image, preset: str, since: Optional[int]):
+        """计算感知哈希与缩略图并查询第一级索引，BK 树查询随索引规模增长，不在事件循环中执行"""
+        image_hash, image_thumb = dhash(image), thumbnail(image)
+        return image_hash, image_thumb, self.hash_index.lookup(image_hash, image_thumb, preset, since=since)
+
+    async def _get_by_id(self, record_id: int) -> Optional[dict]:
+        """按记录 id 读取缓存结果，记录已删除时返回 None"""
+        rows = await self.client.get(
+            self.collection_name,
+            ids=[record_id],
+            output_fields=["payload", "labeled_url", "timestamp", "image_url"]
+        )
+        if not rows:
+            return None
+        entity = rows[0]
+        elements = decode_elements(entity.pop('payload'))
+        return {**entity, "elements": elements}
+
     async def _delete_all(self):
         """删除所有数据（谨慎使用）"""
         try:
@@ -376,6 +769,8 @@ class AsyncImageVectorStorage:
         """关闭连接"""
         try:
             await self.client.close()
+            if self._sync_client is not None:
+                self._sync_client.close()
             logger.info("异步连接已关闭")
         except Exception as e:
             logger.error(f"关闭连接失败: {e}")
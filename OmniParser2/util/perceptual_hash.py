@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/19 22:20
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Generic, Iterator, TypeVar
+
+import numpy as np
+from PIL import Image
+
+V = TypeVar('V')
+
+HASH_BITS = 64
+THUMB_SIZE = 32
+
+
+def dhash(image: Image.Image) -> int:
+    """64 位差值哈希：灰度图缩小为 9x8，比较每行相邻像素的亮度"""
+    pixels = np.asarray(image.convert('L').resize((9, 8), Image.Resampling.BILINEAR), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def thumbnail(image: Image.Image) -> np.ndarray:
+    """32x32 灰度缩略图，哈希相近时用于确认两帧是否一致"""
+    return np.asarray(image.convert('L').resize((THUMB_SIZE, THUMB_SIZE), Image.Resampling.BILINEAR), dtype=np.uint8)
+
+
+def thumb_distance(a: np.ndarray, b: np.ndarray) -> float:
+    """缩略图的平均绝对差 (0-255)"""
+    return float(np.abs(a.astype(np.int16) - b.astype(np.int16)).mean())
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def to_signed(value: int) -> int:
+    """无符号 64 位哈希转为有符号整数，存入 INT64 字段"""
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+
+def to_unsigned(value: int) -> int:
+    return value & ((1 << HASH_BITS) - 1)
+
+
+class BKTree(Generic[V]):
+    """
+    汉明距离 BK 树，查询与 key 距离不超过 radius 的全部条目
+
+    子节点按与父节点的距离索引，由三角不等式剪枝，半径较小时只访问少量节点
+    """
+
+    def __init__(self):
+        # 节点: [key, 相同 key 的值列表, {距离: 子节点}]
+        self._root: list | None = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, key: int, value: V):
+        self._size += 1
+        if self._root is None:
+            self._root = [key, [value], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming(key, node[0])
+            if distance == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [key, [value], {}]
+                return
+            node = child
+
+    def search(self, key: int, radius: int) -> list[tuple[int, int, V]]:
+        """Returns: [(距离, key, 值)]，按距离升序"""
+        if self._root is None:
+            return []
+        results = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = hamming(key, node[0])
+            if distance <= radius:
+                results.extend((distance, node[0], value) for value in node[1])
+            for child_distance, child in node[2].items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
+        results.sort(key=lambda item: item[0])
+        return results
+
+    def items(self) -> Iterator[tuple[int, V]]:
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            for value in node[1]:
+                yield node[0], value
+            stack.extend(node[2].values())
+
+
+@dataclass
+class HashEntry:
+    id: int  # 向量数据库中的记录 id
+    preset: str
+    timestamp: int
+    thumb: np.ndarray | None = field(default=None, repr=False)  # 启动时从数据库加载的条目没有缩略图
+
+
+@dataclass
+class HashLookup:
+    state: str  # hit: 命中，miss: 确定未命中，ambiguous: 需要向量检索确认
+    entry: HashEntry | None = None
+    distance: int | None = None
+
+
+class PerceptualIndex:
+    """
+    截图缓存第一级索引：最近缓存记录的感知哈希
+
+    - 哈希距离不超过 hit_distance 且缩略图差异不超过 thumb_threshold 时直接命中，跳过 CLIP 编码与向量检索
+    - 索引覆盖全部缓存记录(complete)时，miss_distance 内没有候选即确定未命中
+    - 其余情况交给 CLIP 向量检索
+
+    查询在线程池中执行，增删与查询由锁互斥
+    """
+
+    def __init__(self, hit_distance: int, miss_distance: int, thumb_threshold: float, max_entries: int):
+        self.hit_distance = hit_distance
+        self.miss_distance = miss_distance
+        self.thumb_threshold = thumb_threshold
+        self.max_entries = max_entries
+        self.tree: BKTree[HashEntry] = BKTree()
+        self.complete = False  # 是否覆盖全部缓存记录，只有完整索引才能排除未命中
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.tree)
+
+    def add(self, key: int, entry: HashEntry):
+        with self._lock:
+            if len(self.tree) >= self.max_entries:
+                # 超出上限后不再完整，不能再据此排除未命中
+                self.complete = False
+                return
+            self.tree.add(key, entry)
+
+    def lookup(self, key: int, thumb: np.ndarray, preset: str, since: int | None = None) -> HashLookup:
+        """
+        Args:
+            key: 查询截图的 dHash
+            thumb: 查询截图的缩略图
+            preset: 只匹配相同预设的记录
+            since: 只匹配该时间戳之后的记录
+        """
+        with self._lock:
+            found = self.tree.search(key, self.miss_distance)
+        candidates = [
+            (distance, entry) for distance, _, entry in found
+            if entry.preset == preset and (since is None or entry.timestamp >= since)
+        ]
+        for distance, entry in candidates:
+            if distance > self.hit_distance:
+                break
+            if entry.thumb is not None and thumb_distance(entry.thumb, thumb) <= self.thumb_threshold:
+                return HashLookup('hit', entry, distance)
+        if not candidates and self.complete:
+            return HashLookup('miss')
+        return HashLookup('ambiguous', distance=candidates[0][0] if candidates else None)
+
+    def prune(self, keep: Callable[[HashEntry], bool]):
+        """删除不满足条件的条目(如过期记录)，BK 树不支持删除，整体重建"""
+        with self._lock:
+            tree = BKTree()
+            for key, entry in self.tree.items():
+                if keep(entry):
+                    tree.add(key, entry)
+            self.tree = tree
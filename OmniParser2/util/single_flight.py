@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/19 19:40
+import asyncio
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+T = TypeVar('T')
+
+
+class SingleFlight(Generic[T]):
+    """
+    合并相同 key 的并发调用：执行期间到达的相同请求等待首个调用的结果，不重复执行
+
+    结果不做缓存，调用结束后相同 key 的新请求重新执行。
+    执行放在独立的 Task 中，发起调用的请求被取消时不影响其他等待者。
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Task[T]] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """
+        Args:
+            key: 请求标识
+            func: 实际执行的协程函数
+
+        Returns:
+            (结果, 是否为共享其他请求的结果)
+        """
+        task = self._calls.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._calls.pop(key) if self._calls.get(key) is t else None)
+        return await asyncio.shield(task), shared
@@ -13,6 +13,7 @@ from abc import ABC, abstractmethod
 from io import BytesIO, StringIO
 from typing import IO, Union, Any
 
+import numpy as np
 from PIL import Image
 from loguru import logger
 from minio import Minio, S3Error
@@ -20,8 +21,9 @@ from qcloud_cos.cos_client import CosS3Client, CosConfig
 
 
 class TinyImg:
-    def __init__(self, fp: Union[IO, BytesIO, StringIO, Any]):
+    def __init__(self, fp: Union[IO, BytesIO, StringIO, Any], image: Image.Image | np.ndarray | None = None):
         self.fp = fp
+        self.image = image  # fp 已解码的像素，存在时转换格式不再重复解码
 
     def is_image(self):
         location = self.fp.tell()
@@ -37,7 +39,12 @@ class TinyImg:
         """WebP 图像格式的最大分辨率为16383 x 16383"""
         location = self.fp.tell()
         try:
-            img = Image.open(self.fp)
+            if self.image is None:
+                img = Image.open(self.fp)
+            elif isinstance(self.image, np.ndarray):
+                img = Image.fromarray(self.image)
+            else:
+                img = self.image
             max_size = max(img.size)
             if max_size > 16383:
                 ratio = 16383 / max_size
@@ -62,11 +69,11 @@ class TinyImg:
 # 策略接口
 class StorageStrategy(ABC):
     @abstractmethod
-    def upload_file(self, file, prefix='', suffix='.png'):
+    def upload_file(self, file, prefix='', suffix='.png', image=None):
         pass
 
     @abstractmethod
-    async def async_upload_file(self, file, prefix='', suffix='.png'):
+    async def async_upload_file(self, file, prefix='', suffix='.png', image=None):
         pass
 
     @staticmethod
@@ -85,13 +92,13 @@ class CosStrategy(StorageStrategy):
         self._client = CosS3Client(_cos_config)
         self.bucket = bucket
 
-    def upload_file(self, file, prefix='', suffix='.png'):
+    def upload_file(self, file, prefix='', suffix='.png', image=None):
         file_md5 = self.get_file_md5(file)
         key = f'{prefix}{file_md5}{suffix}'
 
         try:
             if not self._client.object_exists(self.bucket, key):
-                file = TinyImg(file).to_webp() if suffix == '.png' else file
+                file = TinyImg(file, image).to_webp() if suffix == '.png' else file
                 self._client.put_object(Bucket=self.bucket, Key=key, Body=file)
             cos_url = self._client.get_object_url(self.bucket, key)
             return cos_url
@@ -99,8 +106,8 @@ class CosStrategy(StorageStrategy):
             logger.error(f'上传文件失败：{e}')
             raise e
 
-    async def async_upload_file(self, file, prefix='', suffix='.png'):
-        return await asyncio.to_thread(self.upload_file, file, prefix=prefix, suffix=suffix)
+    async def async_upload_file(self, file, prefix='', suffix='.png', image=None):
+        return await asyncio.to_thread(self.upload_file, file, prefix=prefix, suffix=suffix, image=image)
 
 
 # MinIO策略实现
@@ -122,13 +129,13 @@ class MinioStrategy(StorageStrategy):
             logger.error(f"MinIO服务异常: {err}")
         return False
 
-    def upload_file(self, file, prefix='', suffix='.png'):
+    def upload_file(self, file, prefix='', suffix='.png', image=None):
         file_md5 = self.get_file_md5(file)
         key = f'{prefix}{file_md5}{suffix}'
 
         try:
             if not self.object_exists(key):
-                file = TinyImg(file).to_webp() if suffix == '.png' else file
+                file = TinyImg(file, image).to_webp() if suffix == '.png' else file
                 # 获取文件大小
                 file.seek(0, os.SEEK_END)
                 file_size = file.tell()
@@ -140,8 +147,28 @@ class MinioStrategy(StorageStrategy):
             logger.error(f"上传文件失败: {e}")
             raise e
 
-    async def async_upload_file(self, file, prefix='', suffix='.png'):
-        return await asyncio.to_thread(self.upload_file, file, prefix=prefix, suffix=suffix)
+    async def async_upload_file(self, file, prefix='', suffix='.png', image=None):
+        return await asyncio.to_thread(self.upload_file, file, prefix=prefix, suffix=suffix, image=image)
+
+
+# 本地目录策略实现
+class LocalStrategy(StorageStrategy):
+    def __init__(self, root: str | os.PathLike):
+        self.root = os.path.abspath(root)
+
+    def upload_file(self, file, prefix='', suffix='.png', image=None):
+        file_md5 = self.get_file_md5(file)
+        path = os.path.join(self.root, f'{prefix}{file_md5}{suffix}')
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                # noinspection PyTypeChecker
+                f.write(file.read())
+            file.seek(0)
+        return f'file://{path}'
+
+    async def async_upload_file(self, file, prefix='', suffix='.png', image=None):
+        return await asyncio.to_thread(self.upload_file, file, prefix=prefix, suffix=suffix, image=image)
 
 
 # 主要的存储客户端类
@@ -153,7 +180,7 @@ class StorageClient:
         return f"StorageClient(strategy={self._strategy})"
 
     @classmethod
-    def create_from_config(cls, cos_config, minio_config):
+    def create_from_config(cls, cos_config, minio_config, local_config=None):
         """根据配置创建存储客户端"""
         # 优先使用COS，如果COS配置完整
         if cos_config.secret_id and cos_config.secret_key:
@@ -174,19 +201,37 @@ class StorageClient:
                 region=minio_config.region,
                 secure=minio_config.secure
             )
+        # 都未配置时使用本地目录
+        elif local_config is not None and local_config.dir:
+            strategy = LocalStrategy(local_config.dir)
         else:
-            raise ValueError("未找到有效的存储配置，请检查COS或MinIO环境变量配置")
+            raise ValueError("未找到有效的存储配置，请检查COS、MinIO或LOCAL_STORAGE_DIR环境变量配置")
 
         return cls(strategy)
 
-    def upload_file(self, file, prefix='', suffix='.png'):
-        return self._strategy.upload_file(file, prefix, suffix)
-
-    async def async_upload_file(self, file: IO | Image.Image, prefix='', suffix='.png'):
+    def upload_file(self, file, prefix='', suffix='.png', image=None):
+        return self._strategy.upload_file(file, prefix, suffix, image)
+
+    async def async_upload_file(
+            self,
+            file: IO | Image.Image,
+            prefix='',
+            suffix='.png',
+            image: Image.Image | np.ndarray | None = None
+    ):
+        """
+        上传文件
+
+        Args:
+            file: 文件对象或 PIL 图像
+            prefix: 对象存储 key 前缀
+            suffix: 文件后缀
+            image: file 已解码的像素，转换为 webp 时直接使用，避免重复解码
+        """
         logger.info(f'async upload file...')
         if isinstance(file, Image.Image):
             file, image = BytesIO(), file
             image.save(file, suffix.lstrip('.'))
-        url = await self._strategy.async_upload_file(file, prefix, suffix)
+        url = await self._strategy.async_upload_file(file, prefix, suffix, image)
         logger.info(f'async upload file success: {url}')
         return url
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/19 18:20
+import threading
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, TypeVar
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+
+class TTLCache(Generic[K, V]):
+    """
+    线程安全的 LRU 缓存，条目超过 ttl 秒后过期
+
+    超出 maxsize 时淘汰最久未访问的条目；过期条目在访问或写入时清理，不额外启动线程
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: K) -> bool:
+        return self.get(key) is not None
+
+    def get(self, key: K, default: V | None = None) -> V | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expire_at, value = item
+            if expire_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: K, value: V):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            self._evict()
+
+    def pop(self, key: K, default: V | None = None) -> V | None:
+        with self._lock:
+            item = self._data.pop(key, None)
+            return default if item is None else item[1]
+
+    def _evict(self):
+        now = time.monotonic()
+        # 按访问顺序排列，过期时间与访问顺序不一致，只清理头部已过期的条目
+        while self._data:
+            key, (expire_at, _) = next(iter(self._data.items()))
+            if expire_at > now and len(self._data) <= self.maxsize:
+                break
+            del self._data[key]
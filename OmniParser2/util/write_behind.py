@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/19 21:50
+import asyncio
+from dataclasses import dataclass, asdict
+from typing import Awaitable, Callable, Generic, TypeVar
+
+from loguru import logger
+
+T = TypeVar('T')
+
+_STOP = object()
+
+
+@dataclass
+class WriteBehindMetrics:
+    enqueued: int = 0
+    dropped: int = 0  # 缓冲区已满时丢弃的条目数
+    flushed: int = 0
+    failed: int = 0  # 批量写入失败的条目数
+    batches: int = 0
+
+
+class WriteBehindBuffer(Generic[T]):
+    """
+    写回(write-behind)缓冲区：请求只把条目放入有界队列，后台任务攒批后批量写入
+
+    条目数达到 batch_size 或最早的条目等待超过 flush_interval 秒时写入一批；
+    队列已满时直接丢弃新条目并计数，不阻塞请求；关闭时写入剩余的全部条目。
+    """
+
+    def __init__(
+            self,
+            flush: Callable[[list[T]], Awaitable[None]],
+            batch_size: int = 32,
+            flush_interval: float = 1.0,
+            max_pending: int = 256,
+            name: str = 'write-behind'
+    ):
+        """
+        Args:
+            flush: 批量写入函数
+            batch_size: 单批最大条目数
+            flush_interval: 最长攒批时间(秒)
+            max_pending: 最多缓存的待写入条目数，限制内存占用
+            name: 日志中的名称
+        """
+        self.flush = flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.name = name
+        self.metrics = WriteBehindMetrics()
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def put(self, item: T) -> bool:
+        """放入待写入条目，缓冲区已满或已关闭时丢弃并返回 False"""
+        if self._task is None or self._task.done():
+            self.metrics.dropped += 1
+            return False
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.metrics.dropped += 1
+            logger.warning(f'{self.name} buffer is full, drop item, dropped: {self.metrics.dropped}')
+            return False
+        self.metrics.enqueued += 1
+        return True
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            await self._write(batch)
+            if stop:
+                return
+
+    async def _write(self, batch: list[T]):
+        try:
+            await self.flush(batch)
+        except Exception as e:
+            self.metrics.failed += len(batch)
+            logger.exception(f'{self.name} flush {len(batch)} items failed: {e}')
+            return
+        self.metrics.flushed += len(batch)
+        self.metrics.batches += 1
+
+    async def close(self):
+        """停止接收新条目，写入剩余条目后返回"""
+        if self._task is None or self._task.done():
+            return
+        task, self._task = self._task, None
+        await self._queue.put(_STOP)
+        await task
+
+    def snapshot(self) -> dict:
+        return {**asdict(self.metrics), 'pending': self._queue.qsize()}
@@ -47,8 +47,25 @@ class BrowserConfig(BaseSettings):
 class OmniParserConfig(BaseSettings):
     model_config = SettingsConfigDict(env_file='.env', env_prefix='omni_', extra='ignore')
 
+    # 同机部署时可配置为 unix:///path/to/omni.sock(解析服务的 FRAME_SOCKET_PATH)，截图经 Unix socket 二进制帧传输
     base_url: Optional[str] = 'http://127.0.0.1:8000'
+    # 解析方式: http(调用解析服务，base_url)、local(agent 进程内加载 OmniParser2 模型解析，需安装其依赖)
+    backend: Literal['http', 'local'] = 'http'
+    # local 模式下 OmniParser2 目录，为空时使用仓库中的 OmniParser2
+    local_path: Optional[Path] = None
     key: Optional[str] = ''
+    # 解析速度/精度预设: fast(轻量模型，跳过图标识别)、balanced(默认)、accurate(更高的OCR分辨率)
+    preset: Literal['fast', 'balanced', 'accurate'] = 'balanced'
+    # 截图为加载中/空白页时，等待后重新截图解析的次数与间隔(秒)
+    loading_retries: int = 3
+    loading_retry_interval: float = 1
+    # 解析结果返回格式: columnar(紧凑列式，体积更小、编解码更快)、elements(元素对象列表)
+    response_format: Literal['elements', 'columnar'] = 'columnar'
+    # 需要返回的元素字段，为空时返回全部字段
+    fields: Optional[list[str]] = ['bbox', 'content', 'score',
+                                   'left_elem_ids', 'top_elem_ids', 'right_elem_ids', 'bottom_elem_ids']
+    # 图标识别方式: eager(解析时识别全部图标)、lazy(解析时不识别，由 get_icon_captions 工具按需识别)
+    icon_caption_mode: Literal['eager', 'lazy'] = 'lazy'
 
 
 class Settings(BaseSettings):
@@ -27,10 +27,12 @@ class ScreenInfo(BaseModel):
     """当前屏幕信息"""
     image_url: str = ''
     screen_elements: list[dict] = Field(default_factory=list)
+    parse_id: str = ''  # 图标按需识别时的解析标识
 
     def reset(self):
         self.image_url = ''
         self.screen_elements = []
+        self.parse_id = ''
 
 
 class StepInfo(BaseModel):
@@ -40,8 +42,10 @@ class StepInfo(BaseModel):
     action: str = ''
     params: dict = Field(default_factory=dict)
     image_url: str = ''
+    screenshot_url: str = ''  # 未标注的原始截图，供离线解析(预热缓存等)使用
     planning: Optional['PlanningStep'] = Field(default=None, exclude=True)
     screen_elements: list[dict] = Field(default_factory=list)
+    parse_id: str = Field(default='', exclude=True)  # 图标按需识别时的解析标识
     parallel_tool_calls: bool = Field(default=False, exclude=True)
     is_success: bool = True
 
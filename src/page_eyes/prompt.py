@@ -53,6 +53,7 @@ SYSTEM_PROMPT = """
 1. 文本内容精确匹配（优先级最高）
 2. 如果文本内容不能精确匹配，则根据用户的指令进行模糊匹配（见"模糊匹配策略"）
 3. 相邻元素定位推断（见"空间关系定位"）
+4. 文本内容无法确定目标元素时，调用 `get_icon_captions` 获取 content 为空的候选图标元素的描述后再匹配
 
 ### 模糊匹配策略
 - 优先选择语义相关性最高的元素
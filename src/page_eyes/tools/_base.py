@@ -5,6 +5,7 @@
 # @Time : 2026/2/11 15:24
 import asyncio
 import io
+import json
 import time
 import traceback
 from abc import ABC, abstractmethod
@@ -17,6 +18,7 @@ from loguru import logger
 # noinspection PyProtectedMember
 from loguru._logger import context as logger_context
 from pydantic import TypeAdapter
+from pydantic_core import from_json
 from pydantic_ai import ModelRetry, RunContext, ToolReturn, ImageUrl, Tool
 
 from ..config import default_settings
@@ -26,6 +28,8 @@ from ..deps import AgentDeps, ToolParams, ToolResult, StepInfo, LocationToolPara
     WaitToolParams, LLMLocationToolParams, SwipeForKeywordsToolParams
 from ..device import AndroidDevice, WebDevice, HarmonyDevice, IOSDevice, ElectronDevice
 from ..util.js_tool import JSTool
+from ..util.omni_local import LocalOmniParser
+from ..util.omni_socket import OmniSocketClient, socket_path
 from ..util.storage import Base64Strategy
 
 storage_client = default_settings.storage_client
@@ -131,6 +135,8 @@ class AgentTool(ABC):
     """VLM 模型使用的工具可以以 _vl 结尾, 如 click_vl -> click"""
     OMNI_BASE_URL = default_settings.omni_parser.base_url
     OMNI_KEY = default_settings.omni_parser.key
+    # base_url 为 unix:// 地址时通过 Unix domain socket 帧协议调用
+    OMNI_SOCKET_PATH = socket_path(default_settings.omni_parser.base_url)
 
     @property
     def tools(self) -> list:
@@ -153,40 +159,117 @@ class AgentTool(ABC):
     async def _upload_cos(file: IO[bytes], prefix='page-eyes-agent/', suffix='.png') -> str:
         return await storage_client.async_upload_file(file, prefix=prefix, suffix=suffix)
 
-    async def _parse_element(self, file: Optional[IO[bytes]] = None, image_url: Optional[str] = None):
+    async def _parse_element(
+            self,
+            file: Optional[IO[bytes]] = None,
+            image_url: Optional[str] = None,
+            preset: Optional[str] = None,
+            spatial_relations: bool = True,
+            icon_caption_mode: Optional[str] = None
+    ):
         url = f'{self.OMNI_BASE_URL}/omni/parse/'
         if not file and not image_url:
             raise ValueError('请提供file或image_url')
         trace_id = logger_context.get().get('trace_id')
         headers = {'X-Trace-Id': trace_id} if trace_id else None
+        params = {
+            'key': self.OMNI_KEY,
+            'preset': preset or default_settings.omni_parser.preset,
+            'response_format': default_settings.omni_parser.response_format,
+            'fields': default_settings.omni_parser.fields,
+            'spatial_relations': spatial_relations,
+        }
+        if (icon_caption_mode or default_settings.omni_parser.icon_caption_mode) == 'lazy':
+            params['icon_caption'] = {'mode': 'lazy'}
+        if not spatial_relations and params['fields']:
+            # 未计算空间关系时不请求相关字段，缩小返回体
+            params['fields'] = [name for name in params['fields'] if not name.endswith('_elem_ids')]
+        if default_settings.omni_parser.backend == 'local':
+            # 单机部署：进程内解析，首次调用时加载模型
+            if not file:
+                raise ValueError('local 解析模式请提供file')
+            omni = await asyncio.to_thread(LocalOmniParser.get, default_settings.omni_parser.local_path)
+            parsed_data = await omni.parse(file.read(), params,
+                                           name=Path(getattr(file, 'name', None) or 'screenshot.png').name)
+            parsed_data['parsed_content_list'] = self._decode_columns(parsed_data.pop('parsed_content_columns'))
+            return parsed_data
+        if self.OMNI_SOCKET_PATH:
+            # 同机部署：截图字节直接随二进制帧头发送，元素以二进制列式返回
+            return await OmniSocketClient(self.OMNI_SOCKET_PATH).parse(
+                params,
+                image=file.read() if file else b'',
+                image_url=image_url,
+                trace_id=trace_id,
+                name=Path(getattr(file, 'name', None) or 'screenshot.png').name
+            )
         async with AsyncClient(timeout=300, headers=headers) as client:
-            response = await client.post(url, files={'file': file}, data={'key': self.OMNI_KEY})
+            response = await client.post(url, files={'file': file}, data={'params': json.dumps(params)})
             response.raise_for_status()
-            return response.json()
+            parsed_data = from_json(response.content)
+        if parsed_data.get('parsed_content_columns'):
+            parsed_data['parsed_content_list'] = self._decode_columns(parsed_data.pop('parsed_content_columns'))
+        return parsed_data
 
-    async def get_screen(self, ctx: RunContext[AgentDepsType], parse_element: bool = True) -> ScreenInfo:
+    @staticmethod
+    def _decode_columns(columns: dict) -> list[dict]:
+        """将列式解析结果还原为元素字典列表，下标即元素 id，分类编码按 legend 还原"""
+        legend = columns.pop('legend', {})
+        count = columns.pop('count')
+        for name, values in legend.items():
+            columns[name] = [values[code] for code in columns[name]]
+        return [{'id': i, **{name: values[i] for name, values in columns.items()}} for i in range(count)]
+
+    async def get_screen(
+            self,
+            ctx: RunContext[AgentDepsType],
+            parse_element: bool = True,
+            preset: Optional[str] = None,
+            spatial_relations: bool = True,
+            icon_caption_mode: Optional[str] = None
+    ) -> ScreenInfo:
         image_buffer = await self.screenshot(ctx)
         if parse_element:
-            parsed_data = await self._parse_element(image_buffer)
+            parsed_data = await self._parse_element(image_buffer, preset=preset, spatial_relations=spatial_relations,
+                                                    icon_caption_mode=icon_caption_mode)
+            # 页面加载中/空白页，等待渲染完成后重新截图解析
+            for _ in range(default_settings.omni_parser.loading_retries):
+                if not parsed_data.get('is_loading'):
+                    break
+                logger.info(f'Screen is loading, wait {default_settings.omni_parser.loading_retry_interval}s...')
+                await asyncio.sleep(default_settings.omni_parser.loading_retry_interval)
+                image_buffer = await self.screenshot(ctx)
+                parsed_data = await self._parse_element(image_buffer, preset=preset,
+                                                        spatial_relations=spatial_relations,
+                                                        icon_caption_mode=icon_caption_mode)
             image_url = parsed_data.get('labeled_image_url') or ''
+            screenshot_url = parsed_data.get('image_url') or ''
+            parse_id = parsed_data.get('parse_id') or ''
             parsed_content_list = parsed_data.get('parsed_content_list') or []
             logger.info(f'👁‍🗨 Get screen element：{image_url}')
-            if not parsed_content_list:
+            if parsed_data.get('is_loading'):
+                # 重试后仍判定为加载中时返回解析结果，由模型根据屏幕内容决定后续操作
+                logger.warning(f'Screen is still loading after {default_settings.omni_parser.loading_retries} '
+                               f'retries: {image_url}')
+            elif not parsed_content_list:
                 raise Exception(f'Screen parsed error! {parsed_data}')
         else:
             image_url = await self._upload_cos(image_buffer, suffix=Path(image_buffer.name).suffix)
+            screenshot_url = image_url
+            parse_id = ''
             parsed_content_list = []
             logger.info(f'👁‍🗨 Get screen url：{image_url[:200] + (image_url[200:] and "...")}')
 
         # 将当前屏幕信息记录到上下文
         ctx.deps.context.current_step.image_url = image_url
+        ctx.deps.context.current_step.screenshot_url = screenshot_url
         ctx.deps.context.current_step.screen_elements = parsed_content_list
+        ctx.deps.context.current_step.parse_id = parse_id
         # 仅保留必要的字段给LLM
         parsed_elements = TypeAdapter(list[dict]).dump_python(
             parsed_content_list,
             exclude={'__all__': {'type', 'interactivity', 'source'}}
         )
-        return ScreenInfo(image_url=image_url, screen_elements=parsed_elements)
+        return ScreenInfo(image_url=image_url, screen_elements=parsed_elements, parse_id=parse_id)
 
     async def get_screen_vl(self, ctx: RunContext[AgentDepsType]) -> ScreenInfo:
         """获取当前屏幕信息，仅用于VLm模型"""
@@ -206,7 +289,7 @@ class AgentTool(ABC):
         """
         获取当前屏幕信息，每个元素都有唯一的 ID，单个元素包含以下字段：
         id: 元素ID
-        content: 元素描述信息
+        content: 元素描述信息，未识别的图标元素为空，可通过 get_icon_captions 获取
         left_elem_ids: 该元素左侧的元素列表
         right_elem_ids: 该元素右侧的元素列表
         top_elem_ids: 该元素上方的元素列表
@@ -222,6 +305,44 @@ class AgentTool(ABC):
         )
         return ToolResultWithOutput.success(parsed_elements)
 
+    @tool(vlm=False)
+    async def get_icon_captions(
+            self,
+            ctx: RunContext[AgentDepsType],
+            element_ids: list[int]
+    ) -> ToolResultWithOutput[dict]:
+        """
+        获取图标元素的描述信息，返回 {元素ID: 图标描述}
+        get_screen_info 返回的图标元素 content 为空，仅当文本内容无法确定目标元素时，传入可能的图标元素ID调用该工具
+
+        注意：该工具禁止作为一个单独步骤执行
+        """
+        current_step = ctx.deps.context.current_step
+        if not current_step.parse_id:
+            return ToolResultWithOutput.success({})
+        trace_id = logger_context.get().get('trace_id')
+        headers = {'X-Trace-Id': trace_id} if trace_id else None
+        if default_settings.omni_parser.backend == 'local':
+            omni = await asyncio.to_thread(LocalOmniParser.get, default_settings.omni_parser.local_path)
+            captions = await omni.caption(current_step.parse_id, element_ids)
+        elif self.OMNI_SOCKET_PATH:
+            captions = await OmniSocketClient(self.OMNI_SOCKET_PATH).caption(
+                current_step.parse_id, element_ids, trace_id=trace_id)
+        else:
+            async with AsyncClient(timeout=300, headers=headers) as client:
+                response = await client.post(
+                    f'{self.OMNI_BASE_URL}/omni/caption/',
+                    json={'parse_id': current_step.parse_id, 'ids': element_ids}
+                )
+                response.raise_for_status()
+            captions = {int(k): v for k, v in response.json()['data']['captions'].items()}
+        # 回填到当前屏幕元素，后续操作与步骤记录使用识别后的内容
+        for element in current_step.screen_elements:
+            if element.get('id') in captions:
+                element['content'] = captions[element['id']]
+        logger.info(f'👁‍🗨 Get icon captions：{captions}')
+        return ToolResultWithOutput.success(captions)
+
     @tool(llm=False)
     async def get_screen_info_vl(self, ctx: RunContext[AgentDepsType]) -> ToolReturn:
         """
@@ -262,8 +383,15 @@ class AgentTool(ABC):
         await asyncio.sleep(params.timeout)
         return ToolResult.success()
 
-    async def _parse_screen_keywords(self, ctx: RunContext[AgentDepsType], keywords: list[str]) -> tuple[list, list]:
-        screen_info: ScreenInfo = await self.get_screen(ctx, parse_element=True)
+    async def _parse_screen_keywords(
+            self,
+            ctx: RunContext[AgentDepsType],
+            keywords: list[str],
+            preset: Optional[str] = None
+    ) -> tuple[list, list]:
+        # 关键字检查只需要元素内容，不计算空间关系；图标内容也参与匹配，解析时识别全部图标
+        screen_info: ScreenInfo = await self.get_screen(ctx, parse_element=True, preset=preset,
+                                                        spatial_relations=False, icon_caption_mode='eager')
         elements_str = str(screen_info.screen_elements)
         contains, not_contains = [], []
         for keyword in keywords:
@@ -279,6 +407,11 @@ class AgentTool(ABC):
             keywords: list[str]
     ) -> ToolResult:
         contains, not_contains = await self._parse_screen_keywords(ctx, keywords)
+        if not_contains and default_settings.omni_parser.preset != 'accurate':
+            # 未找到时可能是小字、低对比度文字漏识别，以 accurate 预设重新解析当前屏幕再确认
+            logger.info(f'Keywords not found:"{not_contains}", parse screen again with accurate preset')
+            found, not_contains = await self._parse_screen_keywords(ctx, not_contains, preset='accurate')
+            contains += found
         if len(not_contains) > 0:
             logger.warning(f'Screen does not contain expected keywords:"{not_contains}"')
             return ToolResult.failed()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/20 02:30
+"""
+单机部署时在 agent 进程内直接调用 OmniParser2 解析(OMNI_BACKEND=local)
+
+模型在首次解析时于后台线程中加载，截图字节直接解码解析，不经过 HTTP、序列化与原图上传；
+返回结果与 HTTP 接口 columnar 格式一致，get_screen 得到相同的 ScreenInfo。
+需安装 OmniParser2 的依赖。OmniParser2 以自身目录为根使用顶层导入(config、core、model、util 等)，
+这些名称容易与 agent 进程中的其他包冲突，因此在隔离的导入环境中加载，见 import_isolated
+"""
+import asyncio
+import importlib
+import sys
+import threading
+from pathlib import Path
+from types import ModuleType
+from typing import Optional
+
+from loguru import logger
+
+# 仓库中 OmniParser2 目录的默认位置
+DEFAULT_PATH = Path(__file__).resolve().parents[3] / 'OmniParser2'
+# 加载后 OmniParser2 的模块在 sys.modules 中的名称前缀
+MODULE_PREFIX = '_omniparser2'
+
+
+def import_isolated(path: Path, names: list[str]) -> dict[str, ModuleType]:
+    """
+    以 path 为根导入 OmniParser2 的模块，不影响进程中的同名模块
+
+    导入期间临时移出 sys.modules 中与 OmniParser2 顶层包同名的模块并将 path 加入 sys.path，
+    导入完成后恢复二者，OmniParser2 的模块改以 MODULE_PREFIX 为前缀登记。
+    OmniParser2 的模块只在顶层导入彼此，导入完成后模块间的引用不再依赖 sys.modules
+
+    Args:
+        path: OmniParser2 目录
+        names: 要导入的模块名，如 core.batch
+
+    Returns:
+        模块名 -> 模块
+    """
+    top_level = {child.stem for child in path.iterdir()
+                 if child.suffix == '.py' or (child.is_dir() and not child.name.startswith(('.', '__')))}
+
+    def owned(name: str) -> bool:
+        return name.split('.', 1)[0] in top_level
+
+    shadowed = {name: sys.modules.pop(name) for name in list(sys.modules) if owned(name)}
+    sys.path.insert(0, str(path))
+    try:
+        return {name: importlib.import_module(name) for name in names}
+    finally:
+        sys.path.remove(str(path))
+        loaded = {name: sys.modules.pop(name) for name in list(sys.modules) if owned(name)}
+        sys.modules.update({f'{MODULE_PREFIX}.{name}': module for name, module in loaded.items()})
+        sys.modules.update(shadowed)
+
+
+class OmniLocalError(Exception):
+    def __init__(self, status: int, msg: str):
+        super().__init__(f'{status}: {msg}')
+        self.status = status
+
+
+class LocalOmniParser:
+    _instance: Optional['LocalOmniParser'] = None
+    _lock = threading.Lock()
+
+    def __init__(self, path: Path):
+        if not (path / 'core' / 'parse.py').exists():
+            raise FileNotFoundError(f'OmniParser2 not found: {path}, please set OMNI_LOCAL_PATH')
+        # orjson 为 OmniParser2 的依赖
+        import orjson
+
+        modules = import_isolated(path, ['config', 'core.batch', 'core.handler', 'core.lazy_caption',
+                                         'routers.omni.deps', 'util.context', 'util.image'])
+        self.orjson = orjson
+        self.settings = modules['config'].settings
+        self.BoxesHandler = modules['core.handler'].BoxesHandler
+        self.LazyCaptionHandler = modules['core.lazy_caption'].LazyCaptionHandler
+        self.RequestParams = modules['routers.omni.deps'].RequestParams
+        self.Context = modules['util.context'].Context
+        self.context_var = modules['util.context'].context_var
+        self.ImageSource = modules['util.image'].ImageSource
+        logger.info(f'Loading OmniParser models from {path}...')
+        self.models = modules['core.batch'].ParserModels.load()
+
+    @classmethod
+    def get(cls, path: Optional[Path] = None) -> 'LocalOmniParser':
+        """首次调用时加载模型，进程内只加载一次"""
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls((path or DEFAULT_PATH).resolve())
+        return cls._instance
+
+    def _parse(self, image: bytes, params: dict, name: str):
+        source = self.ImageSource.decode(image, name=name)
+        self.context_var.set(self.Context(source=source))
+        request = self.RequestParams.model_validate(params)
+        parsed = self.models.create_parser(source, request).parse()
+        parse_id = None
+        if request.icon_caption.mode == 'lazy':
+            parse_id = self.LazyCaptionHandler.create_session(source, parsed.columns, request.icon_caption)
+        annotated = self.BoxesHandler.annotate(image=source.image, elements=parsed.columns)
+        # 与 HTTP 接口相同的 JSON 序列化，保证元素的数值类型与精度一致
+        columns = self.orjson.loads(self.orjson.dumps(parsed.columns.to_columnar(request.fields),
+                                                      option=self.orjson.OPT_SERIALIZE_NUMPY))
+        return columns, annotated, parsed.is_loading, parse_id
+
+    async def parse(self, image: bytes, params: dict, name: str = 'screenshot.png') -> dict:
+        """
+        解析截图，返回与 HTTP 接口 columnar 格式一致的结果
+
+        Args:
+            image: 编码后的图片字节(PNG/WebP/JPEG)
+            params: 解析参数，与 HTTP 接口的 params 一致
+            name: 图片文件名
+        """
+        columns, annotated, is_loading, parse_id = await asyncio.to_thread(self._parse, image, params, name)
+        labeled_image_url = await self.settings.storage_client.async_upload_file(
+            annotated, prefix=self.settings.storage_prefix)
+        return {
+            'parsed_content_list': [],
+            'parsed_content_columns': columns,
+            'labeled_image_url': labeled_image_url,
+            'image_url': '',
+            'is_loading': is_loading,
+            'parse_id': parse_id,
+        }
+
+    async def caption(self, parse_id: str, ids: list[int]) -> dict[int, str]:
+        captions = await asyncio.to_thread(
+            self.LazyCaptionHandler.caption, parse_id, ids, self.models.icon_captioner, self.models.icon_classifier)
+        if captions is None:
+            raise OmniLocalError(404, f'parse_id not found or expired: {parse_id}')
+        return captions
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author : aidenmo
+# @Email : aidenmo@tencent.com
+# @Time : 2026/10/20 01:40
+"""
+OmniParser 同机部署时的 Unix domain socket 客户端(OMNI_BASE_URL=unix:///path/to/omni.sock)
+
+截图以原始字节随二进制帧头发送，不经过 HTTP 与 multipart 编码；元素以二进制列式返回，
+帧格式见 OmniParser2/util/frame_protocol.py
+"""
+import asyncio
+import json
+import struct
+import sys
+from array import array
+from typing import Optional
+
+MAGIC = b'OPF1'
+REQUEST = struct.Struct('<4sBBBxIIIQ')
+RESPONSE = struct.Struct('<4sHxxIQ')
+
+PARSE = 1
+CAPTION = 2
+
+ENCODED = 0
+RAW = 1
+
+
+class OmniSocketError(Exception):
+    def __init__(self, status: int, msg: str):
+        super().__init__(f'{status}: {msg}')
+        self.status = status
+
+
+def socket_path(base_url: str) -> Optional[str]:
+    """unix:// 地址返回 socket 文件路径，其他地址返回 None"""
+    return base_url.removeprefix('unix://') if base_url and base_url.startswith('unix://') else None
+
+
+def decode_columns(meta: dict, body: bytes) -> list[dict]:
+    """二进制列式元素还原为元素字典列表，与 HTTP 接口 columnar 格式的解码结果一致"""
+    sections, offset = {}, 0
+    for name, typecode, count in meta['sections']:
+        values = array(typecode)
+        size = values.itemsize * count
+        values.frombytes(body[offset:offset + size])
+        if sys.byteorder == 'big':
+            values.byteswap()
+        sections[name] = values
+        offset += size
+
+    count, legend = meta['count'], meta.get('legend', {})
+    columns = {}
+    for name in meta['fields']:
+        if name == 'bbox':
+            bbox = sections['bbox']
+            columns[name] = [[round(v, 4) for v in bbox[i * 4:i * 4 + 4]] for i in range(count)]
+        elif name == 'score':
+            columns[name] = [round(v, 4) for v in sections['score']]
+        elif name == 'interactivity':
+            columns[name] = [bool(v) for v in sections[name]]
+        elif name == 'content':
+            columns[name] = meta['content']
+        elif name in legend:
+            columns[name] = [legend[name][code] for code in sections[name]]
+        else:
+            offsets, ids = sections[f'{name}.offsets'], sections[name]
+            columns[name] = [ids[offsets[i]:offsets[i + 1]].tolist() for i in range(count)]
+    return [{'id': i, **{name: values[i] for name, values in columns.items()}} for i in range(count)]
+
+
+class OmniSocketClient:
+    def __init__(self, path: str, timeout: float = 300):
+        self.path = path
+        self.timeout = timeout
+
+    async def request(
+            self,
+            msg_type: int,
+            meta: dict,
+            body: bytes = b'',
+            image_format: int = ENCODED,
+            width: int = 0,
+            height: int = 0,
+            channels: int = 0
+    ) -> tuple[dict, bytes]:
+        meta_bytes = json.dumps(meta, ensure_ascii=False).encode()
+        reader, writer = await asyncio.open_unix_connection(self.path)
+        try:
+            writer.writelines([
+                REQUEST.pack(MAGIC, msg_type, image_format, channels, width, height, len(meta_bytes), len(body)),
+                meta_bytes,
+                body
+            ])
+            await writer.drain()
+            header = await asyncio.wait_for(reader.readexactly(RESPONSE.size), self.timeout)
+            magic, status, meta_len, body_len = RESPONSE.unpack(header)
+            if magic != MAGIC:
+                raise OmniSocketError(502, f'bad magic: {magic!r}')
+            response_meta = json.loads(await reader.readexactly(meta_len)) if meta_len else {}
+            response_body = await reader.readexactly(body_len) if body_len else b''
+        finally:
+            writer.close()
+        if status != 200:
+            raise OmniSocketError(status, response_meta.get('msg', ''))
+        return response_meta, response_body
+
+    async def parse(
+            self,
+            params: dict,
+            image: bytes = b'',
+            image_url: Optional[str] = None,
+            trace_id: Optional[str] = None,
+            name: str = 'screenshot.png',
+            pixels: Optional[tuple[int, int, int]] = None
+    ) -> dict:
+        """
+        解析截图，返回与 HTTP 接口一致的结果，元素在 parsed_content_list 中
+
+        Args:
+            params: 解析参数，与 HTTP 接口的 params 一致
+            image: 编码后的图片字节(PNG/WebP/JPEG)，或原始像素(需传 pixels)
+            image_url: 图片地址，image 为空时由服务下载
+            trace_id: 链路 id
+            name: 图片文件名
+            pixels: image 为原始像素时的 (宽, 高, 通道数)，通道为 RGB/RGBA
+        """
+        meta = {'params': params, 'trace_id': trace_id, 'name': name, 'image_url': image_url}
+        width, height, channels = pixels or (0, 0, 0)
+        response_meta, body = await self.request(
+            PARSE, meta, image, RAW if pixels else ENCODED, width, height, channels)
+        columns = response_meta.pop('columns')
+        response_meta['parsed_content_list'] = decode_columns(columns, body)
+        return response_meta
+
+    async def caption(self, parse_id: str, ids: list[int], trace_id: Optional[str] = None) -> dict[int, str]:
+        meta, _ = await self.request(CAPTION, {'parse_id': parse_id, 'ids': ids, 'trace_id': trace_id})
+        return {int(k): v for k, v in meta['captions'].items()}